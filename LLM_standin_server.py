@@ -0,0 +1,534 @@
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+from src.utils.config_loader import (
+    STANDIN_PORT,
+    STANDIN_PROFILE,
+    STANDIN_PROFILES,
+    STANDIN_DECISION_ONE_RATE,
+)
+from src.utils.log_util import get_logger
+
+# Initialize logger for the stand-in
+logger = get_logger("LLMStandin")
+
+# Classifier stand-in: first dimension whose keyword appears in the answer
+_DIMENSION_KEYWORDS = [
+    ("Stop", ("stop", "quit", "end the conversation", "bye")),
+    ("weight", ("weight", "heavier", "lighter", "pounds", "kg")),
+    ("sleep", ("sleep", "bed", "insomnia", "nap", "awake")),
+    ("eat", ("breakfast", "lunch", "dinner", "meal", "eat")),
+    ("nutrition", ("nutrition", "vegetable", "junk food", "diet")),
+    ("mood", ("mood", "sad", "depress", "happy", "anxious", "upset")),
+    ("medication", ("medication", "medicine", "pill", "prescri")),
+    ("care", ("therapist", "psychiatrist", "doctor", "case manager")),
+    ("work", ("work", "job", "school", "deadline", "boss")),
+    ("finance", ("money", "rent", "bill", "debt", "finance")),
+    ("family", ("family", "parent", "mother", "father", "sister", "brother")),
+    ("social", ("friend", "colleague", "coworker")),
+    ("alcohol", ("alcohol", "drink", "beer", "wine")),
+    ("ciga", ("smok", "cigar", "tobacco", "vape")),
+    ("drug", ("drug", "weed", "cannabis")),
+    ("sports", ("exercise", "gym", "run", "sport", "walk")),
+    ("hygiene", ("shower", "brush", "hygiene", "laundry")),
+    ("house", ("housework", "clean", "dishes", "room")),
+    ("hobbies", ("hobby", "hobbies", "movie", "music", "read", "game")),
+    ("coping", ("cope", "coping", "calm down", "relax", "stress")),
+    ("sib", ("hurt myself", "self-harm", "cut myself")),
+]
+_NEGATIVE_CUES = ("not", "n't", "never", "no ", "lot", "bad", "worse", "hard", "can't", "problem", "struggl")
+_MILD_CUES = ("sometimes", "occasionally", "a bit", "a little", "some")
+_YES = ("yes", "yeah", "yep", "sure", "i do", "of course", "definitely")
+_NO = ("no", "nope", "not really", "i don't", "never")
+_MAYBE = ("maybe", "not sure", "i don't know", "perhaps", "kind of")
+
+# Label of the "Response format:" line in a prompt, e.g. "GUIDE: <...>" or "VALIDATION: xxxx"
+_FORMAT_LABEL = re.compile(r"Response format:\s*\n\s*([A-Za-z_]+):", re.MULTILINE)
+
+# Counters for GET /stats
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {"requests": 0, "streams": 0, "injected_429": 0, "injected_500": 0, "stalls": 0, "structured": 0, "drifted": 0}
+
+
+def _count(name: str) -> None:
+    with _STATS_LOCK:
+        _STATS[name] += 1
+
+
+def _stable_fraction(text: str) -> float:
+    """Deterministic value in [0, 1) for a prompt, so the same prompt always gets the same reply."""
+    return zlib.crc32(text.encode("utf-8")) / 2**32
+
+
+def _last_answer(user: str) -> str:
+    """The text being asked about: the last 'User:' line of a few-shot prompt, else the 'Answer:' line."""
+    users = re.findall(r"User:\s*(.*)", user)
+    if user.rstrip().endswith("Answer:") and users:
+        return users[-1].strip()
+    return user.split("Answer:")[-1].strip().split("\n")[0].strip()
+
+
+_NUMBERED_ANSWER = re.compile(r"^(\d+)\. (.*)$", re.MULTILINE)
+
+
+def _classify(answer: str) -> str:
+    text = " " + answer.lower() + " "
+    for dimension, words in _DIMENSION_KEYWORDS:
+        if any(w in text for w in words):
+            if dimension == "Stop":
+                return "Stop, 0"
+            if any(c in text for c in _NEGATIVE_CUES):
+                return f"{dimension}, 2"
+            return f"{dimension}, 1" if any(c in text for c in _MILD_CUES) else f"{dimension}, 0"
+    stripped = text.strip(" .!")
+    if stripped.endswith("?"):
+        return "Question, 0"
+    for label, words in (("Maybe", _MAYBE), ("No", _NO), ("Yes", _YES)):
+        if any(stripped.startswith(w) for w in words):
+            return f"{label}, 0"
+    return "Other, 0"
+
+
+def _to_second_person(sentence: str) -> str:
+    out = re.sub(r"\bI am\b", "You are", sentence)
+    out = re.sub(r"\bI'm\b", "You're", out)
+    out = re.sub(r"\bI\b", "You", out)
+    out = re.sub(r"\b(my|My)\b", lambda m: "your" if m.group(1) == "my" else "Your", out)
+    out = re.sub(r"\bme\b", "you", out)
+    return out
+
+
+def _payload_field(user: str, name: str) -> str:
+    """A quoted field of a {"Name": "..."} payload (JSON or repr quoting), else ''."""
+    m = re.search(r'"%s":\s*([\'"])(.*?)\1\s*[,}]' % re.escape(name), user, re.DOTALL)
+    return m.group(2).strip() if m else ""
+
+
+def _line_field(user: str, name: str) -> str:
+    """The value of a 'NAME: ...' line in a payload, else ''."""
+    m = re.search(r"^%s:\s*(.*)$" % re.escape(name), user, re.MULTILINE)
+    return m.group(1).strip() if m else ""
+
+
+def _lower_first(text: str) -> str:
+    return text[:1].lower() + text[1:] if text[:2] != "I " else text
+
+
+def _to_declarative(question: str, negative: bool) -> str:
+    q = question.strip().rstrip("?.").strip()
+    m = re.match(r"(?i)(do|does|are|is|have|has|did|can)\s+you\s+(.*)", q)
+    if not m:
+        return q + "."
+    aux, rest = m.group(1).lower(), m.group(2)
+    if aux in ("are", "is"):
+        return f"You are {'not ' if negative else ''}{rest}."
+    if aux in ("have", "has"):
+        return f"You have {'not ' if negative else ''}{rest}."
+    return f"You {'do not ' if negative else ''}{rest}."
+
+
+def canned_reply(system: str, user: str, decision_one_rate: float = STANDIN_DECISION_ONE_RATE) -> str:
+    """
+    Deterministic, prompt-aware stand-in output in the shape each call site parses:
+    - the dimension classifier: "DIMENSION, SCORE" picked from keywords in the answer
+      (one "N. DIMENSION, SCORE" line per numbered answer for batched segments)
+    - reasoners: "DECISION: 0/1" (1 for a fixed share of prompts, decision_one_rate)
+    - prompts with a "Response format:" label (GUIDE, VALIDATION, ...): "LABEL: text"; the
+      summarizer restates the user's response and the rephraser returns the original question
+    - the retry guide: "GUIDE: " plus the original question asked again
+    - few-shot rewrites (synonym, first-to-second person, question to statement): the rewritten sentence;
+      the therapist chat: a supportive reply
+    - the CBT recap: the user's CHALLENGE restated in second person
+    - greeting and closing: a short plain sentence (goodbye only for the closing message)
+    - anything else: a neutral acknowledgement
+    """
+    system, user = system or "", user or ""
+    prompt = system + "\n" + user
+    if "DIMENSION and SCORE" in system:
+        numbered = _NUMBERED_ANSWER.findall(user)
+        if numbered:
+            return "\n".join(f"{n}. {_classify(answer)}" for n, answer in numbered)
+        return _classify(_last_answer(user))
+    if "DECISION" in system:
+        return f"DECISION: {1 if _stable_fraction(prompt) < decision_one_rate else 0}"
+    m = _FORMAT_LABEL.search(system)
+    if m:
+        label = m.group(1)
+        if label == "REFLECTIVE_SUMMERIZER":
+            response = _payload_field(user, "User Response").rstrip(".")
+            if not response or any(response.lower().startswith(w) for w in _YES):
+                response = _to_declarative(_payload_field(user, "Original Question"), negative=False).rstrip(".")
+                return f"{label}: You mentioned that {_lower_first(response)}."
+            return f"{label}: You shared that {_lower_first(_to_second_person(response))}."
+        if label == "REPHRASER":
+            question = _payload_field(user, "Original Question")
+            return f"{label}: {question or 'Could you tell me a little more about that?'}"
+        return f"{label}: Thank you for sharing that; could you tell me a little more about how this affects your day?"
+    if "GUIDE:" in system and "Original Answer" in user:
+        question = _payload_field(user, "Original Question")
+        return f"GUIDE: Let us try that once more; {_lower_first(question) if question else 'could you answer in a sentence or two?'}"
+    if "CHALLENGE" in user and "recap" in system.lower():
+        challenge = _line_field(user, "CHALLENGE").rstrip(".")
+        return f"Earlier you challenged that thought: {_lower_first(_to_second_person(challenge))}." if challenge else "Earlier you challenged that thought."
+    if user.rstrip().endswith("Answer:"):
+        sentence = _last_answer(user)
+        if "second-person" in user:
+            return _to_second_person(sentence)
+        if "positive declarative" in user:
+            return _to_declarative(sentence, negative=False)
+        if "negative declarative" in user:
+            return _to_declarative(sentence, negative=True)
+        if "as a therapist" in user:
+            return "I hear you, and it makes sense to feel that way. I'm here to support you."
+        return sentence
+    if "greeting" in system.lower():
+        return user.strip().split(". ")[0].rstrip(".") + ". Let's get started."
+    if "closing message" in system.lower():
+        return "Thank you for your time today. Take care, and goodbye."
+    return "Thank you for sharing that."
+
+
+def _requested_schema(path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON schema of a structured-output request (text.format / response_format), or None."""
+    if path.endswith("/responses"):
+        fmt = (body.get("text") or {}).get("format") or {}
+        return fmt.get("schema") if fmt.get("type") == "json_schema" else None
+    fmt = body.get("response_format") or {}
+    return (fmt.get("json_schema") or {}).get("schema") if fmt.get("type") == "json_schema" else None
+
+
+def _label_score(line: str, allowed: List[str]) -> Dict[str, Any]:
+    label, _, score = line.partition(",")
+    label = label.strip()
+    return {"label": label if label in allowed else "Other", "score": int(score.strip() or 0) if label in allowed else 0}
+
+
+def structured_reply(text: str, schema: Dict[str, Any]) -> str:
+    """
+    A classifier reply ("DIMENSION, SCORE" or numbered lines) as JSON matching the requested schema:
+    {"label", "score"} or {"results": [{"index", "label", "score"}]}; labels outside the schema's
+    enum become "Other". Other prompts are returned as a JSON string.
+    """
+    props = schema.get("properties") or {}
+    if "results" in props:
+        item = (props["results"].get("items") or {}).get("properties") or {}
+        allowed = (item.get("label") or {}).get("enum") or []
+        return json.dumps({"results": [
+            {"index": int(n), **_label_score(line, allowed)} for n, line in _NUMBERED_ANSWER.findall(text)
+        ]})
+    if "label" in props:
+        return json.dumps(_label_score(text, (props["label"] or {}).get("enum") or []))
+    return json.dumps(text)
+
+
+def drift_reply(text: str, r: float) -> str:
+    """
+    A "DIMENSION, SCORE" reply reworded the way chat models drift from a requested format;
+    r in [0, 1) picks the wording.
+    """
+    label, _, score = text.partition(",")
+    label, score = label.strip(), score.strip()
+    forms = (
+        f"Dimension: {label}\nScore: {score}",
+        f"The answer is about {label}, so I would rate it {score}.",
+        f"**{label}**, {score}",
+    )
+    return forms[int(r * len(forms))]
+
+
+def _usage(system: str, user: str, text: str) -> Dict[str, Any]:
+    input_tokens = math.ceil((len(system) + len(user)) / 4)
+    output_tokens = max(1, math.ceil(len(text) / 4))
+    return {
+        "input_tokens": input_tokens,
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens": output_tokens,
+        "output_tokens_details": {"reasoning_tokens": 0},
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def _chat_usage(usage: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "prompt_tokens": usage["input_tokens"],
+        "completion_tokens": usage["output_tokens"],
+        "total_tokens": usage["total_tokens"],
+        "prompt_tokens_details": {"cached_tokens": 0},
+        "completion_tokens_details": {"reasoning_tokens": 0},
+    }
+
+
+def _message_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _prompt_of(path: str, body: Dict[str, Any]) -> Tuple[str, str]:
+    """(system, user) text of a /responses or /chat/completions request."""
+    if path.endswith("/responses"):
+        system = body.get("instructions") or ""
+        payload = body.get("input") or ""
+        if isinstance(payload, list):
+            payload = "\n".join(_message_text(m.get("content")) for m in payload if isinstance(m, dict))
+        return system, str(payload)
+    system, user = [], []
+    for m in body.get("messages") or []:
+        (system if m.get("role") in ("system", "developer") else user).append(_message_text(m.get("content")))
+    return "\n".join(system), "\n".join(user)
+
+
+class Profile:
+    """
+    Latency and fault behaviour of the stand-in (one entry of llm_standin.profiles).
+    """
+
+    def __init__(self, name: str, cfg: Dict[str, Any], seed: int = None):
+        self.name = name
+        self.latency_dist = str(cfg.get("latency_dist", "fixed"))
+        self.latency_ms = float(cfg.get("latency_ms", 0))
+        self.spread = float(cfg.get("spread", 0))
+        self.stream_chunk_ms = float(cfg.get("stream_chunk_ms", 0))
+        self.error_429_rate = float(cfg.get("error_429_rate", 0))
+        self.error_500_rate = float(cfg.get("error_500_rate", 0))
+        self.retry_after_sec = float(cfg.get("retry_after_sec", 1))
+        self.stall_rate = float(cfg.get("stall_rate", 0))
+        self.stall_sec = float(cfg.get("stall_sec", 30))
+        self.format_drift_rate = float(cfg.get("format_drift_rate", 0))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def latency_sec(self) -> float:
+        with self._lock:
+            if self.latency_dist == "lognormal":
+                ms = self.latency_ms * math.exp(self._rng.gauss(0, self.spread))
+            elif self.latency_dist == "uniform":
+                ms = self.latency_ms * (1 + self._rng.uniform(-self.spread, self.spread))
+            else:
+                ms = self.latency_ms
+        return max(0.0, ms) / 1000.0
+
+    def fault(self) -> int:
+        """HTTP status to fail this request with (429 / 500), or 0."""
+        r = self._random()
+        if r < self.error_429_rate:
+            return 429
+        if r < self.error_429_rate + self.error_500_rate:
+            return 500
+        return 0
+
+    def stalls(self) -> bool:
+        return self.stall_rate > 0 and self._random() < self.stall_rate
+
+    def drifts(self) -> float:
+        """0 to keep the requested format, else a value in (0, 1] choosing the drifted wording."""
+        if self.format_drift_rate <= 0 or self._random() >= self.format_drift_rate:
+            return 0.0
+        return self._random() or 1.0
+
+
+_profile: Profile = None
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """
+    OpenAI-compatible endpoints used by llm_client: POST /v1/responses, POST /v1/chat/completions
+    (both with stream=true as SSE), GET /v1/models (connection warm-up); GET /stats for counters.
+    Any API key is accepted.
+    """
+
+    # Keep-alive, so the client's connection pool is exercised like against the real API
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt % args)
+
+    def _send_json(self, status: int, data: dict, headers=()):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path.endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "standin", "object": "model", "owned_by": "standin"}]})
+        elif path == "/stats":
+            with _STATS_LOCK:
+                self._send_json(200, {"profile": _profile.name, **_STATS})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not (path.endswith("/responses") or path.endswith("/chat/completions")):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError as e:
+            self._send_json(400, {"error": {"message": f"Invalid JSON: {e}", "type": "invalid_request_error"}})
+            return
+        _count("requests")
+        time.sleep(_profile.latency_sec())
+        status = _profile.fault()
+        if status == 429:
+            _count("injected_429")
+            self._send_json(429, {"error": {"message": "Rate limit reached (stand-in)", "type": "rate_limit_error", "code": "rate_limit_exceeded"}},
+                            headers=[("Retry-After", str(_profile.retry_after_sec))])
+            return
+        if status == 500:
+            _count("injected_500")
+            self._send_json(500, {"error": {"message": "Internal server error (stand-in)", "type": "server_error"}})
+            return
+        system, user = _prompt_of(path, body)
+        text = canned_reply(system, user)
+        schema = _requested_schema(path, body)
+        drift = _profile.drifts() if "DIMENSION and SCORE" in system and "\n" not in text else 0.0
+        if drift:
+            # A drifted reply also ignores a requested schema, like servers without structured output
+            _count("drifted")
+            text = drift_reply(text, drift % 1.0)
+        elif schema:
+            _count("structured")
+            text = structured_reply(text, schema)
+        usage = _usage(system, user, text)
+        model = str(body.get("model") or "standin")
+        if path.endswith("/responses"):
+            if body.get("stream"):
+                self._stream(self._responses_events(model, text, usage))
+            else:
+                self._send_json(200, self._response_object(model, text, usage))
+        elif body.get("stream"):
+            self._stream(self._chat_chunks(model, text, usage))
+        else:
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": _chat_usage(usage),
+            })
+
+    @staticmethod
+    def _response_object(model: str, text: str, usage: Dict[str, Any], status: str = "completed") -> Dict[str, Any]:
+        return {
+            "id": f"resp_{uuid.uuid4().hex[:24]}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": status,
+            "model": model,
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex[:24]}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }] if status == "completed" else [],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": usage if status == "completed" else None,
+        }
+
+    def _responses_events(self, model: str, text: str, usage: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        events = [("response.created", {"response": self._response_object(model, "", usage, status="in_progress")})]
+        for word in _chunks(text):
+            events.append(("response.output_text.delta", {"item_id": "msg_0", "output_index": 0, "content_index": 0, "delta": word}))
+        events.append(("response.output_text.done", {"item_id": "msg_0", "output_index": 0, "content_index": 0, "text": text}))
+        events.append(("response.completed", {"response": self._response_object(model, text, usage)}))
+        return [(name, dict(data, type=name, sequence_number=i)) for i, (name, data) in enumerate(events)]
+
+    @staticmethod
+    def _chat_chunks(model: str, text: str, usage: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:24]}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        chunks = [dict(base, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])]
+        for word in _chunks(text):
+            chunks.append(dict(base, choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}]))
+        chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        chunks.append(dict(base, choices=[], usage=_chat_usage(usage)))
+        return [("", c) for c in chunks] + [("", None)]
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, events: List[Tuple[str, Any]]) -> None:
+        """Send events as SSE over chunked transfer encoding, pacing deltas per the profile."""
+        _count("streams")
+        stall_at = len(events) // 2 if _profile.stalls() else -1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i, (name, data) in enumerate(events):
+                if i == stall_at:
+                    _count("stalls")
+                    time.sleep(_profile.stall_sec)
+                if data is None:
+                    self._write_chunk(b"data: [DONE]\n\n")
+                    continue
+                head = f"event: {name}\n" if name else ""
+                self._write_chunk(f"{head}data: {json.dumps(data)}\n\n".encode("utf-8"))
+                if _profile.stream_chunk_ms and (name.endswith(".delta") or (not name and data.get("choices"))):
+                    time.sleep(_profile.stream_chunk_ms / 1000.0)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up (deadline, hedge winner elsewhere); nothing left to send
+            self.close_connection = True
+
+
+def _chunks(text: str) -> List[str]:
+    """Split text into word-sized deltas that concatenate back to text."""
+    return re.findall(r"\S+\s*|\s+", text) or [""]
+
+
+def main(argv=None):
+    global _profile
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stand-in for load tests and benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=STANDIN_PORT)
+    parser.add_argument("--profile", default=STANDIN_PROFILE, choices=sorted(STANDIN_PROFILES) or None,
+                        help="latency/fault profile from llm_standin.profiles in config.yaml")
+    parser.add_argument("--seed", type=int, default=None, help="seed for latency and fault draws (reproducible runs)")
+    args = parser.parse_args(argv)
+    _profile = Profile(args.profile, STANDIN_PROFILES.get(args.profile, {}), seed=args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), StandinHandler)
+    server.daemon_threads = True
+    logger.info(f"LLM stand-in listening on {args.host}:{args.port} (profile {args.profile}); "
+                f"set openai.base_url to http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    # Entry point for the stand-in: python LLM_standin_server.py [--profile flaky] [--port 8787]
+    main()
@@ -1,78 +1,75 @@
 # LLM_therapist_Application.py
 
-import os
+import argparse
 import time
 import threading
-import pandas as pd
 
-from src.handler_rl import HandlerRL
-from src.utils.io_record import init_record
-from src.utils.config_loader import RECORD_CSV
-
-# The columns used in the record CSV file for question/response exchange
-HEADER = ["Question", "Question_Lock", "Resp", "Resp_Lock"]
-
-def _atomic_write_record(df: pd.DataFrame):
-    """
-    Atomically write the DataFrame to the record CSV file.
-    This prevents partial writes and ensures the file is always in a valid state.
-    """
-    folder = os.path.dirname(RECORD_CSV)
-    if folder and not os.path.exists(folder):
-        os.makedirs(folder, exist_ok=True)
-    tmp_path = RECORD_CSV + ".tmp"
-    df.to_csv(tmp_path, columns=HEADER, index=False)
-    os.replace(tmp_path, RECORD_CSV)
+from src.utils.config_loader import TRANSPORT_KIND
+from src.utils.turn_channel import create_channel, get_channel, set_channel
 
 def console_io_loop():
     """
     Console I/O loop running in a separate thread.
-    - Waits for a new question to appear in the CSV (Question_Lock == 1)
+    - Waits on the turn channel for the next question
     - Prints the question to the terminal and prompts the user for input
-    - Writes the user's response back to the CSV and unlocks the response
+    - Hands the user's response back to the RL workflow through the channel
     """
+    channel = get_channel()
     while True:
-        time.sleep(0.1)
-        try:
-            df = pd.read_csv(RECORD_CSV, dtype={"Question": str, "Question_Lock": "int64", "Resp": str, "Resp_Lock": "int64"})
-        except Exception:
-            # Wait for the main process to initialize the record file
+        # Blocks until HandlerRL emits a question (no polling)
+        q = channel.take_question()
+        if q is None:
             continue
+        print(f"\nQUESTION: {q}", flush=True)
+        print("Your answer: ", end="", flush=True)
 
-        # If a new question is available (locked), display it and get user input
-        if int(df.loc[0, "Question_Lock"]) == 1:
-            q = str(df.loc[0, "Question"])
-            print(f"\nQUESTION: {q}", flush=True)
-            print("Your answer: ", end="", flush=True)
-            # Unlock the question so the main process can write the next one
-            df.loc[0, "Question_Lock"] = 0
-            _atomic_write_record(df)
-
-            try:
-                user_input = input()
-            except KeyboardInterrupt:
-                print("\n[Console IO] Interrupted by user.")
-                break
+        try:
+            user_input = input()
+        except KeyboardInterrupt:
+            print("\n[Console IO] Interrupted by user.")
+            break
 
-            # Write the user's response and unlock the response field
-            df = pd.read_csv(RECORD_CSV, dtype={"Question": str, "Question_Lock": "int64", "Resp": str, "Resp_Lock": "int64"})
-            df.loc[0, "Resp"] = user_input
-            df.loc[0, "Resp_Lock"] = 0
-            _atomic_write_record(df)
+        # Deliver the user's response to the RL workflow
+        channel.put_answer(user_input)
 
 def main():
     """
     Main entry point for the application.
-    - Initializes the record CSV file
+    - Initializes the turn channel for question/response exchange
     - Starts the console I/O thread for user interaction
     - Runs the main RL-based therapist workflow
+    With --role backend/frontend the two halves run in separate processes,
+    talking over the configured transport (socket or csv).
     """
-    # Initialize the record file for question/response exchange
+    parser = argparse.ArgumentParser(description="LLM therapist console application")
+    parser.add_argument(
+        "--role",
+        choices=["both", "backend", "frontend"],
+        default="both",
+        help="Run the RL workflow, the console front-end, or both in this process",
+    )
+    args = parser.parse_args()
+
+    if args.role == "frontend":
+        # Front-end only: connect to the backend process and serve the console
+        set_channel(create_channel(TRANSPORT_KIND, role="frontend"))
+        console_io_loop()
+        return
+
+    # Imported lazily so a front-end-only process does not load the LLM stack
+    from src.handler_rl import HandlerRL
+    from src.utils.io_record import init_record
+    from src.utils.llm_client import start_connection_warmup
+
+    # Initialize the channel for question/response exchange
     init_record()
+    # Open the LLM connection while the greeting is being prepared
+    start_connection_warmup()
 
-    # Start the console I/O thread (daemon so it exits with the main process)
-    t = threading.Thread(target=console_io_loop, daemon=True)
-    t.start()
+    if args.role == "both":
+        # Start the console I/O thread (daemon so it exits with the main process)
+        t = threading.Thread(target=console_io_loop, daemon=True)
+        t.start()
 
     # Start the main RL workflow (this will drive the therapy session)
     HandlerRL().run()
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from src.batch_scoring import BatchBusy, batch_admission, check_transcripts, score_transcripts
+from src.session_registry import AdmissionRejected, SessionRegistry
+from src.utils.config_loader import SERVER_MAX_QUEUED_SESSIONS, SUBJECT_ID, check_subject_id
+from src.utils.classifier_schema import classifier_schema_stats
+from src.utils.dla_classifier import classifier_stats
+from src.utils.llm_client import llm_stats, start_connection_warmup
+from src.utils.log_util import get_logger
+from src.utils.turn_channel import take_question_async
+
+# Initialize logger for this server module
+logger = get_logger("ASGIServer")
+
+# Registry of running sessions, one HandlerRL thread and turn channel per subject_ID
+_sessions = SessionRegistry()
+
+# Admission (start / resume) may block for up to server.queue_timeout_sec. It gets its own pool so
+# queued sessions cannot starve the default executor; at most max_queued_sessions threads ever wait.
+_ADMISSION_POOL = ThreadPoolExecutor(max_workers=(SERVER_MAX_QUEUED_SESSIONS or 16) + 1, thread_name_prefix="Admission")
+
+# Same CORS behaviour as the Flask server (flask_cors defaults: any origin)
+_CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+]
+
+def _subject_id(payload) -> str:
+    """
+    Subject ID from the request payload, falling back to app.subject_id in config.yaml.
+    Raises InvalidSubjectID (a ValueError, answered with 400) for IDs that are not safe in file names.
+    """
+    return check_subject_id(payload.get("subject_ID") or SUBJECT_ID)
+
+async def _get_question(session, timeout_sec=60):
+    """
+    Await the next question from the session's RL thread.
+    The request holds only a coroutine while it waits; returns empty string after timeout_sec seconds.
+    """
+    question = await take_question_async(session.channel, timeout=timeout_sec)
+    return question if question is not None else ""
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+async def _send_json(send, status: int, data: dict, extra_headers=()):
+    body = json.dumps(data).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    headers += list(extra_headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers + _CORS_HEADERS})
+    await send({"type": "http.response.body", "body": body})
+
+async def _send_events(send, events):
+    headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no")]
+    await send({"type": "http.response.start", "status": 200, "headers": headers + _CORS_HEADERS})
+    async for chunk in events:
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+async def gpt(payload: dict):
+    """
+    Same contract as the Flask /gpt endpoint.
+    - If user_input is "start", start (or join) the RL session for subject_ID, then return the first question.
+    - Otherwise, hand the user's response to that subject's session and return the next question.
+    """
+    user_input = str(payload["user_input"])
+    subject_id = _subject_id(payload)
+
+    if user_input.lower().strip() == "start":
+        # Admission may queue; wait in a worker thread so the event loop keeps serving other requests
+        session = await asyncio.get_running_loop().run_in_executor(_ADMISSION_POOL, _sessions.start, subject_id)
+        question = await _get_question(session)
+        return 200, {"subject_ID": subject_id, "question": question}
+
+    # Resumes the session first if it was suspended while idle (may wait for admission)
+    session = await asyncio.get_running_loop().run_in_executor(_ADMISSION_POOL, _sessions.answer, subject_id, user_input)
+    if session is None:
+        return 409, {"subject_ID": subject_id, "error": "No session for this subject_ID; send 'start' first."}
+    question = await _get_question(session)
+    return 200, {"subject_ID": subject_id, "question": question}
+
+def _sse(event: str, data: dict) -> bytes:
+    """
+    Format one server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+async def gpt_stream(payload: dict):
+    """
+    Same contract as the Flask /gpt/stream endpoint (server-sent events).
+    Returns (status, error dict) when the turn cannot be taken, else (200, async generator of events).
+    """
+    user_input = str(payload["user_input"])
+    subject_id = _subject_id(payload)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def _listener(kind: str, text: str):
+        try:
+            loop.call_soon_threadsafe(events.put_nowait, (kind, text))
+        except RuntimeError:
+            # Event loop already closed; nothing left to stream to
+            pass
+
+    if user_input.lower().strip() == "start":
+        session = await loop.run_in_executor(_ADMISSION_POOL, partial(_sessions.start, subject_id, listener=_listener))
+    else:
+        session = await loop.run_in_executor(_ADMISSION_POOL, partial(_sessions.answer, subject_id, user_input, listener=_listener))
+        if session is None:
+            return 409, {"subject_ID": subject_id, "error": "No session for this subject_ID; send 'start' first."}
+
+    async def _generate(timeout_sec=60):
+        deadline = loop.time() + timeout_sec
+        try:
+            while True:
+                question = session.channel.take_question(timeout=0)
+                if question is not None:
+                    yield _sse("question", {"subject_ID": subject_id, "question": question})
+                    return
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    yield _sse("question", {"subject_ID": subject_id, "question": ""})
+                    return
+                try:
+                    kind, text = await asyncio.wait_for(events.get(), remaining)
+                except asyncio.TimeoutError:
+                    continue
+                if kind == "partial":
+                    yield _sse("delta", {"text": text})
+        finally:
+            session.channel.remove_listener(_listener)
+
+    return 200, _generate()
+
+async def batch(payload: dict):
+    """
+    Same contract as the Flask /batch endpoint; scoring runs in a worker thread.
+    Raises ValueError for malformed transcripts and BatchBusy when batch.max_requests batches are running.
+    """
+    transcripts = check_transcripts(payload.get("transcripts"), is_live=_sessions.is_live)
+    with batch_admission():
+        results = await asyncio.get_running_loop().run_in_executor(None, score_transcripts, transcripts)
+    return 200, {"results": results}
+
+async def health():
+    """
+    Returns "running" if any RL session is alive, otherwise "idle", plus the number of active sessions.
+    """
+    active = _sessions.active_count()
+    return 200, {"status": "running" if active > 0 else "idle", "active_sessions": active}
+
+async def metrics():
+    """
+    Admission and LLM concurrency metrics, as in the Flask server.
+    """
+    return 200, {"sessions": _sessions.stats(), "llm": llm_stats(), "local_classifier": classifier_stats(), "classifier_output": classifier_schema_stats()}
+
+async def app(scope, receive, send):
+    """
+    Minimal ASGI application exposing /gpt, /gpt/stream, /batch, /health and /metrics; run it with any ASGI server.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Open the LLM connection before the first user turn needs it
+                start_connection_warmup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    extra_headers = []
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": _CORS_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    if path == "/health" and method == "GET":
+        status, data = await health()
+    elif path == "/metrics" and method == "GET":
+        status, data = await metrics()
+    elif path == "/batch" and method == "POST":
+        try:
+            status, data = await batch(json.loads(await _read_body(receive) or b"{}"))
+        except BatchBusy as e:
+            status, data = 429, {"error": f"Server busy ({e}); retry later."}
+            extra_headers.append((b"retry-after", str(e.retry_after).encode()))
+        except (ValueError, TypeError, AttributeError) as e:
+            status, data = 400, {"error": f"Invalid request: {e}"}
+    elif path in ("/gpt", "/gpt/stream") and method == "POST":
+        try:
+            payload = json.loads(await _read_body(receive) or b"{}")
+            status, data = await (gpt(payload) if path == "/gpt" else gpt_stream(payload))
+        except AdmissionRejected as e:
+            status, data = 429, {"subject_ID": _subject_id(payload), "error": f"Server busy ({e.reason}); retry later."}
+            extra_headers.append((b"retry-after", str(e.retry_after).encode()))
+        except (ValueError, KeyError, TypeError) as e:
+            status, data = 400, {"error": f"Invalid request: {e}"}
+    else:
+        status, data = 404, {"error": "Not found"}
+    if not isinstance(data, dict):
+        await _send_events(send, data)
+        return
+    await _send_json(send, status, data, extra_headers)
+
+if __name__ == "__main__":
+    # Entry point for running the ASGI server directly (requires uvicorn).
+    # Host and port can be set via environment variables, as for the Flask server.
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required to run the ASGI server: pip install uvicorn")
+    host = os.environ.get("ASGI_HOST", "0.0.0.0")
+    port = int(os.environ.get("ASGI_PORT", "8080"))
+    uvicorn.run(app, host=host, port=port)
@@ -0,0 +1,235 @@
+import http.client
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.utils.config_loader import (
+    SUBJECT_ID,
+    ROUTER_WORKERS,
+    ROUTER_WORKER_BASE_PORT,
+    ROUTER_RESTART_DELAY_SEC,
+    STORE_BACKEND,
+    check_subject_id,
+)
+from src.utils.log_util import get_logger
+
+# Initialize logger for the router
+logger = get_logger("Router")
+
+# Worker entry point: the Flask server, one process per worker
+_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "LLM_therapist_Application_server.py")
+# Response headers relayed from a worker to the client
+_RELAYED_HEADERS = ("Content-Type", "Retry-After", "Cache-Control", "X-Accel-Buffering", "Access-Control-Allow-Origin")
+# How long the router waits on a worker response (the worker itself waits up to 60s for a question)
+_WORKER_TIMEOUT_SEC = 120
+# A /batch response only comes back once every transcript is scored
+_BATCH_TIMEOUT_SEC = 900
+
+
+class Worker:
+    """
+    One server process listening on 127.0.0.1:port. Restarted by the supervisor when it exits.
+    """
+
+    def __init__(self, index: int, port: int):
+        self.index = index
+        self.port = port
+        self.process = None
+        self.restarts = 0
+
+    def start(self) -> None:
+        env = dict(os.environ, FLASK_HOST="127.0.0.1", FLASK_PORT=str(self.port), FLASK_DEBUG="0")
+        self.process = subprocess.Popen([sys.executable, _WORKER_SCRIPT], env=env)
+        logger.info(f"Started worker {self.index} (pid {self.process.pid}) on port {self.port}")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self) -> None:
+        if self.is_alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class WorkerPool:
+    """
+    Fixed pool of worker processes. A subject_ID always maps to the same worker (crc32 hash),
+    so its in-memory session stays in one process; per-subject durable state lives in the
+    shared state store, so a restarted worker picks the subject up from its checkpoint.
+    """
+
+    def __init__(self, n_workers: int, base_port: int):
+        self.workers = [Worker(i, base_port + i) for i in range(n_workers)]
+        self._stopping = threading.Event()
+        self._next = itertools.count()
+
+    def start(self) -> None:
+        for w in self.workers:
+            w.start()
+        threading.Thread(target=self._supervise, name="WorkerSupervisor", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        for w in self.workers:
+            w.stop()
+
+    def worker_for(self, subject_id: str) -> Worker:
+        return self.workers[zlib.crc32(str(subject_id).encode("utf-8")) % len(self.workers)]
+
+    def next_worker(self) -> Worker:
+        """
+        Round-robin pick for requests tied to no session (/batch); each worker admits its own batches.
+        """
+        return self.workers[next(self._next) % len(self.workers)]
+
+    def _supervise(self) -> None:
+        while not self._stopping.wait(0.5):
+            for w in self.workers:
+                if not w.is_alive() and not self._stopping.is_set():
+                    logger.warning(f"Worker {w.index} exited with code {w.process.returncode}; restarting.")
+                    time.sleep(ROUTER_RESTART_DELAY_SEC)
+                    w.restarts += 1
+                    w.start()
+
+
+_pool: WorkerPool = None
+
+
+def _worker_json(worker: Worker, path: str):
+    """
+    GET a JSON endpoint on a worker; None if the worker is unreachable.
+    """
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", worker.port, timeout=5)
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read() or b"{}")
+    except (OSError, ValueError):
+        return None
+
+
+class RouterHandler(BaseHTTPRequestHandler):
+    """
+    Forwards /gpt and /gpt/stream to the subject's worker and /batch to the next worker in turn;
+    aggregates /health and /metrics.
+    """
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt % args)
+
+    def _send_json(self, status: int, data: dict, headers=()):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/health":
+            workers = [_worker_json(w, "/health") for w in _pool.workers]
+            active = sum((h or {}).get("active_sessions", 0) for h in workers)
+            self._send_json(200, {
+                "status": "running" if active > 0 else "idle",
+                "active_sessions": active,
+                "workers": [
+                    {"port": w.port, "alive": h is not None, "restarts": w.restarts}
+                    for w, h in zip(_pool.workers, workers)
+                ],
+            })
+        elif self.path == "/metrics":
+            self._send_json(200, {
+                "workers": [
+                    {"port": w.port, "restarts": w.restarts, "metrics": _worker_json(w, "/metrics")}
+                    for w in _pool.workers
+                ],
+            })
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path not in ("/gpt", "/gpt/stream", "/batch"):
+            self._send_json(404, {"error": "Not found"})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path == "/batch":
+            # Transcripts are validated by the worker; batches carry no session, so any worker will do
+            subject_id, worker, timeout = None, _pool.next_worker(), _BATCH_TIMEOUT_SEC
+        else:
+            try:
+                subject_id = check_subject_id(json.loads(body or b"{}").get("subject_ID") or SUBJECT_ID)
+            except (ValueError, AttributeError) as e:
+                self._send_json(400, {"error": f"Invalid request: {e}"})
+                return
+            worker, timeout = _pool.worker_for(subject_id), _WORKER_TIMEOUT_SEC
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", worker.port, timeout=timeout)
+            conn.request("POST", self.path, body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+        except OSError as e:
+            logger.warning(f"Worker {worker.index} unreachable for {self.path} (subject {subject_id}): {e}")
+            error = {"error": "Worker unavailable; retry shortly."}
+            if subject_id is not None:
+                error = {"subject_ID": subject_id, **error}
+            self._send_json(503, error, headers=[("Retry-After", str(max(1, int(ROUTER_RESTART_DELAY_SEC) + 1)))])
+            return
+        # Relay status, selected headers and body; chunks are flushed as they arrive (SSE)
+        self.send_response(resp.status)
+        for name in _RELAYED_HEADERS:
+            value = resp.getheader(name)
+            if value is not None:
+                self.send_header(name, value)
+        length = resp.getheader("Content-Length")
+        if length is not None:
+            self.send_header("Content-Length", length)
+        self.end_headers()
+        while True:
+            chunk = resp.read1(65536)
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            self.wfile.flush()
+        conn.close()
+
+
+def main():
+    global _pool
+    n_workers = ROUTER_WORKERS if ROUTER_WORKERS > 0 else (os.cpu_count() or 1)
+    if STORE_BACKEND != "sqlite":
+        logger.info("Tip: set store.backend to 'sqlite' so worker processes share per-subject state transactionally.")
+    _pool = WorkerPool(n_workers, ROUTER_WORKER_BASE_PORT)
+    _pool.start()
+    host = os.environ.get("ROUTER_HOST", "0.0.0.0")
+    port = int(os.environ.get("ROUTER_PORT", "8080"))
+    server = ThreadingHTTPServer((host, port), RouterHandler)
+    logger.info(f"Router listening on {host}:{port} with {n_workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        _pool.stop()
+
+
+if __name__ == "__main__":
+    # Entry point for the router: host and port via ROUTER_HOST / ROUTER_PORT, workers via config.yaml
+    main()
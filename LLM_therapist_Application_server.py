@@ -1,14 +1,17 @@
 import os
+import json
+import queue
 import time
-import threading
-import pandas as pd
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 
-from src.handler_rl import HandlerRL
-from src.utils.config_loader import RECORD_CSV
+from src.batch_scoring import BatchBusy, batch_admission, check_transcripts, score_transcripts
+from src.session_registry import AdmissionRejected, SessionRegistry
+from src.utils.config_loader import SUBJECT_ID, InvalidSubjectID, check_subject_id
+from src.utils.classifier_schema import classifier_schema_stats
+from src.utils.dla_classifier import classifier_stats
+from src.utils.llm_client import llm_stats, start_connection_warmup
 from src.utils.log_util import get_logger
-from src.utils.io_record import HEADER  # Reuse column names to keep consistent with backend
 
 # Initialize logger for this server module
 logger = get_logger("FlaskServer")
@@ -17,117 +20,162 @@ logger = get_logger("FlaskServer")
 app = Flask(__name__)
 CORS(app)
 
-# Global variables for RL thread management
-_rl_thread = None
-_rl_running = False
-_rl_lock = threading.Lock()  # Lock to ensure thread-safe RL start/stop
+# Registry of running sessions, one HandlerRL thread and turn channel per subject_ID
+_sessions = SessionRegistry()
 
-def _ensure_record_file():
+def _subject_id(payload) -> str:
     """
-    Ensure the record.csv file exists and has the correct columns.
-    If the parent folder does not exist, create it.
-    If the file does not exist, create it with a default row.
+    Subject ID from the request payload, falling back to app.subject_id in config.yaml.
+    Raises InvalidSubjectID (answered with 400) for IDs that are not safe in file names.
     """
-    folder = os.path.dirname(RECORD_CSV)
-    if folder and not os.path.exists(folder):
-        os.makedirs(folder, exist_ok=True)
-    if not os.path.exists(RECORD_CSV):
-        df = pd.DataFrame([["", 0, "", 1]], columns=HEADER)
-        df.to_csv(RECORD_CSV, columns=HEADER, index=False)
+    return check_subject_id(payload.get("subject_ID") or SUBJECT_ID)
 
-def _read_record():
-    """
-    Read the record.csv file into a pandas DataFrame.
-    """
-    return pd.read_csv(RECORD_CSV)
+@app.errorhandler(InvalidSubjectID)
+def _invalid_subject(e: InvalidSubjectID):
+    return jsonify({"error": str(e)}), 400
 
-def _write_record(df):
+def _get_question_blocking(session, timeout_sec=60):
     """
-    Write the given DataFrame to record.csv atomically, enforcing column order.
-    This avoids I/O conflicts by writing to a temporary file and then renaming.
-    """
-    tmp_path = RECORD_CSV + ".tmp"
-    df.to_csv(tmp_path, columns=HEADER, index=False)
-    os.replace(tmp_path, RECORD_CSV)
-
-def _start_rl_if_needed():
+    Wait on the session's turn channel for the next question emitted by its RL thread.
+    Returns as soon as the question is put; returns empty string after timeout_sec seconds.
     """
-    Start the RL handler in a background thread if not already running.
-    Uses a lock to prevent race conditions.
-    """
-    global _rl_thread, _rl_running
-    with _rl_lock:
-        if _rl_thread is not None and _rl_thread.is_alive():
-            return  # RL thread is already running
-        _rl_running = True
-
-        def _runner():
-            global _rl_running
-            logger.info("RL thread started")
-            HandlerRL().run()  # Main RL workflow
-            _rl_running = False
-            logger.info("RL thread finished")
-
-        _rl_thread = threading.Thread(target=_runner, daemon=True)
-        _rl_thread.start()
+    question = session.channel.take_question(timeout=timeout_sec)
+    return question if question is not None else ""
 
-def _get_question_blocking(timeout_sec=60):
+def _rejected(subject_id: str, e: AdmissionRejected):
     """
-    Poll the record file for a new question (Question_Lock == 1).
-    Once found, reset the lock and return the question.
-    Timeout after timeout_sec seconds and return empty string if not found.
+    429 response for a "start" that was not admitted, with a Retry-After hint.
     """
-    t0 = time.time()
-    while True:
-        df = _read_record()
-        if int(df.loc[0, "Question_Lock"]) == 1:
-            question = str(df.loc[0, "Question"])
-            df.loc[0, "Question_Lock"] = 0
-            _write_record(df)
-            return question
-        if time.time() - t0 > timeout_sec:
-            return ""
-        time.sleep(0.1)  # Sleep briefly to avoid busy-waiting
-
-def _log_resp(text: str):
-    """
-    Write the user's response to the record file and unlock Resp_Lock.
-    """
-    df = _read_record()
-    df.loc[0, "Resp"] = text
-    df.loc[0, "Resp_Lock"] = 0
-    _write_record(df)
+    resp = jsonify({"subject_ID": subject_id, "error": f"Server busy ({e.reason}); retry later."})
+    resp.status_code = 429
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
 
 @app.route("/gpt", methods=["POST"])
 def gpt():
     """
     Main API endpoint for user interaction.
-    - If user_input is "start", initialize the record file and RL thread, then return the first question.
-    - Otherwise, log the user's response and return the next question.
+    - If user_input is "start", start (or join) the RL session for subject_ID, then return the first question.
+    - Otherwise, hand the user's response to that subject's session and return the next question.
     """
     payload = request.get_json(force=True)
     user_input = str(payload["user_input"])
-    subject_id = str(payload.get("subject_ID", ""))
+    subject_id = _subject_id(payload)
 
     if user_input.lower().strip() == "start":
-        _ensure_record_file()
-        _start_rl_if_needed()
+        try:
+            session = _sessions.start(subject_id)
+        except AdmissionRejected as e:
+            return _rejected(subject_id, e)
         # Return the first question produced by RL (which now handles greeting itself)
-        question = _get_question_blocking()
+        question = _get_question_blocking(session)
         return jsonify({"subject_ID": subject_id, "question": question})
 
-    _log_resp(user_input)
-    question = _get_question_blocking()
+    try:
+        # Resumes the session first if it was suspended while idle
+        session = _sessions.answer(subject_id, user_input)
+    except AdmissionRejected as e:
+        return _rejected(subject_id, e)
+    if session is None:
+        return jsonify({"subject_ID": subject_id, "error": "No session for this subject_ID; send 'start' first."}), 409
+    question = _get_question_blocking(session)
     return jsonify({"subject_ID": subject_id, "question": question})
 
+def _sse(event: str, data: dict) -> str:
+    """
+    Format one server-sent event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/gpt/stream", methods=["POST"])
+def gpt_stream():
+    """
+    Streaming variant of /gpt (server-sent events).
+    - "delta" events carry user-facing text (validation, paraphrased question, CBT guides) as the LLM generates it
+    - a final "question" event carries the complete next question, exactly as /gpt would return it
+    """
+    payload = request.get_json(force=True)
+    user_input = str(payload["user_input"])
+    subject_id = _subject_id(payload)
+
+    events = queue.Queue()
+    def _listener(kind: str, text: str):
+        events.put((kind, text))
+
+    if user_input.lower().strip() == "start":
+        try:
+            session = _sessions.start(subject_id, listener=_listener)
+        except AdmissionRejected as e:
+            return _rejected(subject_id, e)
+    else:
+        try:
+            session = _sessions.answer(subject_id, user_input, listener=_listener)
+        except AdmissionRejected as e:
+            return _rejected(subject_id, e)
+        if session is None:
+            return jsonify({"subject_ID": subject_id, "error": "No session for this subject_ID; send 'start' first."}), 409
+
+    def _generate(timeout_sec=60):
+        deadline = time.time() + timeout_sec
+        try:
+            while True:
+                question = session.channel.take_question(timeout=0)
+                if question is not None:
+                    yield _sse("question", {"subject_ID": subject_id, "question": question})
+                    return
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    yield _sse("question", {"subject_ID": subject_id, "question": ""})
+                    return
+                try:
+                    kind, text = events.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                if kind == "partial":
+                    yield _sse("delta", {"text": text})
+        finally:
+            session.channel.remove_listener(_listener)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(_generate()), mimetype="text/event-stream", headers=headers)
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """
+    Non-interactive scoring of whole transcripts.
+    Payload: {"transcripts": [{"subject_ID": str, "text": str}, ...]}
+    Returns per-transcript scores by dimension label; Report/Notes CSVs are written per subject.
+    """
+    payload = request.get_json(force=True)
+    try:
+        transcripts = check_transcripts(payload.get("transcripts") if isinstance(payload, dict) else None, is_live=_sessions.is_live)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request: {e}"}), 400
+    try:
+        with batch_admission():
+            return jsonify({"results": score_transcripts(transcripts)})
+    except BatchBusy as e:
+        resp = jsonify({"error": f"Server busy ({e}); retry later."})
+        resp.status_code = 429
+        resp.headers["Retry-After"] = str(e.retry_after)
+        return resp
+
 @app.route("/health", methods=["GET"])
 def health():
     """
     Health check endpoint.
-    Returns "running" if RL thread is alive, otherwise "idle".
+    Returns "running" if any RL session is alive, otherwise "idle", plus the number of active sessions.
+    """
+    active = _sessions.active_count()
+    status = "running" if active > 0 else "idle"
+    return jsonify({"status": status, "active_sessions": active})
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Admission and LLM concurrency metrics: active/queued sessions, queue wait times, in-flight LLM calls.
     """
-    status = "running" if (_rl_thread is not None and _rl_thread.is_alive()) else "idle"
-    return jsonify({"status": status})
+    return jsonify({"sessions": _sessions.stats(), "llm": llm_stats(), "local_classifier": classifier_stats(), "classifier_output": classifier_schema_stats()})
 
 if __name__ == "__main__":
     # Entry point for running the Flask server directly.
@@ -135,4 +183,6 @@ if __name__ == "__main__":
     host = os.environ.get("FLASK_HOST", "0.0.0.0")
     port = int(os.environ.get("FLASK_PORT", "8080"))
     debug = os.environ.get("FLASK_DEBUG", "1") == "1"
+    # Open the LLM connection now so the first user turn does not pay for connection setup
+    start_connection_warmup()
     app.run(host=host, port=port, debug=debug)
\ No newline at end of file
@@ -4,7 +4,7 @@ from src.utils.llm_client import llm_complete
 
 # Set up logger for this module
 from src.utils.log_util import get_logger
-from src.utils.io_record import get_resp_log, log_question, set_question_prefix
+from src.utils.io_record import get_resp_log, log_question, set_question_prefix, stream_callback
 logger = get_logger("CBT")
 
 
@@ -270,44 +270,44 @@ Example 2:
 REFRAME: My ideas have value, and sharing them can contribute to the discussion. Others are likely focused on the topic, not on judging me, and speaking up can help me grow more confident.
 '''
 
-def _chat_complete(system_content: str, user_content: str):
-    return llm_complete(system_content, user_content)
+def _chat_complete(system_content: str, user_content: str, on_delta=None, site: str = "default"):
+    return llm_complete(system_content, user_content, on_delta=on_delta, site=site)
 
 def stage0_prompter(history: str) -> str:
     payload = f"HISTORY: {history}"
-    return _chat_complete(PROMPTER_CBT_STAGE0_PROMPT, payload)
+    return _chat_complete(PROMPTER_CBT_STAGE0_PROMPT, payload, site="cbt_prompter")
 
 def stage1_reasoner(statement: str, unhelpful_thoughts: str) -> str:
     payload = f'"STATEMENT: {statement}; UNHELPFUL_THOUGHTS: {unhelpful_thoughts};"'
-    return _chat_complete(REASONER_CBT_STAGE1_PROMPT, payload)
+    return _chat_complete(REASONER_CBT_STAGE1_PROMPT, payload, site="cbt_reasoner")
 
 def stage2_reasoner(statement: str, unhelpful_thoughts: str, challenge: str) -> str:
     payload = f'"STATEMENT: {statement}; UNHELPFUL_THOUGHTS: {unhelpful_thoughts}; CHALLENGE: {challenge};"'
-    return _chat_complete(REASONER_CBT_STAGE2_PROMPT, payload)
+    return _chat_complete(REASONER_CBT_STAGE2_PROMPT, payload, site="cbt_reasoner")
 
 def stage3_reasoner(statement: str, unhelpful_thoughts: str, challenge: str, reframe: str) -> str:
     payload = f'"STATEMENT: {statement}; UNHELPFUL_THOUGHTS: {unhelpful_thoughts}; CHALLENGE: {challenge}; REFRAME: {reframe};"'
-    return _chat_complete(REASONER_CBT_STAGE3_PROMPT, payload)
+    return _chat_complete(REASONER_CBT_STAGE3_PROMPT, payload, site="cbt_reasoner")
 
-def stage1_guide(statement: str) -> str:
+def stage1_guide(statement: str, on_delta=None) -> str:
     payload = f"STATEMENT: {statement}"
-    return _chat_complete(GUIDE_CBT_STAGE1_PROMPT, payload)
+    return _chat_complete(GUIDE_CBT_STAGE1_PROMPT, payload, on_delta, site="cbt_guide")
 
-def stage2_guide(statement: str, unhelpful_thoughts: str) -> str:
+def stage2_guide(statement: str, unhelpful_thoughts: str, on_delta=None) -> str:
     payload = f"STATEMENT: {statement}. UNHELPFUL_THOUGHTS: {unhelpful_thoughts}"
-    return _chat_complete(GUIDE_CBT_STAGE2_PROMPT, payload)
+    return _chat_complete(GUIDE_CBT_STAGE2_PROMPT, payload, on_delta, site="cbt_guide")
 
-def stage3_guide(statement: str, unhelpful_thoughts: str, challenge: str) -> str:
+def stage3_guide(statement: str, unhelpful_thoughts: str, challenge: str, on_delta=None) -> str:
     payload = f"STATEMENT: {statement}. UNHELPFUL_THOUGHTS: {unhelpful_thoughts}. CHALLENGE: {challenge}"
-    return _chat_complete(GUIDE_CBT_STAGE3_PROMPT, payload)
+    return _chat_complete(GUIDE_CBT_STAGE3_PROMPT, payload, on_delta, site="cbt_guide")
 
-def recap_stage3_challenge(statement: str, unhelpful_thoughts: str, challenge: str) -> str:
+def recap_stage3_challenge(statement: str, unhelpful_thoughts: str, challenge: str, on_delta=None) -> str:
     payload = (
         f"STATEMENT: {statement}\n"
         f"UNHELPFUL_THOUGHTS: {unhelpful_thoughts}\n"
         f"CHALLENGE: {challenge}"
     )
-    return _chat_complete(RECAP_CBT_STAGE3_CHALLENGE_PROMPT, payload)
+    return _chat_complete(RECAP_CBT_STAGE3_CHALLENGE_PROMPT, payload, on_delta, site="cbt_recap")
 
 __all__ = [
     "stage0_prompter",
@@ -451,7 +451,7 @@ def run_cbt(question_lib):
     dec1 = "0" if "0" in dec1_raw else "1"
     retry = 0
     while dec1 == "1" and retry < 2:
-        guide1 = stage1_guide(statement)
+        guide1 = stage1_guide(statement, on_delta=stream_callback())
         log_question(guide1)
         log_question("Please provide your UNHELPFUL_THOUGHTS again, in one sentence.")
         unhelpful = get_resp_log()
@@ -483,7 +483,7 @@ def run_cbt(question_lib):
     dec2 = "0" if "0" in dec2_raw else "1"
     retry = 0
     while dec2 == "1" and retry < 2:
-        guide2 = stage2_guide(statement, unhelpful)
+        guide2 = stage2_guide(statement, unhelpful, on_delta=stream_callback())
         log_question(guide2)
         log_question("Please try to CHALLENGE the unhelpful thoughts again, in one sentence.")
         challenge = get_resp_log()
@@ -505,7 +505,7 @@ def run_cbt(question_lib):
         return
 
     # Stage 3: reframe the thought (prepend an LLM-rephrased recap of user's CHALLENGE)
-    recap3 = recap_stage3_challenge(statement, unhelpful, challenge)
+    recap3 = recap_stage3_challenge(statement, unhelpful, challenge, on_delta=stream_callback())
     set_question_prefix(recap3.strip())
     log_question("Finally, can you reframe the unhelpful thought into a more balanced, constructive one?")
     reframe = get_resp_log()
@@ -517,7 +517,7 @@ def run_cbt(question_lib):
     dec3 = "0" if "0" in dec3_raw else "1"
     retry = 0
     while dec3 == "1" and retry < 2:
-        guide3 = stage3_guide(statement, unhelpful, challenge)
+        guide3 = stage3_guide(statement, unhelpful, challenge, on_delta=stream_callback())
         log_question(guide3)
         log_question("Please REFRAME again in one or two sentences.")
         reframe = get_resp_log()
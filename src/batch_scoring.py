@@ -0,0 +1,228 @@
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.config_loader import (
+    BATCH_MAX_REQUESTS,
+    BATCH_MAX_WORKERS,
+    QUESTION_LIB_FILENAME,
+    SERVER_RETRY_AFTER_SEC,
+    SUBJECT_ID,
+    check_subject_id,
+    subject_paths,
+)
+from src.utils.io_question_lib import generate_results, load_question_lib
+from src.utils.io_record import split_segments
+from src.utils.llm_scheduler import llm_priority
+from src.utils.llm_usage import get_ledger, usage_session
+from src.utils.response_bridge import get_dimension_score
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("BatchScoring")
+
+# Context question for free-text transcripts (diaries), which answer no specific question
+TRANSCRIPT_QUESTION = "How has your daily life been recently?"
+
+# Requests scored at once (POST /batch); each one runs up to batch.max_workers LLM calls
+_REQUEST_SLOTS = threading.BoundedSemaphore(BATCH_MAX_REQUESTS) if BATCH_MAX_REQUESTS > 0 else None
+
+
+class BatchBusy(Exception):
+    """
+    Raised by batch_admission when batch.max_requests batches are already being scored.
+    retry_after: seconds the client should wait before trying again.
+    """
+
+    def __init__(self, retry_after: int = SERVER_RETRY_AFTER_SEC):
+        super().__init__(f"{BATCH_MAX_REQUESTS} batches already running")
+        self.retry_after = retry_after
+
+
+@contextmanager
+def batch_admission():
+    """
+    Hold one of the batch.max_requests scoring slots; raises BatchBusy at once when none is free,
+    so the servers answer 429 instead of stacking batches behind live sessions.
+    """
+    if _REQUEST_SLOTS is None:
+        yield
+        return
+    if not _REQUEST_SLOTS.acquire(blocking=False):
+        logger.warning(f"Rejected batch: {BATCH_MAX_REQUESTS} batches already running")
+        raise BatchBusy()
+    try:
+        yield
+    finally:
+        _REQUEST_SLOTS.release()
+
+
+def check_transcripts(
+    transcripts: Any,
+    default_subject_id: str = SUBJECT_ID,
+    is_live: Optional[Callable[[str], bool]] = None,
+) -> List[Dict[str, str]]:
+    """
+    Validate a batch: a list of {"subject_ID": str, "text": str} objects. A missing subject_ID
+    falls back to default_subject_id. Each subject's Report/Notes/Usage files are written once,
+    so a subject_ID may appear only once and (with is_live) must have no running session.
+    Returns the normalized transcripts; raises ValueError (InvalidSubjectID for IDs that are
+    not safe in file names).
+    """
+    if not isinstance(transcripts, list):
+        raise ValueError("Expected {'transcripts': [{'subject_ID': ..., 'text': ...}, ...]}")
+    checked = []
+    seen = set()
+    for n, t in enumerate(transcripts):
+        if not isinstance(t, dict) or not isinstance(t.get("text"), str):
+            raise ValueError(f"transcripts[{n}] must be an object with a string 'text'")
+        subject_id = check_subject_id(t.get("subject_ID") or default_subject_id)
+        if subject_id in seen:
+            raise ValueError(f"transcripts[{n}]: subject_ID {subject_id!r} appears more than once")
+        if is_live is not None and is_live(subject_id):
+            raise ValueError(f"transcripts[{n}]: subject_ID {subject_id!r} has a running session")
+        seen.add(subject_id)
+        checked.append({"subject_ID": subject_id, "text": t["text"]})
+    return checked
+
+
+def _label_index(question_lib: Dict[str, Any]) -> Dict[str, tuple]:
+    """
+    Map each dimension label to its (item, question) position in question_lib.
+    A label used by several items (e.g. "support") maps to the first one.
+    """
+    index = {}
+    for i in range(1, len(question_lib) + 1):
+        for j in range(1, len(question_lib[str(i)]) + 1):
+            label = str(question_lib[str(i)][str(j)]["label"]).lower()
+            index.setdefault(label, (str(i), str(j)))
+    return index
+
+
+def _fill_question_lib(question_lib: Dict[str, Any], segments: List[str], results: List[tuple]) -> list:
+    """
+    Record each classified segment in question_lib the way _if_valid_response records a valid
+    response (score appended, original question/response kept as a note).
+    Returns the per-segment rows for the notes file.
+    """
+    index = _label_index(question_lib)
+    new_response = []
+    for seg, (label, score) in zip(segments, results):
+        new_response.append({
+            "item": label,
+            "question": TRANSCRIPT_QUESTION,
+            "DLA_result": [label, score],
+            "User_input": seg,
+        })
+        pos = index.get(str(label).strip().lower())
+        if pos is None or score not in [0, 1, 2]:
+            continue  # NA, keywords and unknown labels carry no dimension score
+        entry = question_lib[pos[0]][pos[1]]
+        entry["score"].append(score)
+        entry["notes"].append([
+            "original_question: " + TRANSCRIPT_QUESTION,
+            "original_resp: " + seg,
+        ])
+    return new_response
+
+
+def _score_segment(subject_id: str, segment: str) -> tuple:
+    # Nobody is waiting on batch work: it yields rate-limit budget to live sessions
+    with llm_priority("background"), usage_session(subject_id):
+        return get_dimension_score(segment, TRANSCRIPT_QUESTION)
+
+
+def score_transcripts(
+    transcripts: List[Dict[str, str]],
+    max_workers: int = BATCH_MAX_WORKERS,
+    question_lib_filename: str = QUESTION_LIB_FILENAME,
+) -> List[Dict[str, Any]]:
+    """
+    Score many transcripts non-interactively.
+    Inputs:
+      - transcripts: [{"subject_ID": str, "text": str}, ...]
+      - max_workers: concurrent segment classifications across all transcripts
+    Each transcript is segmented like an interactive answer, every segment is classified
+    concurrently, scores and notes are filled into a fresh question_lib, and the subject's
+    Report/Notes CSVs are written with generate_results.
+    Output: one summary per transcript (subject_ID, segment count, scores by label, report paths).
+    """
+    # Subject IDs name the output files: reject unsafe ones (and non-text input) before any work is done
+    transcripts = check_transcripts(transcripts)
+    base_lib = load_question_lib(question_lib_filename)
+    segmented = [split_segments(t["text"]) for t in transcripts]
+    t0 = time.time()
+    # One pool for all segments of all transcripts; openai.max_inflight still caps the LLM calls
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="BatchScoring") as pool:
+        futures = [
+            [pool.submit(_score_segment, t["subject_ID"], seg) for seg in segments]
+            for t, segments in zip(transcripts, segmented)
+        ]
+        summaries = []
+        for transcript, segments, seg_futures in zip(transcripts, segmented, futures):
+            subject_id = transcript["subject_ID"]
+            results = [f.result() for f in seg_futures]
+            question_lib = copy.deepcopy(base_lib)
+            new_response = _fill_question_lib(question_lib, segments, results)
+            paths = subject_paths(subject_id)
+            generate_results(question_lib, new_response, paths["report_file"], paths["notes_file"])
+            get_ledger().write_session(subject_id, paths["usage_file"])
+            scores = {}
+            for i in range(1, len(question_lib) + 1):
+                for j in range(1, len(question_lib[str(i)]) + 1):
+                    entry = question_lib[str(i)][str(j)]
+                    if entry["score"]:
+                        scores[entry["label"]] = entry["score"]
+            summaries.append({
+                "subject_ID": subject_id,
+                "segments": len(segments),
+                "scores": scores,
+                "report_file": paths["report_file"],
+                "usage_file": paths["usage_file"],
+                "notes_file": paths["notes_file"],
+            })
+    elapsed = time.time() - t0
+    rate = 60.0 * len(transcripts) / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Scored {len(transcripts)} transcripts in {elapsed:.1f}s ({rate:.1f} transcripts/min).")
+    return summaries
+
+
+def _read_transcripts(paths: List[str]) -> List[Dict[str, str]]:
+    """
+    .jsonl files hold one {"subject_ID", "text"} object per line; any other file is one
+    transcript whose subject_ID is the file name without extension.
+    """
+    transcripts = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        transcripts.append(json.loads(line))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                subject_id = os.path.splitext(os.path.basename(path))[0]
+                transcripts.append({"subject_ID": subject_id, "text": f.read()})
+    return transcripts
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batch DLA scoring of transcripts (no interaction).")
+    parser.add_argument("inputs", nargs="+", help="transcript .txt files and/or .jsonl files of {subject_ID, text}")
+    parser.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS, help="concurrent segment classifications")
+    args = parser.parse_args(argv)
+    for summary in score_transcripts(_read_transcripts(args.inputs), max_workers=args.workers):
+        print(json.dumps(summary, ensure_ascii=False))
+
+
+__all__ = ["BatchBusy", "batch_admission", "check_transcripts", "score_transcripts", "TRANSCRIPT_QUESTION"]
+
+
+if __name__ == "__main__":
+    main()
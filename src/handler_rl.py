@@ -1,8 +1,9 @@
+import io
+import json
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 import numpy as np
-import os
 import pandas as pd
 
 from src.questioner import ask_question
@@ -13,11 +14,13 @@ from src.utils.config_loader import (
     ALPHA,
     QUESTION_LIB_FILENAME,
     SUBJECT_ID,
-    DATA_DIR,
+    subject_paths,
 )
-from src.utils.config_loader import RECORD_CSV
 from src.utils.io_question_lib import load_question_lib, save_question_lib, generate_results
-from src.utils.io_record import init_record, log_question, set_question_prefix
+from src.utils.io_record import init_record, log_question, set_question_prefix, flush_questions, bind_channel, stream_callback
+from src.utils.session_journal import SessionJournal, bind_journal, is_replaying
+from src.utils.llm_usage import bind_usage_session, get_ledger
+from src.utils.state_store import get_store
 from src.utils.rl_qtables import (
     initialize_q_table,
     choose_action,
@@ -35,7 +38,15 @@ class HandlerRL:
     All file I/O is performed via utility modules.
     """
 
-    def __init__(self):
+    def __init__(self, subject_id: str = SUBJECT_ID, channel=None, journal: Optional[SessionJournal] = None):
+        # Subject this session belongs to; selects the per-subject Q-table, snapshots and reports
+        self.subject_id: str = str(subject_id)
+        self.paths: Dict[str, str] = subject_paths(self.subject_id)
+        # Private turn channel for this session (None: the process-wide channel)
+        self.channel = channel
+        # Replay journal (server sessions): records this session's inputs so it can be suspended,
+        # and restores a suspended session when it holds recorded entries
+        self.journal = journal
         # Stores the last question asked to the user
         self.last_question: str = " "
         # Stores all user responses for later result generation
@@ -51,8 +62,17 @@ class HandlerRL:
         """
         Initialize records, load question library, and set up Q-tables and masks.
         """
-        logger.info("Initializing RL handler setup: loading records and question library.")
-        init_record()
+        logger.info(f"Initializing RL handler setup for subject {self.subject_id}: loading records and question library.")
+        if self.channel is not None:
+            # Route this thread's questions/answers through the session's own channel
+            bind_channel(self.channel)
+        bind_journal(self.journal)
+        bind_usage_session(self.subject_id)
+        if self.journal is not None and self.journal.replaying:
+            # Resuming: keep the channel as is, the answer that woke this session is waiting in it
+            logger.info(f"Resuming subject {self.subject_id} from checkpoint ({len(self.journal.entries)} entries).")
+        else:
+            init_record()
         self.question_lib = load_question_lib(QUESTION_LIB_FILENAME)
         # Define possible actions for item selection (as string indices)
         item_actions = ['{0}'.format(e) for e in np.arange(0, ITEM_N_STATES)]
@@ -68,14 +88,23 @@ class HandlerRL:
         for i in range(1, ITEM_N_STATES):
             self.item_action_labels[str(i)] = self.question_lib[str(i)]["1"]["label"]
   
-        # Load persistent Q tables (if exist)
-        qdir = os.path.join(DATA_DIR, "q_tables")
-        qfile = os.path.join(qdir, f"item_qtable_{SUBJECT_ID}.csv")
-        if os.path.exists(qfile):
-            self.item_q_table = pd.read_csv(qfile, index_col=0)
-            logger.info(f"Loaded item Q table for subject {SUBJECT_ID} from {qfile}.")
+        # Load persistent Q tables (if exist) from the state store
+        stored_q_table = None
+        if self.journal is not None and self.journal.q_table_csv is not None:
+            # The store may already hold this session's update; start from the table it started with
+            self.item_q_table = pd.read_csv(io.StringIO(self.journal.q_table_csv), index_col=0)
+            logger.info(f"Restored item Q table for subject {self.subject_id} from checkpoint.")
         else:
-            logger.info(f"Item Q table for subject {SUBJECT_ID} not found at {qfile}. ")
+            stored_q_table = get_store().get_q_table(self.subject_id)
+        if stored_q_table is not None:
+            self.item_q_table = pd.read_csv(io.StringIO(stored_q_table), index_col=0)
+            logger.info(f"Loaded item Q table for subject {self.subject_id} from the state store.")
+        elif self.journal is None or self.journal.q_table_csv is None:
+            logger.info(f"Item Q table for subject {self.subject_id} not found in the state store. ")
+        if self.journal is not None and self.journal.q_table_csv is None:
+            # Keep the starting table in the journal, and run on its CSV round-trip so replay matches exactly
+            self.journal.q_table_csv = self.item_q_table.to_csv()
+            self.item_q_table = pd.read_csv(io.StringIO(self.journal.q_table_csv), index_col=0)
         
         logger.info("RL handler setup complete.")
 
@@ -100,15 +129,14 @@ class HandlerRL:
                 "- 1–2 short sentences.\n- Friendly, non-judgmental tone.\n"
                 "- No extra headers or labels; output the final greeting directly.\n"
             )
-            greeting = llm_complete(rewrite_system_prompt, greeting_raw).strip()
+            # Same prompt every session: served from the LLM response cache after the first rewrite
+            greeting = llm_complete(rewrite_system_prompt, greeting_raw, on_delta=stream_callback(), cache=True, site="greeting").strip()
             # Use greeting as a prefix so the first substantive question appears immediately
             set_question_prefix(greeting)
-            time.sleep(0.5)
         except Exception as e:
             # If LLM call fails, fall back to raw greeting prefix without blocking the flow
             logger.warning(f"Opening greeting rewrite failed: {e}")
             set_question_prefix(greeting_raw)
-            time.sleep(0.5)
         new_q_table = self.item_q_table.copy()
         S = 0  # Start state for item RL
         is_terminated = False
@@ -145,46 +173,40 @@ class HandlerRL:
             if DLA_terminate == 1:
                 # DLA process signaled termination; proceed to save artifacts
                 is_terminated = True
-                save_filename = QUESTION_LIB_FILENAME.replace(".json", f"_{int(time.time())}.json")
-                save_question_lib(save_filename, self.question_lib)
-                logger.info(f"Saved question library to {save_filename} after DLA termination.")
+                if not is_replaying():  # already saved before the session was suspended
+                    save_filename = self._snapshot_filename()
+                    self._save_question_lib(save_filename)
+                    logger.info(f"Saved question library to {save_filename} after DLA termination.")
                 # log_question("Goodbye. We will do the screening in another time. 886")
                 logger.info("Goodbye. We will do the screening in another time. 886")        # Save results if terminated
-        if is_terminated:
+        if is_terminated and is_replaying():
+            # Artifacts below were written before the session was suspended
+            self.item_q_table = new_q_table
+        elif is_terminated:
             # Persist question library snapshot upon termination
-            save_filename = QUESTION_LIB_FILENAME.replace(".json", f"_{int(time.time())}.json")
-            save_question_lib(save_filename, self.question_lib)
+            save_filename = self._snapshot_filename()
+            self._save_question_lib(save_filename)
             logger.info(f"Saved question library to {save_filename} after session termination.")
             
             # Save Q tables (in parallel with existing results)
-            qdir = os.path.join(DATA_DIR, "q_tables")
-            qfile = os.path.join(qdir, f"item_qtable_{SUBJECT_ID}.csv")
             self.item_q_table = new_q_table
-            dir_preexisted = os.path.exists(qdir)
-            if not dir_preexisted:
-                os.makedirs(qdir, exist_ok=True)
-                logger.info(f"Created q_tables directory at {qdir}.")
-            file_preexisted = os.path.exists(qfile)
-            self.item_q_table.to_csv(qfile)
-            if file_preexisted:
-                logger.info(f"Updated item Q table for subject {SUBJECT_ID} at {qfile}.")
-            else:
-                logger.info(f"Created new item Q table for subject {SUBJECT_ID} at {qfile}.")
+            get_store().put_q_table(self.subject_id, self.item_q_table.to_csv())
+            logger.info(f"Saved item Q table for subject {self.subject_id} to the state store.")
 
         # Run CBT after the screening loop concludes
         run_cbt(self.question_lib)
         logger.info("Completed CBT flow.")
         # Persist question_lib again to capture CBT notes
-        save_filename = QUESTION_LIB_FILENAME.replace(".json", f"_{int(time.time())}.json")
-        save_question_lib(save_filename, self.question_lib)
+        save_filename = self._snapshot_filename()
+        self._save_question_lib(save_filename)
         logger.info(f"Saved question library with CBT notes to {save_filename}.")
 
         # Generate final results for this session
-        generate_results(self.question_lib, self.new_response)
+        generate_results(self.question_lib, self.new_response, self.paths["report_file"], self.paths["notes_file"])
         logger.info("Generated final results for this session.")
 
         # Deliver concluding message (LLM-generated) only if CBT was NOT used
-        # If CBT ran, its own final message is the user-visible conclusion. Avoid double messages due to lock semantics.
+        # If CBT ran, its own final message is the user-visible conclusion. Avoid double messages.
         try:
             cbt_used, cbt_summary = self._detect_cbt_summary()
             if not cbt_used:
@@ -205,11 +227,8 @@ class HandlerRL:
                 user_payload = (
                     f"cbt_used: {str(cbt_used).lower()}\n" + (f"session_summary:\n{cbt_summary}" if cbt_summary else "")
                 )
-                closing = llm_complete(sys_prompt, user_payload).strip()
-                time.sleep(0.5)
+                closing = llm_complete(sys_prompt, user_payload, on_delta=stream_callback(), site="closing").strip()
                 log_question(closing)
-                time.sleep(0.5)
-                self._unlock_question_if_stuck()
             else:
                 logger.info("CBT delivered its own closing; skipping RL-level closing to avoid double message.")
         except Exception as e:
@@ -218,10 +237,24 @@ class HandlerRL:
             cbt_used, _ = self._detect_cbt_summary()
             if not cbt_used:
                 fallback = "Thank you for your time today. Take care, and goodbye."
-                time.sleep(0.5)
                 log_question(fallback)
-                time.sleep(0.5)
-                self._unlock_question_if_stuck()
+
+        # Hand every message still in the outbox (CBT conclusion or closing) to the front-end
+        flush_questions()
+
+        # LLM tokens, time and cost of this session, next to the report
+        usage_file = get_ledger().write_session(self.subject_id, self.paths["usage_file"])
+        if usage_file:
+            logger.info(f"Wrote LLM usage for subject {self.subject_id} to {usage_file}.")
+
+    def _save_question_lib(self, save_filename: str) -> None:
+        """Write a question library snapshot and record it as the subject's latest in the state store."""
+        save_question_lib(save_filename, self.question_lib)
+        get_store().put_question_lib(self.subject_id, json.dumps(self.question_lib))
+
+    def _snapshot_filename(self) -> str:
+        """Timestamped per-subject snapshot path for the question library."""
+        return QUESTION_LIB_FILENAME.replace(".json", f"_{self.subject_id}_{int(time.time())}.json")
 
     def _detect_cbt_summary(self) -> tuple:
         """Return (cbt_used, summary_str) by scanning question_lib notes for CBT markers."""
@@ -249,16 +282,3 @@ class HandlerRL:
             return cbt_used, summary
         except Exception:
             return False, ""
-
-    def _unlock_question_if_stuck(self) -> None:
-        """If Question_Lock remains set after a system message, clear it to avoid blocking."""
-        try:
-            df = pd.read_csv(RECORD_CSV)
-            if int(df.loc[0, "Question_Lock"]) == 1:
-                df.loc[0, "Question_Lock"] = 0
-                tmp_path = RECORD_CSV + ".tmp"
-                df.to_csv(tmp_path, index=False)
-                os.replace(tmp_path, RECORD_CSV)
-                logger.info("Force-unlocked Question_Lock after system message.")
-        except Exception as e:
-            logger.warning(f"Failed to force-unlock Question_Lock: {e}")
\ No newline at end of file
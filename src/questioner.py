@@ -1,20 +1,23 @@
-from typing import List, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any
 
 import numpy as np
 
-from src.utils.response_bridge import get_openai_resp
+from src.utils.answer_rules import question_polarity
+from src.utils.response_bridge import get_openai_resps
 from src.utils.text_generators import (
     generate_change,
-    generate_change_positive,
-    generate_change_negative,
+    generate_change_positive_async,
+    generate_change_negative_async,
     generate_synonymous_sentences,
+    generate_synonymous_sentences_async,
     generate_therapist_chat,
 )
-from src.utils.llm_client import llm_complete
+from src.utils.llm_client import llm_complete, llm_gather
+from src.utils.session_journal import session_rng
 
 # Set up logger for this module
 from src.utils.log_util import get_logger
-from src.utils.io_record import get_answer, get_resp_log, log_question, set_question_prefix
+from src.utils.io_record import get_answer, get_resp_log, log_question, set_question_prefix, stream_callback
 logger = get_logger("Questioner")
 
 from src.reflection_validation import rv_reasoner, rv_guide, rv_validation
@@ -49,37 +52,37 @@ Example C (neither):
 GUIDE: Let us focus on sleeping time: in the past week, have you generally slept enough hours most nights?
 '''
 
-def _chat_complete(system_content: str, user_content: str):
+def _chat_complete(system_content: str, user_content: str, on_delta=None, site: str = "default"):
     """
     Unified LLM entry that delegates to llm_complete.
     """
-    return llm_complete(system_content, user_content)
+    return llm_complete(system_content, user_content, on_delta=on_delta, site=site)
 
-def retry_guide(topic: str, original_question: str, original_answer: str) -> str:
+def retry_guide(topic: str, original_question: str, original_answer: str, on_delta=None) -> str:
     """
     Generate a concise guide to help the user retry answering the same question.
     - Clarify if the user did not understand
     - Ask from a different angle if user is unsure/maybe/doubt
     - Otherwise, restate essence and invite concise answer
+    on_delta, if given, receives the guide text while it streams.
     """
     logger.info("Generating retry guide for re-ask.")
     payload = f'{{"Topic": {topic!r}, "Original Question": {original_question!r}, "Original Answer": {original_answer!r}}}'
-    return _chat_complete(RETRY_GUIDE_SYSTEM_PROMPT, payload)
+    return _chat_complete(RETRY_GUIDE_SYSTEM_PROMPT, payload, on_delta, site="retry_guide")
 
-def classify_segments(user_segments: List[str], original_question: str, dimension_label: str) -> List[Tuple[str, int]]:
+def classify_segments(user_segments: List[str], original_question: str, dimension_label: str, polarity: Optional[str] = None) -> List[Tuple[str, int]]:
     """
     Classifies each user segment using the OpenAI response bridge.
     Returns a list of (dimension, keyword_or_score) tuples for each non-empty segment.
     - For general answers (Yes/No/Stop/Maybe/Question): (dimension_label, Keyword)
     - For scored outputs: (dimension, score:int in [0,1,2])
+    polarity: whether Yes is the healthy answer to the question ("positive") or not ("negative").
     """
     logger.info("Classifying user segments. Total segments: %d", len(user_segments))
+    # Skip empty segments; the rest go through one batched LLM call where needed
+    segments = [seg for seg in user_segments if seg]
     result = []
-    for seg in user_segments:
-        if not seg:
-            # Skip empty segments
-            continue
-        label, score = get_openai_resp(seg, original_question, dimension_label)
+    for seg, (label, score) in zip(segments, get_openai_resps(segments, original_question, dimension_label, polarity)):
         logger.debug("Segment classified: '%s' -> (dim: %s, val: %s)", seg, label, str(score))
         result.append((label, score))
     logger.info("Classification complete. Results: %s", str(result))
@@ -124,11 +127,16 @@ def _if_valid_response(
 
             if score > 1:
                 text = question_lib[str(item_index)][str(question_index)]["question"][0]
+                # Inputs are fixed question_lib text, so the rewrites are cached across sessions;
+                # the statement and the follow-up rewrite are independent and run concurrently
                 if str(score_norm) == "Yes":
-                    text = generate_change_positive(text)
+                    change = generate_change_positive_async(text, cache=True)
                 else:
-                    text = generate_change_negative(text)
-                followup = generate_synonymous_sentences(" Can you tell me more about it?")
+                    change = generate_change_negative_async(text, cache=True)
+                text, followup = llm_gather(
+                    change,
+                    generate_synonymous_sentences_async(" Can you tell me more about it?", cache=True),
+                )
                 followup_to_RV = "It seems that " + text + " " + followup
 
             # Prepare note for follow-up, to be appended by caller after collecting follow-up
@@ -205,13 +213,13 @@ def evaluate_result(question_lib, DLA_result, S, question_A, user_input, origina
         if rv_decision_token == "1":
             logger.info("Follow-up not related, generating guidance and recollecting follow-up.")
             user_response_0 = user_response
-            rv_guide_text = rv_guide(topic, original_question_asked, original_resp, user_response)
+            rv_guide_text = rv_guide(topic, original_question_asked, original_resp, user_response, on_delta=stream_callback())
             log_question(rv_guide_text)
             user_response = get_resp_log()
 
         # Empathic validation
         logger.info("Running ReflectionValidation empathic validation.")
-        rv_validation_text = rv_validation(topic, original_question_asked, original_resp, user_response)
+        rv_validation_text = rv_validation(topic, original_question_asked, original_resp, user_response, on_delta=stream_callback())
         # Set validation text to be prepended to the next user-facing question
         set_question_prefix(rv_validation_text)
         logger.info("Queued RV validation to prepend before next question output.")
@@ -255,11 +263,12 @@ def ask_question(question_lib, S: int) -> Tuple[float, int, str]:
             # Get the number of available question variants for this item
             number_of_questions = len(question_lib[str(S)][str(question_A)]["question"])
             # Randomly select one question variant to ask
-            choice_of_question = np.random.randint(number_of_questions)
+            rng = session_rng()
+            choice_of_question = rng.randint(number_of_questions)
             question_text = question_lib[str(S)][str(question_A)]["question"][choice_of_question]
             # With probability, generate a synonymous version of the question
-            if np.random.uniform() < 0.95:
-                question_text = generate_synonymous_sentences(question_text)
+            if rng.uniform() < 0.95:
+                question_text = generate_synonymous_sentences(question_text, on_delta=stream_callback())
             # Concatenate the last question (context) with the current question
             question_text_ask = question_text
             # Log the question being asked
@@ -268,7 +277,8 @@ def ask_question(question_lib, S: int) -> Tuple[float, int, str]:
             _ , user_input = get_answer()
             # Classify the user response into DLA result segments
             dimension_label = question_lib[str(S)][str(question_A)]["label"]
-            DLA_result = [[label, score] for (label, score) in classify_segments(user_input, question_text, dimension_label)]
+            polarity = question_polarity(question_lib[str(S)][str(question_A)])
+            DLA_result = [[label, score] for (label, score) in classify_segments(user_input, question_text, dimension_label, polarity)]
             # Evaluate the result and update state
             valid, DLA_terminate, previous_question, question_lib = evaluate_result(
                 question_lib, DLA_result, S, question_A, user_input, question_text
@@ -280,13 +290,14 @@ def ask_question(question_lib, S: int) -> Tuple[float, int, str]:
                 # Generate a concise retry guide based on topic, original question, and original answer
                 topic = question_lib[str(S)][str(question_A)]["label"]
                 original_answer_text = " ".join(user_input) if user_input else ""
-                guide_text = retry_guide(topic, question_text, original_answer_text)
+                guide_text = retry_guide(topic, question_text, original_answer_text, on_delta=stream_callback())
                 # Show the guide to the user and collect a new response
                 log_question(guide_text)
                 _ , user_input = get_answer()
                 # Classify the new user response
                 dimension_label = question_lib[str(S)][str(question_A)]["label"]
-                DLA_result = [[label, score] for (label, score) in classify_segments(user_input, question_text, dimension_label)]
+                polarity = question_polarity(question_lib[str(S)][str(question_A)])
+                DLA_result = [[label, score] for (label, score) in classify_segments(user_input, question_text, dimension_label, polarity)]
                 # Re-evaluate the new answer and update state accordingly
                 valid, DLA_terminate, previous_question, question_lib = evaluate_result(
                     question_lib, DLA_result, S, question_A, user_input, question_text
@@ -130,11 +130,11 @@ VALIDATION: It sounds like you're going through a really challenging time. The s
 
 '''
 
-def _chat_complete(system_content: str, user_content: str):
+def _chat_complete(system_content: str, user_content: str, on_delta=None, site: str = "default"):
     """
     Unified LLM entry that delegates to llm_complete.
     """
-    return llm_complete(system_content, user_content)
+    return llm_complete(system_content, user_content, on_delta=on_delta, site=site)
 
 def rv_reasoner(topic: str, original_question: str, original_response: str, follow_up_response: str) -> str:
     """
@@ -143,22 +143,22 @@ def rv_reasoner(topic: str, original_question: str, original_response: str, foll
     """
     logger.info("Running reflection validation reasoner.")
     payload = f'{{"Topic": {topic!r}, "Original Question": {original_question!r}, "Original Response": {original_response!r}, "Follow Up Response": {follow_up_response!r}}}'
-    return _chat_complete(RV_FOLLOW_UP_SYSTEM_REASONER_PROMPT, payload)
+    return _chat_complete(RV_FOLLOW_UP_SYSTEM_REASONER_PROMPT, payload, site="rv_reasoner")
 
-def rv_guide(topic: str, original_question: str, original_response: str, follow_up_response: str) -> str:
+def rv_guide(topic: str, original_question: str, original_response: str, follow_up_response: str, on_delta=None) -> str:
     """
     Use the guide prompt to help the user provide a more relevant follow-up response.
-    Returns the guide as a string.
+    Returns the guide as a string; on_delta receives the text while it streams.
     """
     logger.info("Running reflection validation guide.")
     payload = f'{{"Topic": {topic!r}, "Original Question": {original_question!r}, "Original Response": {original_response!r}, "Follow-up Response": {follow_up_response!r}}}'
-    return _chat_complete(RV_FOLLOW_UP_GUIDE_SYSTEM_PROMPT, payload)
+    return _chat_complete(RV_FOLLOW_UP_GUIDE_SYSTEM_PROMPT, payload, on_delta, site="rv_guide")
 
-def rv_validation(topic: str, original_question: str, original_response: str, follow_up_response: str) -> str:
+def rv_validation(topic: str, original_question: str, original_response: str, follow_up_response: str, on_delta=None) -> str:
     """
     Use the validation prompt to provide empathic validation and support to the user.
-    Returns the validation as a string.
+    Returns the validation as a string; on_delta receives the text while it streams.
     """
     logger.info("Running reflection validation support/validation.")
     payload = f'{{"Topic": {topic!r}, "Original Question": {original_question!r}, "Original Response": {original_response!r}, "Follow-up Response": {follow_up_response!r}}}'
-    return _chat_complete(RV_FOLLOW_UP_VALIDATION_SYSTEM_PROMPT, payload)
+    return _chat_complete(RV_FOLLOW_UP_VALIDATION_SYSTEM_PROMPT, payload, on_delta, site="rv_validation")
@@ -160,25 +160,80 @@ Example 3:
 REPHRASER: Have you noticed any significant changes in your weight lately?
 '''
 
-def _chat_complete(system_content: str, user_content: str):
+# Appended to the classifier payload in structured-output mode (the system prompt stays shared)
+STRUCTURED_CLASSIFIER_HINT = (
+    "Return JSON: label is the DIMENSION (or Yes, No, Maybe, Question, Stop; Other when the answer "
+    "matches no dimension) and score is the SCORE (0 for Yes, No, Maybe, Question, Stop and Other)."
+)
+
+def _chat_complete(system_content: str, user_content: str, site: str = "default", text_format=None):
     """
     Unified LLM entry that delegates to llm_complete.
     """
-    return llm_complete(system_content, user_content)
+    return llm_complete(system_content, user_content, site=site, text_format=text_format)
+
+def _classify_payload(user_input: str, original_question: str, structured: bool = False) -> str:
+    # Provide both the question and the answer to improve contextual classification
+    payload = f"Question: {original_question}\nAnswer: {user_input}"
+    return payload + "\n" + STRUCTURED_CLASSIFIER_HINT if structured else payload
 
-def classify_dimension_and_score(user_input: str, original_question: str) -> str:
+def classify_dimension_and_score(user_input: str, original_question: str, text_format=None) -> str:
     """
     Classify user input into a dimension and score using the OpenAI API.
     Input: user_input (str) - any user response string.
            original_question (str) - the original question being answered.
-    Output: Raw model text, e.g., 'weight, 2' or 'Yes, 0'.
+           text_format (dict, optional) - structured-output format (see classifier_schema).
+    Output: Raw model text, e.g., 'weight, 2' or 'Yes, 0';
+            with text_format, JSON such as '{"label": "weight", "score": 2}'.
     """
     logger.info("Classifying user input for dimension and score.")
     logger.debug(f"Original question: {original_question}")
     logger.debug(f"User input: {user_input}")
-    # Provide both the question and the answer to improve contextual classification
-    payload = f"Question: {original_question}\nAnswer: {user_input}"
-    return _chat_complete(INIT_ASKER_SYSTEM_PROMPT_V2, payload)
+    payload = _classify_payload(user_input, original_question, text_format is not None)
+    return _chat_complete(INIT_ASKER_SYSTEM_PROMPT_V2, payload, site="classify", text_format=text_format)
+
+def repair_classification(user_input: str, original_question: str, previous: str, error: str, text_format) -> str:
+    """
+    Ask the classifier again for a structured reply that failed validation, quoting the rejected
+    reply and the reason. Output: raw model text (JSON per text_format).
+    """
+    logger.info(f"Repairing classifier output: {error}")
+    payload = (
+        _classify_payload(user_input, original_question, True)
+        + f"\nYour previous reply was rejected ({error}): {str(previous)[:200]}\nReply again in the required JSON format."
+    )
+    return _chat_complete(INIT_ASKER_SYSTEM_PROMPT_V2, payload, site="classify", text_format=text_format)
+
+def _batch_payload(segments, original_question: str, structured: bool = False) -> str:
+    """
+    Numbered answer segments under one question, asking for one classification line per segment
+    (or, structured, one results entry per segment).
+    The system prompt stays the single-answer classifier prompt so both share its cached prefix.
+    """
+    lines = "\n".join(f"{i}. {seg}" for i, seg in enumerate(segments, 1))
+    head = f"Question: {original_question}\nAnswers (classify each numbered answer on its own):\n{lines}\n"
+    if structured:
+        return head + (
+            f"Return JSON with one results entry for each of the {len(segments)} answers: index is the "
+            "answer's number; label and score as for a single answer. " + STRUCTURED_CLASSIFIER_HINT
+        )
+    return head + (
+        f"Reply with exactly {len(segments)} lines in the same order, formatted as "
+        "'<number>. <result>' where <result> is what you would answer for that single answer."
+    )
+
+def classify_segments_batch(segments, original_question: str, text_format=None) -> str:
+    """
+    Classify several segments of one answer in a single LLM call.
+    Input: segments (list of str), original_question (str), text_format (dict, optional).
+    Output: Raw model text with one numbered line per segment, e.g. '1. weight, 2\n2. Yes, 0';
+            with text_format, JSON such as '{"results": [{"index": 1, "label": "weight", "score": 2}]}'.
+    """
+    logger.info(f"Classifying {len(segments)} answer segments in one call.")
+    logger.debug(f"Original question: {original_question}")
+    logger.debug(f"Segments: {segments}")
+    payload = _batch_payload(segments, original_question, text_format is not None)
+    return _chat_complete(INIT_ASKER_SYSTEM_PROMPT_V2, payload, site="classify", text_format=text_format)
 
 def reflective_summarizer(original_question: str, user_response: str) -> str:
     """
@@ -189,7 +244,7 @@ def reflective_summarizer(original_question: str, user_response: str) -> str:
     logger.info("Generating reflective summary for user response.")
     logger.debug(f"Original question: {original_question}, User response: {user_response}")
     payload = f'{{"Original Question": "{original_question}", "User Response": "{user_response}"}}'
-    return _chat_complete(REFLECTIVE_SUMMERIZER_PROMPT, payload)
+    return _chat_complete(REFLECTIVE_SUMMERIZER_PROMPT, payload, site="summarizer")
 
 def rephrase_question(original_question: str) -> str:
     """
@@ -200,4 +255,4 @@ def rephrase_question(original_question: str) -> str:
     logger.info("Rephrasing question for therapist style.")
     logger.debug(f"Original question: {original_question}")
     payload = f'{{"Original Question": "{original_question}"}}'
-    return _chat_complete(REPHRASER_PROMPT, payload)
\ No newline at end of file
+    return _chat_complete(REPHRASER_PROMPT, payload, site="rephrase")
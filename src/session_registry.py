@@ -0,0 +1,333 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from src.handler_rl import HandlerRL
+from src.utils.config_loader import (
+    SERVER_MAX_ACTIVE_SESSIONS,
+    SERVER_MAX_QUEUED_SESSIONS,
+    SERVER_QUEUE_TIMEOUT_SEC,
+    SERVER_RETRY_AFTER_SEC,
+    STORE_CHECKPOINT_EVERY_TURN,
+    subject_paths,
+)
+from src.utils.llm_usage import get_ledger
+from src.utils.session_journal import (
+    SessionJournal,
+    SessionSuspended,
+    delete_checkpoint,
+    has_checkpoint,
+    load_checkpoint,
+)
+from src.utils.turn_channel import MemoryTurnChannel
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("SessionRegistry")
+
+# Finished sessions are kept this long so the front-end can still collect the closing message
+FINISHED_SESSION_TTL_SEC = 300
+# Admission wait times kept for the p95 reported by stats()
+_WAIT_SAMPLES = 256
+
+
+def _parked_usage_file(subject_id: str) -> str:
+    """Where a suspended session keeps its LLM usage until it resumes."""
+    return subject_paths(subject_id)["usage_file"] + ".suspended"
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised by SessionRegistry.start when a new session cannot be admitted
+    (admission queue full, or no slot freed up within the queue timeout).
+    retry_after: seconds the client should wait before trying again.
+    """
+
+    def __init__(self, reason: str, retry_after: int = SERVER_RETRY_AFTER_SEC):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Session:
+    """
+    One screening session: a HandlerRL running in its own thread, bound to a private
+    in-process turn channel. Per-subject paths (Q-table, snapshots, reports) come from HandlerRL.
+    A session left idle past server.idle_suspend_sec is checkpointed to disk and its thread
+    exits (suspended); start(journal) later resumes it from that checkpoint.
+    """
+
+    def __init__(self, subject_id: str, on_finish: Optional[Callable[["Session"], None]] = None):
+        self.subject_id = str(subject_id)
+        self.on_finish = on_finish
+        self.channel = MemoryTurnChannel()
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.suspended = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, journal: Optional[SessionJournal] = None) -> None:
+        """
+        Run HandlerRL in a new thread. With a journal loaded from a checkpoint, the suspended
+        session is resumed; otherwise a fresh session starts. Either way the stored checkpoint is
+        dropped: the journal now lives in memory until the session is suspended again (or, with
+        store.checkpoint_every_turn, re-saved at every question). A resumed session also takes back
+        the LLM usage it parked on disk when it was suspended.
+        """
+        parked_usage = _parked_usage_file(self.subject_id)
+        if journal is None:
+            journal = SessionJournal(self.subject_id)
+            if os.path.exists(parked_usage):
+                os.remove(parked_usage)  # left by a suspended session that is now started afresh
+        else:
+            get_ledger().restore_session(self.subject_id, parked_usage)
+        journal.autosave = STORE_CHECKPOINT_EVERY_TURN
+        delete_checkpoint(self.subject_id)
+        self.finished_at = None
+        self.suspended = False
+
+        def _runner():
+            logger.info(f"RL thread started for subject {self.subject_id}")
+            try:
+                HandlerRL(subject_id=self.subject_id, channel=self.channel, journal=journal).run()  # Main RL workflow
+                delete_checkpoint(self.subject_id)
+            except SessionSuspended as e:
+                try:
+                    journal.save()
+                    self.suspended = True
+                    # The LLM usage so far waits on disk, so the ledger holds nothing for an idle session
+                    get_ledger().write_session(self.subject_id, parked_usage)
+                    logger.info(f"Suspended idle session for subject {self.subject_id} ({e}).")
+                except Exception as save_error:
+                    logger.warning(f"Failed to checkpoint session for subject {self.subject_id}: {save_error}")
+            except Exception as e:
+                logger.warning(f"RL thread for subject {self.subject_id} failed: {e}")
+                delete_checkpoint(self.subject_id)
+                self._flush_usage()
+            finally:
+                logger.info(f"RL thread finished for subject {self.subject_id}")
+                if self.on_finish is not None:
+                    self.on_finish(self)
+                else:
+                    self.finished_at = time.time()
+
+        self.thread = threading.Thread(target=_runner, name=f"HandlerRL-{self.subject_id}", daemon=True)
+        self.thread.start()
+
+    def _flush_usage(self) -> None:
+        """Write the usage of a session that ended without its report, so the ledger forgets it."""
+        try:
+            get_ledger().write_session(self.subject_id, subject_paths(self.subject_id)["usage_file"])
+        except OSError as e:
+            logger.warning(f"Failed to write LLM usage for subject {self.subject_id}: {e}")
+            get_ledger().discard_session(self.subject_id)
+
+    def is_alive(self) -> bool:
+        # finished_at is set before the thread exits, so a finishing session already frees its slot
+        return self.thread is not None and self.thread.is_alive() and self.finished_at is None
+
+
+class SessionRegistry:
+    """
+    Thread-safe map subject_ID -> Session, so one server process can run many screenings.
+    New sessions are admitted only while fewer than max_active sessions are running; further
+    "start" requests wait in a bounded FIFO queue and are rejected when it is full or when
+    they wait longer than queue_timeout seconds (0 = unlimited for both limits).
+    """
+
+    def __init__(
+        self,
+        max_active: int = SERVER_MAX_ACTIVE_SESSIONS,
+        max_queued: int = SERVER_MAX_QUEUED_SESSIONS,
+        queue_timeout: float = SERVER_QUEUE_TIMEOUT_SEC,
+    ):
+        self._sessions: Dict[str, Session] = {}
+        self._cond = threading.Condition()
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        # FIFO of tickets for "start" requests waiting to be admitted
+        self._waiting: deque = deque()
+        self._admitted = 0
+        self._rejected = 0
+        self._resumed = 0
+        self._waits: deque = deque(maxlen=_WAIT_SAMPLES)
+
+    def start(self, subject_id: str, listener=None) -> Session:
+        """
+        Return the running session for subject_id, or start a new one once admitted.
+        listener, if given, is attached to the session's channel before its RL thread starts,
+        so no streamed text is missed.
+        Raises AdmissionRejected when the session cannot be admitted.
+        """
+        sid = str(subject_id)
+        with self._cond:
+            self._prune()
+            session = self._live_session(sid)
+            if session is None:
+                waited = self._admit(sid)
+                # Another request for the same subject may have started it while we waited
+                session = self._live_session(sid)
+                if session is None:
+                    session = Session(sid, on_finish=self._on_finish)
+                    if listener is not None:
+                        session.channel.add_listener(listener)
+                    self._sessions[sid] = session
+                    self._admitted += 1
+                    self._waits.append(waited)
+                    session.start()
+                    return session
+            if listener is not None:
+                session.channel.add_listener(listener)
+            return session  # RL thread is already running
+
+    def answer(self, subject_id: str, text: str, listener=None) -> Optional[Session]:
+        """
+        Hand the user's answer to subject_id's session, resuming it first if it was suspended
+        (resuming goes through admission control and may raise AdmissionRejected).
+        Returns the session, or None if subject_id has no session.
+        """
+        sid = str(subject_id)
+        with self._cond:
+            session = self._sessions.get(sid)
+            if (session is None or not session.is_alive()) and has_checkpoint(sid):
+                session = self._resume(sid, session)
+            if session is None:
+                return None
+            if listener is not None:
+                session.channel.add_listener(listener)
+            session.channel.put_answer(text)
+            return session
+
+    def get(self, subject_id: str) -> Optional[Session]:
+        with self._cond:
+            return self._sessions.get(str(subject_id))
+
+    def is_live(self, subject_id: str) -> bool:
+        """True while subject_id has a running session."""
+        with self._cond:
+            return self._live_session(str(subject_id)) is not None
+
+    def active_count(self) -> int:
+        with self._cond:
+            return self._active()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Admission counters and queue wait times (for the server's /metrics endpoint).
+        """
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                "active_sessions": self._active(),
+                "max_active_sessions": self.max_active,
+                "queued_sessions": len(self._waiting),
+                "max_queued_sessions": self.max_queued,
+                "admitted_total": self._admitted,
+                "rejected_total": self._rejected,
+                "suspended_sessions": sum(1 for s in self._sessions.values() if s.suspended),
+                "resumed_total": self._resumed,
+                "queue_wait_avg_ms": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "queue_wait_p95_ms": round(1000 * waits[math.ceil(0.95 * len(waits)) - 1], 1) if waits else 0.0,
+                "queue_wait_max_ms": round(1000 * waits[-1], 1) if waits else 0.0,
+            }
+
+    def _resume(self, sid: str, session: Optional[Session]) -> Optional[Session]:
+        """
+        Admit and restart a suspended session from its checkpoint (lock held).
+        """
+        waited = self._admit(sid)
+        live = self._live_session(sid)
+        if live is not None:
+            return live  # resumed by a concurrent request while we waited
+        journal = load_checkpoint(sid)
+        if journal is None:
+            return session
+        if session is None:
+            # Pruned (or the server restarted) while suspended
+            session = Session(sid, on_finish=self._on_finish)
+            self._sessions[sid] = session
+        self._admitted += 1
+        self._resumed += 1
+        self._waits.append(waited)
+        session.start(journal)
+        return session
+
+    def _admit(self, sid: str) -> float:
+        """
+        Wait (lock held via the condition) until this request may start a session.
+        Returns the time spent queued; raises AdmissionRejected on a full queue or timeout.
+        """
+        if self._has_capacity() and not self._waiting:
+            return 0.0
+        if self.max_queued > 0 and len(self._waiting) >= self.max_queued:
+            self._rejected += 1
+            logger.warning(f"Rejected session for subject {sid}: admission queue full ({len(self._waiting)} waiting)")
+            raise AdmissionRejected("admission queue full")
+        ticket = object()
+        self._waiting.append(ticket)
+        t0 = time.time()
+        deadline = t0 + self.queue_timeout if self.queue_timeout > 0 else None
+        try:
+            while not (self._waiting[0] is ticket and self._has_capacity()):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    self._rejected += 1
+                    logger.warning(f"Rejected session for subject {sid}: not admitted within {self.queue_timeout}s")
+                    raise AdmissionRejected("admission queue timeout")
+                self._cond.wait(remaining)
+        finally:
+            self._waiting.remove(ticket)
+            self._cond.notify_all()  # next ticket may now be at the head
+        waited = time.time() - t0
+        logger.info(f"Admitted session for subject {sid} after {waited:.2f}s in queue")
+        return waited
+
+    def _has_capacity(self) -> bool:
+        return self.max_active <= 0 or self._active() < self.max_active
+
+    def _active(self) -> int:
+        return sum(1 for s in self._sessions.values() if s.is_alive())
+
+    def _live_session(self, sid: str) -> Optional[Session]:
+        session = self._sessions.get(sid)
+        return session if session is not None and session.is_alive() else None
+
+    def _on_finish(self, session: Session) -> None:
+        """
+        Mark the session finished and wake queued "start" requests. An answer that arrived while
+        the session was suspending is still in its channel: resume right away so it is not lost.
+        """
+        with self._cond:
+            session.finished_at = time.time()
+            if session.suspended:
+                pending = session.channel.take_answer(timeout=0)
+                if pending is not None:
+                    session.channel.put_answer(pending)
+                    journal = load_checkpoint(session.subject_id)
+                    if journal is not None:
+                        logger.info(f"Answer arrived while suspending subject {session.subject_id}; resuming.")
+                        self._resumed += 1
+                        session.start(journal)
+            self._cond.notify_all()
+
+    def _prune(self) -> None:
+        """
+        Drop sessions that finished more than FINISHED_SESSION_TTL_SEC ago, with any LLM usage the
+        ledger still holds for them (calls recorded after the usage file was written).
+        """
+        now = time.time()
+        stale = [
+            sid for sid, s in self._sessions.items()
+            if not s.is_alive() and s.finished_at is not None and now - s.finished_at > FINISHED_SESSION_TTL_SEC
+        ]
+        for sid in stale:
+            del self._sessions[sid]
+            if get_ledger().discard_session(sid):
+                logger.info(f"Dropped leftover LLM usage of pruned session {sid}.")
+
+
+__all__ = ["AdmissionRejected", "Session", "SessionRegistry"]
@@ -0,0 +1,247 @@
+import argparse
+import glob
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.config_loader import ANSWER_RULES_PATH
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("AnswerRules")
+
+KEYWORDS = ("Yes", "No", "Maybe", "Question", "Stop")
+_FLIP = {"Yes": "No", "No": "Yes", "good": "bad", "bad": "good"}
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Trie node key holding the rule that ends at this node
+_END = ""
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(str(text).lower().replace("’", "'"))
+
+
+def question_polarity(entry: Dict[str, Any]) -> Optional[str]:
+    """
+    "positive" when answering Yes is the healthy answer to a question_lib entry ("Yes": 0, "No": 2),
+    "negative" when it is the concerning one, None when the entry does not say.
+    """
+    yes, no = entry.get("Yes"), entry.get("No")
+    if not isinstance(yes, int) or not isinstance(no, int) or yes == no:
+        return None
+    return "positive" if yes < no else "negative"
+
+
+class AnswerMatcher:
+    """
+    Resolves general answers (Yes/No/Maybe/Question/Stop) from the phrase rules in a data file,
+    compiled into a token trie: matching walks each start position once, so an answer costs a
+    few microseconds. Returns None whenever the answer needs the classifier:
+    - no rule matched, or matches disagree (e.g. "yes and no")
+    - a stop phrase in an answer ending in "?" (any other answer ending in "?" is a Question)
+    - a contrast word followed by more content ("no, but I feel terrible")
+    - a defer phrase
+    - a stop phrase next to words that are not filler ("I need to quit smoking", "I can't stop eating")
+    - only bare phrases ("I do", "sometimes", "fine") matched, next to words that are not filler
+      (an explicit "yes"/"no" carries the answer on its own, as in "Yes, I do yoga")
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.version = rules.get("version")
+        self.max_tokens = int(rules.get("max_tokens", 10))
+        self.filler = set(rules.get("filler", []))
+        self.negators = set(rules.get("negators", []))
+        self.negation_window = int(rules.get("negation_window", 2))
+        self.contrast = set(rules.get("contrast", []))
+        self.contrast_min_tokens = int(rules.get("contrast_min_tokens", 2))
+        self._trie: Dict[str, Any] = {}
+        for keyword, phrases in (rules.get("phrases") or {}).items():
+            self._add(phrases, ("any", keyword))
+        for keyword, phrases in (rules.get("bare_phrases") or {}).items():
+            self._add(phrases, ("bare", keyword))
+        for value, phrases in (rules.get("polarity") or {}).items():
+            self._add(phrases, ("polarity", value))
+        self._add(rules.get("defer", []), ("defer", None))
+
+    def _add(self, phrases: List[str], rule: Tuple[str, Optional[str]]) -> None:
+        for phrase in phrases:
+            node = self._trie
+            for tok in _tokens(phrase):
+                node = node.setdefault(tok, {})
+            node[_END] = rule
+
+    def _longest(self, tokens: List[str], start: int) -> Tuple[Optional[Tuple[str, Optional[str]]], int]:
+        node, rule, end = self._trie, None, start
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            if _END in node:
+                rule, end = node[_END], i + 1
+        return rule, end
+
+    def match(self, text: str, polarity: Optional[str] = None) -> Optional[str]:
+        """
+        The keyword the answer resolves to, or None to classify it.
+        polarity: "positive" / "negative" question (see question_polarity), for good/bad phrases.
+        """
+        tokens = _tokens(text)
+        if not tokens:
+            return None
+        found = set()
+        first_end = None
+        bare = explicit = False
+        covered = set()
+        i, limit = 0, min(len(tokens), self.max_tokens)
+        while i < limit:
+            rule, end = self._longest(tokens, i)
+            if rule is None:
+                i += 1
+                continue
+            kind, value = rule
+            if kind == "defer":
+                return None
+            bare = bare or kind in ("bare", "polarity")
+            explicit = explicit or kind == "any"
+            covered.update(range(i, end))
+            negated = any(t in self.negators for t in tokens[max(0, i - self.negation_window):i])
+            if negated:
+                if value not in _FLIP:
+                    return None
+                value = _FLIP[value]
+            if kind == "polarity":
+                if polarity not in ("positive", "negative"):
+                    return None
+                value = ("Yes" if value == "good" else "No") if polarity == "positive" else ("No" if value == "good" else "Yes")
+            found.add(value)
+            if first_end is None:
+                first_end = end
+            i = end
+        if text.strip().endswith("?"):
+            # Asked back, the answer is a question whatever yes/no words it holds ("Is there no option?");
+            # a stop asked as a question ("Can we stop?") is left to the classifier
+            return None if "Stop" in found else "Question"
+        if not found:
+            return None
+        if "Stop" in found:
+            # Stop ends the session: only as a command on its own ("I quit drinking" is an answer)
+            if any(t not in self.filler for j, t in enumerate(tokens) if j not in covered):
+                return None
+            return "Stop"
+        if len(found) > 1:
+            return None
+        if bare and not explicit and any(t not in self.filler and t not in self.negators for j, t in enumerate(tokens) if j not in covered):
+            return None
+        for j in range(first_end, len(tokens)):
+            if tokens[j] in self.contrast and len(tokens) - j - 1 >= self.contrast_min_tokens:
+                return None
+        return found.pop()
+
+
+def load_matcher(path: str = ANSWER_RULES_PATH) -> Optional[AnswerMatcher]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            matcher = AnswerMatcher(json.load(f))
+        logger.info(f"Loaded answer rules {path} (version {matcher.version})")
+        return matcher
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to load answer rules {path}: {e}; using the built-in keyword scan.")
+        return None
+
+
+_MATCHER: Optional[AnswerMatcher] = load_matcher()
+
+
+def legacy_quick_token(text: str) -> Optional[str]:
+    """
+    The previous shortcut: a literal stop/yes/no/maybe/question token in the first 10 words.
+    """
+    lower = [t.lower() for t in text.replace(".", " ").replace(",", " ").replace("?", " ").split()[:10]]
+    for token in ("stop", "yes", "no", "maybe", "question"):
+        if token in lower:
+            return token.capitalize()
+    return None
+
+
+def match_answer(text: str, polarity: Optional[str] = None) -> Optional[str]:
+    """
+    General-answer keyword for text ("Yes", "No", "Maybe", "Question", "Stop") or None.
+    Falls back to the literal keyword scan when the rules file could not be loaded.
+    """
+    if _MATCHER is None:
+        return legacy_quick_token(text)
+    return _MATCHER.match(text, polarity)
+
+
+# === Benchmark ===
+
+def _real_answers(lib_glob: str) -> List[Tuple[str, Optional[str]]]:
+    """(answer, question polarity) of every original_resp saved in question_lib snapshots."""
+    answers = set()
+    for path in glob.glob(lib_glob):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lib = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for item in lib.values():
+            for entry in (item.values() if isinstance(item, dict) else []):
+                if not isinstance(entry, dict):
+                    continue
+                for note in entry.get("notes", []):
+                    for x in (note if isinstance(note, list) else []):
+                        if str(x).startswith("original_resp:"):
+                            answers.add((str(x)[len("original_resp:"):].strip(), question_polarity(entry)))
+    return sorted(answers, key=lambda a: (a[0], a[1] or ""))
+
+
+def benchmark(corpus_path: str, lib_glob: str = "data/libs/question_lib_*.json") -> Dict[str, Any]:
+    """
+    Compare the rule matcher with the legacy token scan:
+    - on a labeled corpus ({"answer", "polarity", "expected"} per line; expected null = needs the
+      classifier): share resolved without the LLM, and how many of those were right
+    - on the answers saved in question_lib snapshots (unlabeled): share resolved
+    - matching time per answer
+    """
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+    report: Dict[str, Any] = {"corpus": len(corpus)}
+    for name, fn in (("legacy", lambda a, p: legacy_quick_token(a)), ("rules", match_answer)):
+        got = [fn(c["answer"], c.get("polarity")) for c in corpus]
+        resolved = [(g, c.get("expected")) for g, c in zip(got, corpus) if g is not None]
+        report[name] = {
+            "resolved": round(len(resolved) / max(1, len(corpus)), 3),
+            "resolved_correct": round(sum(g == e for g, e in resolved) / max(1, len(resolved)), 3),
+            "accuracy": round(sum(g == c.get("expected") for g, c in zip(got, corpus)) / max(1, len(corpus)), 3),
+        }
+    real = _real_answers(lib_glob)
+    if real:
+        report["saved_answers"] = {
+            "count": len(real),
+            "legacy_resolved": round(sum(legacy_quick_token(a) is not None for a, _ in real) / len(real), 3),
+            "rules_resolved": round(sum(match_answer(a, p) is not None for a, p in real) / len(real), 3),
+        }
+    texts = [c["answer"] for c in corpus] or ["yes"]
+    rounds = max(1, 20000 // len(texts))
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for t in texts:
+            match_answer(t, "positive")
+    report["us_per_answer"] = round((time.perf_counter() - t0) / (rounds * len(texts)) * 1e6, 2)
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the answer rules against the legacy keyword scan.")
+    parser.add_argument("corpus", nargs="?", default="data/rules/answer_corpus.jsonl", help="labeled answers (.jsonl)")
+    parser.add_argument("--libs", default="data/libs/question_lib_*.json", help="question_lib snapshots with saved answers")
+    args = parser.parse_args(argv)
+    print(json.dumps(benchmark(args.corpus, args.libs), indent=2))
+
+
+__all__ = ["AnswerMatcher", "KEYWORDS", "legacy_quick_token", "match_answer", "question_polarity"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import difflib
+import glob
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.config_loader import QUESTION_LIB_FILENAME
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("ClassifierSchema")
+
+# General answers, bound to the question's dimension by the caller; "Other" means unrelated (NA)
+GENERAL_LABELS = ("Yes", "No", "Maybe", "Question", "Stop", "Other")
+SCHEMA_NAME = "dla_classification"
+BATCH_SCHEMA_NAME = "dla_classification_batch"
+
+_LABELS: Dict[str, List[str]] = {}
+_LABELS_LOCK = threading.Lock()
+
+# Outcome counters per classifier mode ("structured" / "free_text"), for /metrics and the report
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, Dict[str, int]] = {}
+_OUTCOMES = ("ok", "repaired_local", "repaired_llm", "other", "off_label", "unparsed")
+
+
+def _normalize_label(label: str) -> str:
+    """DLA_1_weight / 1_weight -> weight (question_lib v2/v3 labels carry the item number)."""
+    return re.sub(r"^(?:DLA_)?\d+_", "", str(label).strip())
+
+
+def library_labels(path: str = QUESTION_LIB_FILENAME) -> List[str]:
+    """
+    Dimension labels of a question library (sorted, normalized), loaded once per path.
+    Empty when the library cannot be read; callers then keep the free-text classifier.
+    """
+    with _LABELS_LOCK:
+        if path not in _LABELS:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lib = json.load(f)
+                _LABELS[path] = sorted({
+                    _normalize_label(entry["label"])
+                    for item in lib.values() if isinstance(item, dict)
+                    for entry in item.values() if isinstance(entry, dict) and "label" in entry
+                })
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read labels from {path}: {e}; structured classification disabled.")
+                _LABELS[path] = []
+        return _LABELS[path]
+
+
+def _item_schema(labels: List[str]) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {
+            "label": {"type": "string", "enum": list(labels) + list(GENERAL_LABELS)},
+            "score": {"type": "integer", "enum": [0, 1, 2]},
+        },
+        "required": ["label", "score"],
+        "additionalProperties": False,
+    }
+
+
+def classification_format(labels: List[str], batch: bool = False) -> Dict[str, Any]:
+    """
+    Structured-output format (llm_complete text_format) for the dimension classifier:
+    {"label": <dimension or general answer>, "score": 0-2}, or for batched segments
+    {"results": [{"index": n, "label": ..., "score": ...}, ...]}.
+    """
+    if not batch:
+        return {"type": "json_schema", "name": SCHEMA_NAME, "schema": _item_schema(labels), "strict": True}
+    item = _item_schema(labels)
+    item["properties"] = {"index": {"type": "integer"}, **item["properties"]}
+    item["required"] = ["index"] + item["required"]
+    schema = {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": item}},
+        "required": ["results"],
+        "additionalProperties": False,
+    }
+    return {"type": "json_schema", "name": BATCH_SCHEMA_NAME, "schema": schema, "strict": True}
+
+
+def _resolve(label: Any, score: Any, labels: List[str], dimension_label: str) -> Tuple[Optional[Tuple[str, Any]], str]:
+    if label in GENERAL_LABELS:
+        return ((("NA", 99) if label == "Other" else (dimension_label, label)), "")
+    if label not in labels:
+        return None, f"label {label!r} is not one of the allowed labels"
+    if not isinstance(score, int) or isinstance(score, bool) or score not in (0, 1, 2):
+        return None, f"score {score!r} must be 0, 1 or 2"
+    return (label, score), ""
+
+
+def validate(raw: str, labels: List[str], dimension_label: str) -> Tuple[Optional[Tuple[str, Any]], str]:
+    """
+    Check a structured classifier reply against the label set.
+    Returns ((dimension, score) / (dimension_label, Keyword) / ("NA", 99) for Other, "") or (None, error).
+    """
+    try:
+        data = json.loads(str(raw).strip())
+    except ValueError as e:
+        return None, f"not valid JSON ({e})"
+    if not isinstance(data, dict):
+        return None, "expected a JSON object"
+    return _resolve(data.get("label"), data.get("score"), labels, dimension_label)
+
+
+def validate_batch(raw: str, labels: List[str], dimension_label: str, count: int) -> Dict[int, Tuple[str, Any]]:
+    """
+    {index: result} for the valid entries (1..count) of a batched structured reply; the caller
+    classifies the missing indices on their own.
+    """
+    try:
+        data = json.loads(str(raw).strip())
+    except ValueError:
+        return {}
+    out = {}
+    for entry in (data.get("results") if isinstance(data, dict) else None) or []:
+        if not isinstance(entry, dict) or not isinstance(entry.get("index"), int):
+            continue
+        got, _ = _resolve(entry.get("label"), entry.get("score"), labels, dimension_label)
+        if got is not None and 1 <= entry["index"] <= count and entry["index"] not in out:
+            out[entry["index"]] = got
+    return out
+
+
+def canonical_label(dim: str, labels: List[str]) -> Optional[str]:
+    """
+    The library label a free-text dimension refers to ('Sleep', '3_sleep', 'work_motivation'
+    -> 'motivation', 'hobby' -> 'hobbies'), or None.
+    """
+    name = _normalize_label(dim).lower()
+    if not name:
+        return None
+    lower = {l.lower(): l for l in labels}
+    if name in lower:
+        return lower[name]
+    suffix = [l for l in labels if name.endswith("_" + l.lower())]
+    if len(suffix) == 1:
+        return suffix[0]
+    close = difflib.get_close_matches(name, list(lower), n=1, cutoff=0.8)
+    return lower[close[0]] if close else None
+
+
+def _counts(mode: str) -> Dict[str, int]:
+    return _STATS.setdefault(mode, {"calls": 0, "repair_calls": 0, **{o: 0 for o in _OUTCOMES}})
+
+
+def record(mode: str, outcome: str) -> None:
+    """Count one classification of the given mode by outcome (see _OUTCOMES)."""
+    with _STATS_LOCK:
+        counts = _counts(mode)
+        counts["calls"] += 1
+        counts[outcome] += 1
+
+
+def record_repair_call(mode: str) -> None:
+    with _STATS_LOCK:
+        _counts(mode)["repair_calls"] += 1
+
+
+def classifier_schema_stats() -> Dict[str, Any]:
+    """
+    Per classifier mode: outcome counts, na_rate (Other or unparsed: the answer counts as invalid
+    and costs a retry turn) and off_label_rate (a dimension outside the question library).
+    """
+    with _STATS_LOCK:
+        out = {}
+        for mode, counts in _STATS.items():
+            calls = max(1, counts["calls"])
+            out[mode] = {
+                **counts,
+                "na_rate": round((counts["other"] + counts["unparsed"]) / calls, 4),
+                "off_label_rate": round(counts["off_label"] / calls, 4),
+            }
+        return out
+
+
+def reset_stats() -> None:
+    with _STATS_LOCK:
+        _STATS.clear()
+
+
+# === Report ===
+
+def saved_answers(lib_glob: str) -> List[Tuple[str, str, str]]:
+    """(question asked, answer, question dimension) of the answers saved in question_lib snapshots."""
+    found = set()
+    for path in glob.glob(lib_glob):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lib = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for item in lib.values():
+            for entry in (item.values() if isinstance(item, dict) else []):
+                if not isinstance(entry, dict) or "label" not in entry:
+                    continue
+                for note in entry.get("notes", []):
+                    fields = dict(str(x).split(": ", 1) for x in (note if isinstance(note, list) else []) if ": " in str(x))
+                    if fields.get("original_question") and fields.get("original_resp"):
+                        found.add((fields["original_question"], fields["original_resp"], _normalize_label(entry["label"])))
+    return sorted(found)
+
+
+def report(lib_glob: str = "data/libs/question_lib_*.json", limit: int = 0) -> Dict[str, Any]:
+    """
+    Classify the saved answers with the free-text classifier and with structured output (against
+    the configured openai.base_url) and compare NA / off-label rates and LLM calls.
+    """
+    # Imported here: response_bridge depends on this module
+    from src.utils.response_bridge import classify_free_text, classify_structured
+    from src.utils.llm_client import llm_stats
+
+    answers = saved_answers(lib_glob)
+    if limit:
+        answers = answers[:limit]
+    out: Dict[str, Any] = {"answers": len(answers)}
+    for mode, fn in (("free_text", classify_free_text), ("structured", classify_structured)):
+        reset_stats()
+        calls_before = llm_stats()["calls"]
+        for question, answer, dim in answers:
+            fn(answer, question, dim)
+        out[mode] = classifier_schema_stats().get(mode, {})
+        out[mode]["llm_calls"] = llm_stats()["calls"] - calls_before
+    return out
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare NA rates of the free-text and structured classifier.")
+    parser.add_argument("--libs", default="data/libs/question_lib_*.json", help="question_lib snapshots with saved answers")
+    parser.add_argument("--limit", type=int, default=0, help="classify at most this many answers (0 = all)")
+    args = parser.parse_args(argv)
+    print(json.dumps(report(args.libs, args.limit), indent=2))
+
+
+__all__ = [
+    "GENERAL_LABELS",
+    "canonical_label",
+    "classification_format",
+    "classifier_schema_stats",
+    "library_labels",
+    "validate",
+    "validate_batch",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import re
 from typing import Any, Dict
 
 import yaml
@@ -19,11 +20,26 @@ APP = _CFG["app"]
 PATHS = _CFG["paths"]
 RL = _CFG["rl"]
 OPENAI = _CFG["openai"]
+TRANSPORT = _CFG.get("transport", {})
+SERVER = _CFG.get("server", {})
+STORE = _CFG.get("store", {})
+ROUTER = _CFG.get("router", {})
+BATCH = _CFG.get("batch", {})
+LLM_CACHE = _CFG.get("llm_cache", {})
+LLM_RESILIENCE = _CFG.get("llm_resilience", {})
+LLM_SCHEDULER = _CFG.get("llm_scheduler", {})
+LLM_USAGE = _CFG.get("llm_usage", {})
+LLM_PRICES = {str(k): dict(v or {}) for k, v in (LLM_USAGE.get("prices") or {}).items()}
+LLM_STANDIN = _CFG.get("llm_standin", {})
+LOCAL_CLASSIFIER = _CFG.get("local_classifier", {})
+ANSWER_RULES = _CFG.get("answer_rules", {})
+CLASSIFIER_SCHEMA = _CFG.get("classifier_schema", {})
+LLM_SITES = {str(k): dict(v or {}) for k, v in (_CFG.get("llm_sites") or {}).items()}
 
 SUBJECT_ID = str(APP["subject_id"])
 
-def _expand(path: str) -> str:
-    return path.replace("${subject_id}", SUBJECT_ID)
+def _expand(path: str, subject_id: str = SUBJECT_ID) -> str:
+    return path.replace("${subject_id}", str(subject_id))
 
 DATA_DIR = _expand(PATHS["data_dir"])
 LOG_DIR = _expand(PATHS["logs_dir"])
@@ -32,6 +48,37 @@ QUESTION_LIB_FILENAME = _expand(PATHS["question_lib_filename"])
 REPORT_FILE = _expand(PATHS["report_file"])
 NOTES_FILE = _expand(PATHS["notes_file"])
 RECORD_CSV = _expand(PATHS["record_csv"])
+CHECKPOINT_DIR = _expand(PATHS.get("checkpoint_dir", os.path.join(DATA_DIR, "checkpoints")))
+
+# Subject IDs become parts of file names (reports, usage, Q-tables, question_lib snapshots)
+_SUBJECT_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+class InvalidSubjectID(ValueError):
+    """
+    A subject_ID that cannot be used in file names (e.g. containing path separators).
+    """
+
+def check_subject_id(subject_id) -> str:
+    """
+    subject_id as a string; raises InvalidSubjectID unless it is 1-64 letters, digits, '_' or '-'.
+    """
+    subject_id = str(subject_id)
+    if not _SUBJECT_ID_RE.fullmatch(subject_id):
+        raise InvalidSubjectID(f"Invalid subject_ID {subject_id[:80]!r}: use 1-64 letters, digits, '_' or '-'")
+    return subject_id
+
+def subject_paths(subject_id: str) -> Dict[str, str]:
+    """
+    Per-subject output paths, so several subjects can be served by one process.
+    Raises InvalidSubjectID for IDs that are not safe in file names.
+    """
+    subject_id = check_subject_id(subject_id)
+    return {
+        "report_file": _expand(PATHS["report_file"], subject_id),
+        "notes_file": _expand(PATHS["notes_file"], subject_id),
+        "usage_file": _expand(PATHS.get("usage_file", "data/results/Usage_${subject_id}.csv"), subject_id),
+        "q_table_file": os.path.join(DATA_DIR, "q_tables", f"item_qtable_{subject_id}.csv"),
+    }
 
 ITEM_N_STATES = int(RL["item_n_states"])
 EPSILON = float(RL["epsilon"])
@@ -44,5 +91,79 @@ OPENAI_BASE_URL = OPENAI.get("base_url", os.environ.get("OPENAI_BASE_URL", "http
 OPENAI_MODEL = OPENAI["model"]
 OPENAI_TEMPERATURE = float(OPENAI["temperature"])
 OPENAI_MAX_TOKENS = int(OPENAI["max_tokens"])
+OPENAI_REASONING_EFFORT = str(OPENAI.get("reasoning_effort", "low") or "")
+OPENAI_MAX_INFLIGHT = int(OPENAI.get("max_inflight", 0))
+OPENAI_BATCH_SEGMENTS = bool(OPENAI.get("batch_segments", True))
+OPENAI_HTTP = OPENAI.get("http", {})
+OPENAI_HTTP_MAX_CONNECTIONS = int(OPENAI_HTTP.get("max_connections", 32))
+OPENAI_HTTP_MAX_KEEPALIVE = int(OPENAI_HTTP.get("max_keepalive_connections", 16))
+OPENAI_HTTP_KEEPALIVE_EXPIRY_SEC = float(OPENAI_HTTP.get("keepalive_expiry_sec", 120))
+OPENAI_HTTP_CONNECT_TIMEOUT_SEC = float(OPENAI_HTTP.get("connect_timeout_sec", 5))
+OPENAI_HTTP_READ_TIMEOUT_SEC = float(OPENAI_HTTP.get("read_timeout_sec", 120))
+OPENAI_HTTP_HTTP2 = bool(OPENAI_HTTP.get("http2", False))
+OPENAI_HTTP_WARMUP = bool(OPENAI_HTTP.get("warmup", True))
+OPENAI_HTTP_KEEPALIVE_PING_SEC = float(OPENAI_HTTP.get("keepalive_ping_sec", 0))
+
+TRANSPORT_KIND = str(TRANSPORT.get("kind", "memory"))
+TRANSPORT_SOCKET_PATH = _expand(TRANSPORT.get("socket_path", "data/record.sock"))
+TRANSPORT_CSV_WATCH = bool(TRANSPORT.get("csv_watch", True))
+TRANSPORT_SLOT_PATH = _expand(TRANSPORT.get("slot_path", "data/record.slot"))
+TRANSPORT_SLOT_CAPACITY = int(TRANSPORT.get("slot_capacity", 65536))
+TRANSPORT_SLOT_POLL_INTERVAL = float(TRANSPORT.get("slot_poll_interval", 0.005))
+
+
+
+SERVER_MAX_ACTIVE_SESSIONS = int(SERVER.get("max_active_sessions", 0))
+SERVER_MAX_QUEUED_SESSIONS = int(SERVER.get("max_queued_sessions", 0))
+SERVER_QUEUE_TIMEOUT_SEC = float(SERVER.get("queue_timeout_sec", 30))
+SERVER_RETRY_AFTER_SEC = int(SERVER.get("retry_after_sec", 15))
+SERVER_IDLE_SUSPEND_SEC = float(SERVER.get("idle_suspend_sec", 0))
+
+LLM_CACHE_MAX_ENTRIES = int(LLM_CACHE.get("max_entries", 0))
+LLM_CACHE_DISK_PATH = _expand(LLM_CACHE.get("disk_path", "") or "")
+LLM_CACHE_TTL_SEC = float(LLM_CACHE.get("ttl_sec", 0))
+LLM_SINGLE_FLIGHT = bool(LLM_CACHE.get("single_flight", True))
+
+LLM_DEFAULT_DEADLINE_SEC = float(LLM_RESILIENCE.get("default_deadline_sec", 45))
+LLM_DEADLINES = {str(k): float(v) for k, v in (LLM_RESILIENCE.get("deadlines") or {}).items()}
+LLM_RETRIES = int(LLM_RESILIENCE.get("retries", 2))
+LLM_BACKOFF_BASE_SEC = float(LLM_RESILIENCE.get("backoff_base_sec", 0.5))
+LLM_BACKOFF_MAX_SEC = float(LLM_RESILIENCE.get("backoff_max_sec", 8))
+LLM_HEDGE = bool(LLM_RESILIENCE.get("hedge", True))
+LLM_HEDGE_QUANTILE = float(LLM_RESILIENCE.get("hedge_quantile", 0.95))
+LLM_HEDGE_MIN_SAMPLES = int(LLM_RESILIENCE.get("hedge_min_samples", 20))
+LLM_HEDGE_MIN_SEC = float(LLM_RESILIENCE.get("hedge_min_sec", 2.0))
+LLM_BREAKER_FAILURES = int(LLM_RESILIENCE.get("breaker_failures", 5))
+LLM_BREAKER_RESET_SEC = float(LLM_RESILIENCE.get("breaker_reset_sec", 30))
+
+LLM_SCHED_RPM = float(LLM_SCHEDULER.get("rpm", 0))
+LLM_SCHED_TPM = float(LLM_SCHEDULER.get("tpm", 0))
+LLM_SCHED_BURST_SEC = float(LLM_SCHEDULER.get("burst_sec", 5))
+LLM_SCHED_OUTPUT_TOKENS = int(LLM_SCHEDULER.get("output_tokens_estimate", OPENAI_MAX_TOKENS))
+LLM_SCHED_DEFAULT_PRIORITY = str(LLM_SCHEDULER.get("default_priority", "interactive"))
+LLM_SCHED_PRIORITIES = {str(k): str(v) for k, v in (LLM_SCHEDULER.get("priorities") or {}).items()}
+
+LOCAL_CLASSIFIER_ENABLED = bool(LOCAL_CLASSIFIER.get("enabled", True))
+LOCAL_CLASSIFIER_MODEL_PATH = _expand(LOCAL_CLASSIFIER.get("model_path", os.path.join(DATA_DIR, "models", "dla_classifier.json")))
+LOCAL_CLASSIFIER_TARGET_PRECISION = float(LOCAL_CLASSIFIER.get("target_precision", 0.95))
+
+ANSWER_RULES_PATH = _expand(ANSWER_RULES.get("path", "data/rules/answer_phrases.json"))
+
+CLASSIFIER_SCHEMA_ENABLED = bool(CLASSIFIER_SCHEMA.get("enabled", True))
+CLASSIFIER_SCHEMA_REPAIR_ATTEMPTS = int(CLASSIFIER_SCHEMA.get("repair_attempts", 1))
+
+BATCH_MAX_WORKERS = int(BATCH.get("max_workers", 8))
+BATCH_MAX_REQUESTS = int(BATCH.get("max_requests", 2))
+
+STORE_BACKEND = str(STORE.get("backend", "file"))
+STORE_SQLITE_PATH = _expand(STORE.get("sqlite_path", os.path.join(DATA_DIR, "state.db")))
+STORE_CHECKPOINT_EVERY_TURN = bool(STORE.get("checkpoint_every_turn", False))
 
+ROUTER_WORKERS = int(ROUTER.get("workers", 0))
+ROUTER_WORKER_BASE_PORT = int(ROUTER.get("worker_base_port", 8900))
+ROUTER_RESTART_DELAY_SEC = float(ROUTER.get("restart_delay_sec", 1.0))
 
+STANDIN_PORT = int(LLM_STANDIN.get("port", 8787))
+STANDIN_PROFILE = str(LLM_STANDIN.get("profile", "fast"))
+STANDIN_DECISION_ONE_RATE = float(LLM_STANDIN.get("decision_one_rate", 0.2))
+STANDIN_PROFILES = {str(k): dict(v or {}) for k, v in (LLM_STANDIN.get("profiles") or {}).items()}
@@ -0,0 +1,325 @@
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.utils.config_loader import (
+    LOCAL_CLASSIFIER_ENABLED,
+    LOCAL_CLASSIFIER_MODEL_PATH,
+    LOCAL_CLASSIFIER_TARGET_PRECISION,
+)
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("DLAClassifier")
+
+# Bumped when the model file layout changes; older files are ignored
+FORMAT_VERSION = 1
+# General answers: predicted as "<word>, 0" and bound to the question's dimension, like the LLM's
+GENERAL_LABELS = ("Yes", "No", "Maybe", "Question", "Stop")
+# Few-shot examples embedded in the LLM classifier prompt: {"in":"...", "res": "dim, score"}
+_PROMPT_EXAMPLE = re.compile(r'\{"in":\s*"(.*?)",\s*"res":\s*"(.*?)"\}')
+_PROMPT_SOURCE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "response_analyzer.py")
+
+
+def _normalize_label(label: str) -> str:
+    """DLA_1_weight / 1_weight -> weight (question_lib v2/v3 labels carry the item number)."""
+    return re.sub(r"^(?:DLA_)?\d+_", "", str(label).strip())
+
+
+def _features(text: str, question_dim: str = "", q_weight: int = 1) -> Counter:
+    """
+    Character 2-4-grams of the normalized answer, its words, and the dimension of the question
+    being answered (repeated q_weight times: the answer is classified in its context).
+    """
+    norm = " " + re.sub(r"\s+", " ", re.sub(r"[^a-z0-9' ]", " ", text.lower().replace("’", "'"))).strip() + " "
+    feats = Counter()
+    for n in (2, 3, 4):
+        for i in range(len(norm) - n + 1):
+            feats["c:" + norm[i:i + n]] += 1
+    for word in norm.split():
+        feats["w:" + word] += 1
+    if question_dim:
+        feats["q:" + _normalize_label(question_dim).lower()] += q_weight
+    return feats
+
+
+class NaiveBayesClassifier:
+    """
+    Multinomial naive Bayes over answer n-grams predicting "dimension, score" labels.
+    The log-likelihood is divided by sqrt(number of features): overlapping n-grams are far from
+    independent, and unscaled posteriors sit near 1 for right and wrong predictions alike.
+    threshold is the calibrated minimum posterior for a prediction to be trusted.
+    """
+
+    def __init__(self, alpha: float = 0.1, q_weight: int = 16):
+        self.alpha = alpha
+        self.q_weight = q_weight
+        self.class_counts: Dict[str, int] = {}
+        self.feature_counts: Dict[str, Dict[str, float]] = {}
+        self.feature_totals: Dict[str, float] = {}
+        self.vocab: set = set()
+        self.threshold = 1.0
+        self.meta: Dict[str, Any] = {}
+
+    def fit(self, examples: List[Tuple[str, str, str]]) -> "NaiveBayesClassifier":
+        """examples: (answer text, question dimension or "", label)."""
+        counts: Dict[str, Counter] = defaultdict(Counter)
+        classes = Counter()
+        for text, question_dim, label in examples:
+            classes[label] += 1
+            counts[label].update(_features(text, question_dim, self.q_weight))
+        self.class_counts = dict(classes)
+        self.feature_counts = {label: dict(c) for label, c in counts.items()}
+        self.feature_totals = {label: float(sum(c.values())) for label, c in counts.items()}
+        self.vocab = {f for c in counts.values() for f in c}
+        return self
+
+    def predict_proba(self, text: str, question_dim: str = "") -> List[Tuple[str, float]]:
+        """(label, posterior) pairs, most probable first. Features unseen in training are ignored."""
+        feats = {f: k for f, k in _features(text, question_dim, self.q_weight).items() if f in self.vocab}
+        n = sum(self.class_counts.values())
+        scale = 1.0 / math.sqrt(max(1, sum(feats.values())))
+        scores = {}
+        for label, count in self.class_counts.items():
+            fc = self.feature_counts[label]
+            log_denom = math.log(self.feature_totals[label] + self.alpha * len(self.vocab))
+            loglik = sum(k * (math.log(fc.get(f, 0.0) + self.alpha) - log_denom) for f, k in feats.items())
+            scores[label] = math.log(count / n) + scale * loglik
+        top = max(scores.values())
+        exp = {label: math.exp(s - top) for label, s in scores.items()}
+        z = sum(exp.values())
+        return sorted(((label, v / z) for label, v in exp.items()), key=lambda kv: -kv[1])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format_version": FORMAT_VERSION,
+            "alpha": self.alpha,
+            "q_weight": self.q_weight,
+            "threshold": self.threshold,
+            "meta": self.meta,
+            "class_counts": self.class_counts,
+            "feature_counts": self.feature_counts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NaiveBayesClassifier":
+        if data.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported classifier model format: {data.get('format_version')}")
+        model = cls(alpha=float(data["alpha"]), q_weight=int(data["q_weight"]))
+        model.class_counts = {k: int(v) for k, v in data["class_counts"].items()}
+        model.feature_counts = data["feature_counts"]
+        model.feature_totals = {label: float(sum(c.values())) for label, c in model.feature_counts.items()}
+        model.vocab = {f for c in model.feature_counts.values() for f in c}
+        model.threshold = float(data["threshold"])
+        model.meta = dict(data.get("meta") or {})
+        return model
+
+
+# === Training data ===
+
+def examples_from_question_libs(paths: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """
+    (answer, question dimension, "dimension, score") from saved question_lib snapshots: each
+    question's notes with an original_resp, paired with its scores in order (questions whose
+    note and score counts differ, e.g. with RV follow-up notes, are skipped). Deduplicated,
+    since later snapshots of a session repeat the earlier answers.
+    """
+    seen = set()
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lib = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+        for item in lib.values():
+            if not isinstance(item, dict):
+                continue
+            for entry in item.values():
+                if not isinstance(entry, dict) or "label" not in entry:
+                    continue
+                answers = [
+                    str(x)[len("original_resp:"):].strip()
+                    for note in entry.get("notes", []) if isinstance(note, list)
+                    for x in note if str(x).startswith("original_resp:")
+                ]
+                scores = entry.get("score", [])
+                if not answers or len(answers) != len(scores):
+                    continue
+                dim = _normalize_label(entry["label"])
+                for answer, score in zip(answers, scores):
+                    if answer and score in (0, 1, 2):
+                        seen.add((answer, dim, f"{dim}, {score}"))
+    return sorted(seen)
+
+
+def examples_from_prompt(path: str = _PROMPT_SOURCE) -> List[Tuple[str, str, str]]:
+    """The labeled examples embedded in INIT_ASKER_SYSTEM_PROMPT_V2 (no question context)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+    except OSError as e:
+        logger.warning(f"Cannot read prompt examples from {path}: {e}")
+        return []
+    examples = []
+    for text, res in _PROMPT_EXAMPLE.findall(source):
+        dim, _, score = res.partition(",")
+        examples.append((text, "", f"{_normalize_label(dim)}, {score.strip()}"))
+    return examples
+
+
+# === Calibration ===
+
+def calibrate(
+    examples: List[Tuple[str, str, str]],
+    target_precision: float,
+    folds: int = 5,
+    min_accepted: int = 20,
+    seed: int = 0,
+    **params,
+) -> Dict[str, Any]:
+    """
+    k-fold cross-validated (confidence, correct) pairs; the threshold is the lowest confidence
+    at which the predictions at or above it reach target_precision over at least min_accepted
+    held-out examples. Without such a point the threshold stays above 1 (never trusted).
+    """
+    order = list(range(len(examples)))
+    random.Random(seed).shuffle(order)
+    held_out = []
+    for k in range(folds):
+        test = set(order[k::folds])
+        model = NaiveBayesClassifier(**params).fit([e for i, e in enumerate(examples) if i not in test])
+        for i in test:
+            text, question_dim, label = examples[i]
+            pred, conf = model.predict_proba(text, question_dim)[0]
+            held_out.append((conf, pred == label))
+    held_out.sort(key=lambda x: -x[0])
+    threshold, accepted, correct, coverage, precision = 1.01, 0, 0, 0.0, 0.0
+    for conf, ok in held_out:
+        accepted += 1
+        correct += ok
+        if accepted >= min_accepted and correct / accepted >= target_precision:
+            threshold, coverage, precision = conf, accepted / len(held_out), correct / accepted
+    return {
+        "threshold": threshold,
+        "cv_accuracy": round(sum(ok for _, ok in held_out) / max(1, len(held_out)), 4),
+        "coverage": round(coverage, 4),
+        "precision": round(precision, 4),
+        "target_precision": target_precision,
+    }
+
+
+def train(lib_paths: List[str], out_path: str, target_precision: float = LOCAL_CLASSIFIER_TARGET_PRECISION) -> Dict[str, Any]:
+    """
+    Train on question_lib snapshots plus the prompt examples, calibrate, and write the model.
+    Returns the model's metadata.
+    """
+    examples = examples_from_question_libs(lib_paths) + examples_from_prompt()
+    if len(examples) < 10:
+        raise ValueError(f"Too few labeled examples to train on ({len(examples)})")
+    calibration = calibrate(examples, target_precision)
+    model = NaiveBayesClassifier().fit(examples)
+    model.threshold = calibration.pop("threshold")
+    model.meta = {
+        "model_version": time.strftime("%Y%m%d%H%M%S"),
+        "examples": len(examples),
+        "classes": len(model.class_counts),
+        "sources": len(lib_paths),
+        **calibration,
+    }
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = out_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(model.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, out_path)
+    logger.info(f"Wrote classifier model {out_path}: {model.meta}")
+    return dict(model.meta, threshold=model.threshold)
+
+
+# === Runtime fast path ===
+
+_MODEL_LOCK = threading.Lock()
+_MODEL: Optional[NaiveBayesClassifier] = None
+_MODEL_LOADED = False
+_STATS = {"local": 0, "fallthrough": 0}
+
+
+def _model() -> Optional[NaiveBayesClassifier]:
+    global _MODEL, _MODEL_LOADED
+    if _MODEL_LOADED:
+        return _MODEL
+    with _MODEL_LOCK:
+        if not _MODEL_LOADED:
+            try:
+                with open(LOCAL_CLASSIFIER_MODEL_PATH, "r", encoding="utf-8") as f:
+                    _MODEL = NaiveBayesClassifier.from_dict(json.load(f))
+                logger.info(f"Loaded local classifier {LOCAL_CLASSIFIER_MODEL_PATH} ({_MODEL.meta.get('model_version')}, threshold {_MODEL.threshold:.3f})")
+            except FileNotFoundError:
+                logger.info(f"No local classifier at {LOCAL_CLASSIFIER_MODEL_PATH}; every segment goes to the LLM.")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Failed to load local classifier {LOCAL_CLASSIFIER_MODEL_PATH}: {e}")
+            _MODEL_LOADED = True
+    return _MODEL
+
+
+def classify_local(user_input: str, dimension_label: str = "NA") -> Optional[Tuple[str, Any]]:
+    """
+    (dimension, score:int) or (dimension_label, Keyword) when the local model is confident about
+    an answer to a question of dimension_label, in the same shapes as get_dimension_score;
+    None to fall through to the LLM.
+    """
+    if dimension_label in ("", "NA"):
+        # Calibrated on answers to known questions; context-free text (batch diaries) goes to the LLM
+        return None
+    model = _model() if LOCAL_CLASSIFIER_ENABLED else None
+    if model is None:
+        return None
+    label, conf = model.predict_proba(user_input, dimension_label)[0]
+    with _MODEL_LOCK:
+        _STATS["local" if conf >= model.threshold else "fallthrough"] += 1
+    if conf < model.threshold:
+        return None
+    dim, _, score = label.partition(",")
+    dim = dim.strip()
+    logger.debug(f"Local classifier: '{user_input}' -> {label} ({conf:.3f})")
+    if dim in GENERAL_LABELS:
+        return dimension_label, dim
+    if dim == "Other":
+        return "NA", 99
+    return dim, int(score)
+
+
+def classifier_stats() -> Dict[str, Any]:
+    model = _model() if LOCAL_CLASSIFIER_ENABLED else None
+    return {
+        "enabled": model is not None,
+        "model_version": model.meta.get("model_version") if model else None,
+        **_STATS,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Train the local DLA dimension/score classifier.")
+    parser.add_argument("libs", nargs="*", default=["data/libs/question_lib_*.json"],
+                        help="saved question_lib snapshots (globs allowed)")
+    parser.add_argument("--out", default=LOCAL_CLASSIFIER_MODEL_PATH, help="model file to write")
+    parser.add_argument("--precision", type=float, default=LOCAL_CLASSIFIER_TARGET_PRECISION,
+                        help="held-out precision the confidence threshold is calibrated to")
+    args = parser.parse_args(argv)
+    paths = sorted({p for pattern in args.libs for p in glob.glob(pattern)})
+    print(json.dumps(train(paths, args.out, args.precision), ensure_ascii=False))
+
+
+__all__ = ["NaiveBayesClassifier", "classifier_stats", "classify_local", "train"]
+
+
+if __name__ == "__main__":
+    main()
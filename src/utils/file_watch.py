@@ -0,0 +1,120 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Optional
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("FileWatch")
+
+# inotify constants from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+# Loaded once per process; without it every watcher polls (logged here, not per watcher)
+_LIBC = _load_libc()
+if _LIBC is None:
+    logger.info("inotify unavailable on this platform; file waits fall back to polling.")
+
+
+class FileWatcher:
+    """
+    Block until a file changes, using Linux inotify on the file's directory.
+    The directory is watched (not the file) because writers replace the file with os.replace,
+    which gives it a new inode. Where inotify is unavailable, wait() simply sleeps
+    poll_interval seconds, i.e. callers fall back to polling.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.1, max_wait: float = 1.0, use_inotify: bool = True):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path).encode()
+        self.poll_interval = poll_interval
+        # Upper bound for a single inotify wait, so a missed event never stalls a waiter
+        self.max_wait = max_wait
+        self._fd = None
+        libc = _LIBC if use_inotify else None
+        if libc is None:
+            return
+        folder = os.path.dirname(self.path)
+        os.makedirs(folder, exist_ok=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            logger.warning(f"inotify_init1 failed (errno {ctypes.get_errno()}); polling {path}.")
+            return
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(fd, folder.encode(), mask) < 0:
+            logger.warning(f"inotify_add_watch failed (errno {ctypes.get_errno()}); polling {path}.")
+            os.close(fd)
+            return
+        self._fd = fd
+
+    @property
+    def active(self) -> bool:
+        return self._fd is not None
+
+    def _drain(self) -> bool:
+        """Consume queued events; return True if any concerns the watched file."""
+        hit = False
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return hit
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                _, _, _, length = _EVENT_HEADER.unpack_from(buf, offset)
+                start = offset + _EVENT_HEADER.size
+                name = buf[start:start + length].rstrip(b"\0")
+                if name == self.name:
+                    hit = True
+                offset = start + length
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until the file changes or timeout (seconds) elapses.
+        Returns True when the caller should re-read the file.
+        """
+        if self._fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(self.poll_interval, timeout))
+            return True
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = self.max_wait if deadline is None else min(self.max_wait, deadline - time.time())
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                # Safety re-check after max_wait, or the caller's timeout expired
+                return deadline is None or time.time() < deadline
+            if self._drain():
+                return True
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+__all__ = ["FileWatcher"]
@@ -1,111 +1,148 @@
-import os
-import logging
-import time
-import pandas as pd
-from pandas.errors import EmptyDataError
-from src.utils.config_loader import RECORD_CSV
+import threading
+from src.utils.config_loader import SERVER_IDLE_SUSPEND_SEC
+from src.utils.session_journal import SessionSuspended, current_journal
+from src.utils.turn_channel import get_channel
 
 # Set up logger for this module
 from src.utils.log_util import get_logger
 logger = get_logger("IORecord")
 
-HEADER = ["Question", "Question_Lock", "Resp", "Resp_Lock"]
+class _TurnState(threading.local):
+    """
+    Per-thread turn state, so every HandlerRL thread (one per session) has its own
+    channel, pending prefix and outbox.
+    - channel: the session's turn channel (None: the process-wide channel)
+    - prefix: pending content prepended to the next question output; when non-empty it is
+      combined with the next question using two newline characters, then cleared
+    - outbox: ordered system messages not yet handed to the front-end. Messages logged
+      back-to-back (e.g. a CBT guide followed by the re-ask) are delivered together as one
+      question right before the backend waits for the next answer, so they cost a single
+      front-end round-trip.
+    - streamed: whether user-facing text was already streamed since the last flush
+    """
+
+    def __init__(self):
+        self.channel = None
+        self.prefix = ""
+        self.outbox = []
+        self.streamed = False
+
+_STATE = _TurnState()
 
-# Module-level buffer to prepend content to the next question output.
-# When non-empty, its content will be combined with the next question
-# using two newline characters as the separator, then cleared.
-_PENDING_QUESTION_PREFIX = ""
+def _channel():
+    return _STATE.channel if _STATE.channel is not None else get_channel()
+
+def bind_channel(channel):
+    """
+    Route the calling thread's questions and answers through the given channel.
+    """
+    _STATE.channel = channel
+    _STATE.prefix = ""
+    _STATE.outbox = []
+    _STATE.streamed = False
 
 def set_question_prefix(text: str):
     """
     Set a pending prefix that will be prepended to the next question output.
     The prefix will be combined with two newlines between the prefix and the question.
     """
-    global _PENDING_QUESTION_PREFIX
-    _PENDING_QUESTION_PREFIX = str(text) if text is not None else ""
-
-def _read():
-    last_exc = None
-    for _ in range(5):
-        try:
-            time.sleep(0.03)
-            return pd.read_csv(RECORD_CSV, dtype={"Question": str, "Question_Lock": "int64", "Resp": str, "Resp_Lock": "int64"})
-        except (EmptyDataError, FileNotFoundError, OSError) as e:
-            last_exc = e
-            time.sleep(0.05)
-    raise last_exc
-
-def _write(df):
-    time.sleep(0.03)
-    folder = os.path.dirname(RECORD_CSV)
-    if folder and not os.path.exists(folder):
-        os.makedirs(folder, exist_ok=True)
-    tmp_path = RECORD_CSV + ".tmp"
-    df.to_csv(tmp_path, columns=HEADER, index=False)
-    os.replace(tmp_path, RECORD_CSV)
-    time.sleep(0.03)
+    _STATE.prefix = str(text) if text is not None else ""
 
 def log_question(text: str):
-    while True:
-        time.sleep(0.1)
-        data = _read()
-        if data.loc[0, "Question_Lock"] == 0:
-            # If there is a pending prefix (e.g., RV validation), combine it with the question
-            global _PENDING_QUESTION_PREFIX
-            combined = text
-            if _PENDING_QUESTION_PREFIX:
-                combined = f"{_PENDING_QUESTION_PREFIX}\n\n{text}"
-                logger.info("Combining pending prefix with next question using two newlines.")
-            data.loc[0, "Question"] = combined
-            data.loc[0, "Question_Lock"] = 1
-            _write(data)
-            # Clear the prefix once consumed
-            _PENDING_QUESTION_PREFIX = ""
-            logger.info(f"Prompted question: {combined}")
-            break
+    # If there is a pending prefix (e.g., RV validation), combine it with the question
+    combined = text
+    if _STATE.prefix:
+        combined = f"{_STATE.prefix}\n\n{text}"
+        logger.info("Combining pending prefix with next question using two newlines.")
+    _STATE.outbox.append(combined)
+    # Clear the prefix once consumed
+    _STATE.prefix = ""
+    logger.info(f"Prompted question: {combined}")
 
-def get_answer():
-    while True:
-        time.sleep(0.1)
-        data = _read()
-        if data.loc[0, "Resp_Lock"] == 0:
-            user_input = data.loc[0, "Resp"]
-            data.loc[0, "Resp_Lock"] = 1
-            _write(data)
-            break
-    user_input = str(user_input)
-    user_input = user_input.replace(", and", ".").replace("but", ".")
-    user_input = user_input.split(".")
-    DLA_result, segments = [], []
-    for seg in user_input:
+def flush_questions():
+    """
+    Deliver every pending message in the outbox to the front-end as one question,
+    separated by two newlines. No-op when the outbox is empty.
+    """
+    if not _STATE.outbox:
+        return
+    if len(_STATE.outbox) > 1:
+        logger.info(f"Delivering {len(_STATE.outbox)} queued messages in one turn.")
+    combined = "\n\n".join(_STATE.outbox)
+    _STATE.outbox.clear()
+    _STATE.streamed = False
+    journal = current_journal()
+    if journal is not None:
+        if journal.replaying:
+            journal.replay("question")  # already delivered before the session was suspended
+            return
+        journal.record("question", combined)
+    _channel().put_question(combined)
+
+def stream_callback():
+    """
+    Return an on_delta callback for llm_complete that forwards user-facing text to the
+    front-end while it is generated. The flushed question remains the authoritative text;
+    consecutive streamed texts in one turn are separated by two newlines, like the outbox.
+    """
+    channel = _channel()
+    started = [False]
+
+    def _on_delta(delta: str):
+        if not started[0]:
+            started[0] = True
+            if _STATE.streamed:
+                delta = "\n\n" + delta
+            _STATE.streamed = True
+        channel.put_partial(delta)
+
+    return _on_delta
+
+def _take_answer():
+    """
+    Wait for the user's answer. In a journaled (server) session the answer is recorded,
+    replayed while the session is being resumed, and the wait is bounded by
+    server.idle_suspend_sec, after which SessionSuspended is raised.
+    """
+    journal = current_journal()
+    if journal is None:
+        return _channel().take_answer()
+    if journal.replaying:
+        return journal.replay("answer")
+    timeout = SERVER_IDLE_SUSPEND_SEC if SERVER_IDLE_SUSPEND_SEC > 0 else None
+    user_input = _channel().take_answer(timeout=timeout)
+    if user_input is None:
+        raise SessionSuspended(f"no answer within {timeout}s")
+    journal.record("answer", user_input)
+    return user_input
+
+def split_segments(text) -> list:
+    """
+    Split a user answer into the segments that are classified one by one.
+    """
+    text = str(text)
+    text = text.replace(", and", ".").replace("but", ".")
+    segments = []
+    for seg in text.split("."):
         if not seg:
             continue
         if seg[0] == " ":
             seg = seg[1:]
         segments.append(seg)
+    return segments
+
+def get_answer():
+    flush_questions()
+    user_input = _take_answer()
+    DLA_result, segments = [], split_segments(user_input)
     return DLA_result, segments
 
 def get_resp_log():
-    while True:
-        time.sleep(0.1)
-        data = _read()
-        if data.loc[0, "Resp_Lock"] == 0:
-            user_response = data.loc[0, "Resp"]
-            data.loc[0, "Resp_Lock"] = 1
-            _write(data)
-            logger.info(f"Received user response: {user_response}")
-            break
+    flush_questions()
+    user_response = _take_answer()
+    logger.info(f"Received user response: {user_response}")
     return user_response
 
 def init_record():
-    try:
-        data = _read()
-    except FileNotFoundError:
-        data = pd.DataFrame([["", 0, "", 1]], columns=HEADER)
-        _write(data)
-    time.sleep(0.03)
-    data.loc[0, 'Question_Lock'] = 0
-    data.loc[0, 'Resp_Lock'] = 1
-    _write(data)
-
-
+    _STATE.outbox.clear()
+    _channel().reset()
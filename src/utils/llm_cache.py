@@ -0,0 +1,185 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Tuple
+
+from src.utils.config_loader import LLM_CACHE_DISK_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SEC
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("LLMCache")
+
+
+def cache_key(model: str, effort: str, system_content: str, user_content: str) -> str:
+    """
+    Cache key for one LLM request: model, reasoning effort, a hash of the system prompt and the user content.
+    """
+    system_hash = hashlib.sha256(system_content.encode("utf-8")).hexdigest()
+    raw = "\x1f".join([str(model), str(effort), system_hash, user_content])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    LLM response cache for call sites whose payload repeats across sessions.
+    - memory tier: LRU of max_entries responses
+    - disk tier (optional): SQLite file shared by processes, consulted on a memory miss
+    Entries older than ttl_sec (0 = no expiry) are treated as misses in both tiers.
+    """
+
+    def __init__(self, max_entries: int, disk_path: str = "", ttl_sec: float = 0):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.ttl_sec = ttl_sec
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0}
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn().commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _fresh(self, created_at: float) -> bool:
+        return self.ttl_sec <= 0 or time.time() - created_at < self.ttl_sec
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry[1]):
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[0]
+        if self.disk_path:
+            try:
+                row = self._conn().execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache disk read failed: {e}")
+                row = None
+            if row is not None and self._fresh(row[1]):
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+                return row[0]
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        self._remember(key, value, now)
+        if self.disk_path:
+            try:
+                conn = self._conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)", (key, value, now)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache disk write failed: {e}")
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["disk_hits"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk": bool(self.disk_path),
+                **self._counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces identical LLM requests that are in flight at the same time: the first caller
+    for a key (the leader) makes the upstream call, later callers (followers) wait on its
+    Future and share its result or error. The flight ends once the leader has filled the
+    cache, so the next identical request is a cache hit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Future] = {}
+        self._counters = {"leaders": 0, "followers": 0}
+
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        Return (future, is_leader) for key.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._counters["followers"] += 1
+                return flight, False
+            flight = self._flights[key] = Future()
+            self._counters["leaders"] += 1
+            return flight, True
+
+    def finish(self, key: str, flight: Future, result: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        """
+        Leader only: publish the result (or error) to the followers and end the flight.
+        """
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is None:
+            flight.set_result(result)
+        elif isinstance(error, Exception):
+            flight.set_exception(error)
+        else:
+            # Leader cancelled or interrupted: followers fail like any LLM error instead
+            flight.set_exception(RuntimeError(f"Coalesced LLM request abandoned by its leader: {error!r}"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": len(self._flights), **self._counters}
+
+
+_FLIGHTS = SingleFlight()
+
+
+def get_single_flight() -> SingleFlight:
+    return _FLIGHTS
+
+
+_CACHE: Optional[LLMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> Optional[LLMCache]:
+    """
+    Process-wide cache from llm_cache in config.yaml, or None when disabled (max_entries 0).
+    """
+    global _CACHE
+    if LLM_CACHE_MAX_ENTRIES <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LLMCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_DISK_PATH, LLM_CACHE_TTL_SEC)
+        return _CACHE
+
+
+__all__ = ["LLMCache", "SingleFlight", "cache_key", "get_cache", "get_single_flight"]
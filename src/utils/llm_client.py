@@ -1,50 +1,763 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import json
 import os
-from openai import OpenAI
-from src.utils.config_loader import OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_TEMPERATURE, OPENAI_MAX_TOKENS
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from src.utils.config_loader import (
+    OPENAI_BASE_URL,
+    OPENAI_MODEL,
+    OPENAI_TEMPERATURE,
+    OPENAI_MAX_TOKENS,
+    OPENAI_MAX_INFLIGHT,
+    OPENAI_REASONING_EFFORT,
+    LLM_SITES,
+    OPENAI_HTTP_MAX_CONNECTIONS,
+    OPENAI_HTTP_MAX_KEEPALIVE,
+    OPENAI_HTTP_KEEPALIVE_EXPIRY_SEC,
+    OPENAI_HTTP_CONNECT_TIMEOUT_SEC,
+    OPENAI_HTTP_READ_TIMEOUT_SEC,
+    OPENAI_HTTP_HTTP2,
+    OPENAI_HTTP_WARMUP,
+    OPENAI_HTTP_KEEPALIVE_PING_SEC,
+    LLM_SINGLE_FLIGHT,
+)
+from src.utils.llm_cache import cache_key, get_cache, get_single_flight
+from src.utils.llm_resilience import StreamInterrupted, call_with_policy, call_with_policy_async, resilience_stats
+from src.utils.llm_scheduler import estimate_tokens, get_scheduler, note_provider_error, priority_for
+from src.utils.llm_usage import get_ledger
 from src.utils.log_util import get_logger
+from src.utils.session_journal import current_journal
 
 logger = get_logger("LLMClient")
 
 _api_key = os.environ.get("OPENAI_API_KEY")
 if not _api_key:
-    raise RuntimeError("OPENAI_API_KEY is not set in environment")
-client = OpenAI(api_key=_api_key, base_url=OPENAI_BASE_URL)
+    if urlparse(OPENAI_BASE_URL).hostname in ("localhost", "127.0.0.1", "::1"):
+        # Local stand-in (LLM_standin_server.py) or self-hosted endpoint: any key is accepted
+        _api_key = "local"
+    else:
+        raise RuntimeError("OPENAI_API_KEY is not set in environment")
 
 
-def llm_complete(system_content: str, user_content: str) -> str:
+def _http2_available() -> bool:
+    if not OPENAI_HTTP_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401  (httpx's optional HTTP/2 dependency)
+        return True
+    except ImportError:
+        logger.warning("openai.http.http2 is set but the h2 package is missing; using HTTP/1.1.")
+        return False
+
+
+# Connection pool settings from openai.http in config.yaml, shared by the sync and async clients
+_HTTP2 = _http2_available()
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=OPENAI_HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=OPENAI_HTTP_MAX_KEEPALIVE,
+    keepalive_expiry=OPENAI_HTTP_KEEPALIVE_EXPIRY_SEC,
+)
+_HTTP_TIMEOUT = httpx.Timeout(OPENAI_HTTP_READ_TIMEOUT_SEC, connect=OPENAI_HTTP_CONNECT_TIMEOUT_SEC)
+_http_client = httpx.Client(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT, http2=_HTTP2, follow_redirects=True)
+# Retries are handled by the llm_resilience policy, not by the client
+client = OpenAI(api_key=_api_key, base_url=OPENAI_BASE_URL, timeout=_HTTP_TIMEOUT, max_retries=0, http_client=_http_client)
+
+
+
+def _site_params(site: str) -> Dict[str, Any]:
+    """
+    Model, reasoning effort and output-token cap for a call site: llm_sites.<site> in
+    config.yaml, falling back to openai.model / openai.reasoning_effort / no cap.
+    An empty effort omits the reasoning parameter (non-reasoning models).
+    """
+    overrides = LLM_SITES.get(site, {})
+    return {
+        "model": str(overrides.get("model") or OPENAI_MODEL),
+        "effort": str(overrides.get("effort", OPENAI_REASONING_EFFORT) or ""),
+        "max_output_tokens": int(overrides.get("max_output_tokens") or 0),
+    }
+
+
+def _responses_kwargs(params: Dict[str, Any], text_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"model": params["model"]}
+    if params["effort"]:
+        kwargs["reasoning"] = {"effort": params["effort"]}
+    if params["max_output_tokens"]:
+        kwargs["max_output_tokens"] = params["max_output_tokens"]
+    if text_format:
+        kwargs["text"] = {"format": text_format}
+    return kwargs
+
+
+def _chat_kwargs(params: Dict[str, Any], text_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {
+        "model": params["model"],
+        "max_tokens": params["max_output_tokens"] or OPENAI_MAX_TOKENS,
+        "temperature": OPENAI_TEMPERATURE,
+    }
+    if text_format:
+        # Chat Completions nests the same schema under response_format.json_schema
+        spec = {k: v for k, v in text_format.items() if k != "type"}
+        kwargs["response_format"] = {"type": text_format.get("type", "json_schema"), "json_schema": spec}
+    return kwargs
+
+
+def _format_key(system_content: str, text_format: Optional[Dict[str, Any]]) -> str:
+    """
+    System part of the cache key: the same prompt under a different output format is another request.
+    """
+    if not text_format:
+        return system_content
+    return system_content + "\x1f" + json.dumps(text_format, sort_keys=True)
+
+# Process-wide cap on concurrent LLM calls (openai.max_inflight; 0 = unlimited).
+# Calls beyond the cap wait here instead of piling onto the API together.
+_INFLIGHT = threading.BoundedSemaphore(OPENAI_MAX_INFLIGHT) if OPENAI_MAX_INFLIGHT > 0 else None
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, Any] = {"in_flight": 0, "waiting": 0, "calls": 0, "wait_total_sec": 0.0, "wait_max_sec": 0.0}
+
+
+def _slot_acquired(waited: float) -> None:
+    with _STATS_LOCK:
+        _STATS["waiting"] -= 1
+        _STATS["in_flight"] += 1
+        _STATS["calls"] += 1
+        _STATS["wait_total_sec"] += waited
+        _STATS["wait_max_sec"] = max(_STATS["wait_max_sec"], waited)
+    if waited > 1.0:
+        logger.info(f"LLM call waited {waited:.2f}s for an in-flight slot")
+
+
+def _slot_released() -> None:
+    with _STATS_LOCK:
+        _STATS["in_flight"] -= 1
+    if _INFLIGHT is not None:
+        _INFLIGHT.release()
+
+
+@contextmanager
+def _inflight_slot():
+    """
+    Hold one in-flight LLM slot for the duration of a call, recording how long it waited.
+    """
+    t0 = time.time()
+    with _STATS_LOCK:
+        _STATS["waiting"] += 1
+    if _INFLIGHT is not None:
+        _INFLIGHT.acquire()
+    _slot_acquired(time.time() - t0)
+    try:
+        yield
+    finally:
+        _slot_released()
+
+
+@asynccontextmanager
+async def _inflight_slot_async():
+    """
+    Async counterpart of _inflight_slot, sharing the same cap; waits without blocking the event loop.
+    """
+    t0 = time.time()
+    with _STATS_LOCK:
+        _STATS["waiting"] += 1
+    try:
+        while _INFLIGHT is not None and not _INFLIGHT.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+    except BaseException:
+        with _STATS_LOCK:
+            _STATS["waiting"] -= 1
+        raise
+    _slot_acquired(time.time() - t0)
+    try:
+        yield
+    finally:
+        _slot_released()
+
+
+def llm_stats() -> Dict[str, Any]:
+    """
+    Snapshot of LLM concurrency counters (for the server's /metrics endpoint).
+    """
+    with _STATS_LOCK:
+        calls = _STATS["calls"]
+        return {
+            "max_inflight": OPENAI_MAX_INFLIGHT,
+            "in_flight": _STATS["in_flight"],
+            "waiting": _STATS["waiting"],
+            "calls": calls,
+            "wait_avg_ms": round(1000 * _STATS["wait_total_sec"] / calls, 1) if calls else 0.0,
+            "wait_max_ms": round(1000 * _STATS["wait_max_sec"], 1),
+            "cache": get_cache().stats() if get_cache() is not None else None,
+            "single_flight": get_single_flight().stats() if LLM_SINGLE_FLIGHT else None,
+            "connection": dict(_CONN_STATS, http2=_HTTP2),
+            "resilience": resilience_stats(),
+            "scheduler": get_scheduler().stats(),
+            "usage": get_ledger().stats(),
+        }
+
+
+# === Connection warm-up ===
+
+_CONN_STATS: Dict[str, Any] = {"warmups": 0, "warmup_failures": 0, "last_warmup_ms": None}
+_KEEPALIVE_STARTED = threading.Event()
+
+
+def warm_up() -> bool:
+    """
+    Open (or refresh) a pooled connection to openai.base_url, so the next LLM call reuses it
+    instead of paying DNS, TCP and TLS setup. Any HTTP status counts as warm; only transport
+    errors (unreachable host, timeout) return False.
+    """
+    t0 = time.time()
+    try:
+        _http_client.get(
+            f"{OPENAI_BASE_URL.rstrip('/')}/models",
+            headers={"Authorization": f"Bearer {_api_key}"},
+        )
+    except httpx.HTTPError as e:
+        with _STATS_LOCK:
+            _CONN_STATS["warmup_failures"] += 1
+        logger.warning(f"LLM connection warm-up against {OPENAI_BASE_URL} failed: {e}")
+        return False
+    elapsed_ms = round(1000 * (time.time() - t0), 1)
+    with _STATS_LOCK:
+        _CONN_STATS["warmups"] += 1
+        _CONN_STATS["last_warmup_ms"] = elapsed_ms
+    logger.debug(f"LLM connection warm ({elapsed_ms} ms)")
+    return True
+
+
+def _keepalive_loop() -> None:
+    while True:
+        time.sleep(OPENAI_HTTP_KEEPALIVE_PING_SEC)
+        warm_up()
+
+
+def start_connection_warmup() -> None:
+    """
+    Server startup hook: warm the connection in the background (openai.http.warmup) and, with
+    openai.http.keepalive_ping_sec > 0, keep touching base_url so idle periods do not let the
+    pooled connection expire. Safe to call more than once.
+    """
+    if _KEEPALIVE_STARTED.is_set():
+        return
+    _KEEPALIVE_STARTED.set()
+    if OPENAI_HTTP_WARMUP:
+        threading.Thread(target=warm_up, name="LLMWarmup", daemon=True).start()
+    if OPENAI_HTTP_KEEPALIVE_PING_SEC > 0:
+        threading.Thread(target=_keepalive_loop, name="LLMKeepalive", daemon=True).start()
+
+
+def llm_stream(system_content: str, user_content: str) -> Iterator[str]:
+    """
+    Streaming variant of llm_complete.
+    Inputs:
+      - system_content: system prompt/instructions
+      - user_content: user input/payload
+    Output:
+      - iterator over text deltas, in order, as the model produces them
+    """
+    with _inflight_slot():
+        yield from _stream(system_content, user_content)
+
+
+def _stream(
+    system_content: str,
+    user_content: str,
+    timeout: Any = _HTTP_TIMEOUT,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    logger.info("Sending streaming request to LLM")
+    params = _site_params(site)
+    logger.debug({"model": params["model"], "site": site, "user": user_content})
+    t0 = time.time()
+    try:
+        stream = client.responses.create(
+            **_responses_kwargs(params, text_format),
+            instructions=system_content,
+            input=user_content,
+            stream=True,
+            timeout=timeout,
+        )
+        for event in stream:
+            if getattr(event, "type", "") == "response.output_text.delta":
+                yield event.delta
+            elif getattr(event, "type", "") == "response.completed":
+                get_ledger().record(site, params["model"], getattr(event.response, "usage", None), time.time() - t0)
+        logger.info("Finished streaming response from LLM (client.responses)")
+    except AttributeError:
+        stream = client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content},
+            ],
+            **_chat_kwargs(params, text_format),
+            stream=True,
+            timeout=timeout,
+        )
+        usage = None
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+            usage = getattr(chunk, "usage", None) or usage
+        get_ledger().record(site, params["model"], usage, time.time() - t0)
+        logger.info("Finished streaming response from LLM (client.chat.completions)")
+
+
+def llm_complete(
+    system_content: str,
+    user_content: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    cache: bool = False,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
     """
     Unified LLM caller used across the app.
     Inputs:
       - system_content: system prompt/instructions
       - user_content: user input/payload
+      - on_delta: optional callback; when given, the response is streamed and every text delta
+        is passed to it as it arrives (e.g. to forward user-facing text to the client)
+      - cache: opt in to the response cache (llm_cache in config.yaml) for payloads that repeat
+        across sessions; a cached response is passed to on_delta in one piece
+      - site: call-site name selecting the deadline and latency statistics (llm_resilience in
+        config.yaml); requests are retried, hedged and circuit-broken per that policy
+      - text_format: optional structured-output format, e.g. {"type": "json_schema", "name": ...,
+        "schema": {...}, "strict": True}; the model's text is then JSON matching the schema
     Output:
       - plain text content returned by the model
+    In a journaled session the output is recorded, and replayed instead of calling the model
+    while a suspended session is being restored.
     """
+    journal = current_journal()
+    if journal is None:
+        return _llm_call(system_content, user_content, on_delta, cache, site, text_format)
+    if journal.replaying:
+        if journal.peek_kind() == "llm_error":
+            raise RuntimeError(journal.replay("llm_error"))
+        return journal.replay("llm")
+    try:
+        text = _llm_call(system_content, user_content, on_delta, cache, site, text_format)
+    except Exception as e:
+        journal.record("llm_error", str(e))
+        raise
+    journal.record("llm", text)
+    return text
+
+
+def _llm_call(
+    system_content: str,
+    user_content: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    cache: bool = False,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    llm_cache = get_cache() if cache else None
+    if llm_cache is None and not (cache and LLM_SINGLE_FLIGHT):
+        return _llm_request(system_content, user_content, on_delta, site, text_format)
+    params = _site_params(site)
+    key = cache_key(params["model"], params["effort"], _format_key(system_content, text_format), user_content)
+    text = llm_cache.get(key) if llm_cache is not None else None
+    if text is not None:
+        logger.info("LLM response served from cache")
+        if on_delta is not None:
+            on_delta(text)
+        return text
+    if not LLM_SINGLE_FLIGHT:
+        text = _llm_request(system_content, user_content, on_delta, site, text_format)
+        llm_cache.put(key, text)
+        return text
+    flight, leader = get_single_flight().join(key)
+    if not leader:
+        # An identical request is already upstream: share its result (one piece, like a cache hit)
+        text = flight.result()
+        logger.info("LLM response shared with an identical in-flight request")
+        if on_delta is not None:
+            on_delta(text)
+        return text
+    try:
+        text = _llm_request(system_content, user_content, on_delta, site, text_format)
+    except BaseException as e:
+        get_single_flight().finish(key, flight, error=e)
+        raise
+    if llm_cache is not None:
+        llm_cache.put(key, text)
+    get_single_flight().finish(key, flight, result=text)
+    return text
+
+
+def _llm_request(
+    system_content: str,
+    user_content: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    if on_delta is not None:
+        def stream_attempt(timeout: float) -> str:
+            parts = []
+            timeout = _admit(site, system_content, user_content, timeout)
+            try:
+                with _inflight_slot():
+                    for delta in _stream(system_content, user_content, timeout, site, text_format):
+                        on_delta(delta)
+                        parts.append(delta)
+            except Exception as e:
+                note_provider_error(e)
+                if parts:
+                    raise StreamInterrupted(f"LLM stream broke after {len(parts)} deltas: {e}") from e
+                raise
+            return "".join(parts)
+
+        # Deltas go straight to the user, so streamed calls are retried but never hedged
+        return call_with_policy(site, stream_attempt, hedge=False)
+
+    def attempt(timeout: float) -> str:
+        timeout = _admit(site, system_content, user_content, timeout)
+        try:
+            with _inflight_slot():
+                return _complete(system_content, user_content, timeout, site, text_format)
+        except Exception as e:
+            note_provider_error(e)
+            raise
+
+    return call_with_policy(site, attempt)
+
+
+def _admit(site: str, system_content: str, user_content: str, timeout: float) -> float:
+    """
+    Wait for rate-limit budget at the site's priority; returns the time left for the request.
+    """
+    cost = estimate_tokens(system_content, user_content, _site_params(site)["max_output_tokens"])
+    return timeout - get_scheduler().acquire(cost, priority_for(site), timeout)
+
+
+async def _admit_async(site: str, system_content: str, user_content: str, timeout: float) -> float:
+    cost = estimate_tokens(system_content, user_content, _site_params(site)["max_output_tokens"])
+    return timeout - await get_scheduler().acquire_async(cost, priority_for(site), timeout)
+
+
+def _complete(
+    system_content: str,
+    user_content: str,
+    timeout: Any = _HTTP_TIMEOUT,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
     logger.info("Sending request to LLM")
-    logger.debug({"model": OPENAI_MODEL, "user": user_content})
+    params = _site_params(site)
+    logger.debug({"model": params["model"], "site": site, "user": user_content})
+    t0 = time.time()
     try:
         resp = client.responses.create(
-            model=OPENAI_MODEL,
-            reasoning={"effort": "low"},
+            **_responses_kwargs(params, text_format),
             instructions=system_content,
             input=user_content,
+            timeout=timeout,
         )
+        get_ledger().record(site, params["model"], getattr(resp, "usage", None), time.time() - t0)
         logger.info("Received response from LLM (client.responses)")
         return resp.output_text
     except AttributeError:
         resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
             messages=[
                 {"role": "system", "content": system_content},
                 {"role": "user", "content": user_content},
             ],
-            max_tokens=OPENAI_MAX_TOKENS,
-            temperature=OPENAI_TEMPERATURE,
+            **_chat_kwargs(params, text_format),
+            timeout=timeout,
         )
+        get_ledger().record(site, params["model"], getattr(resp, "usage", None), time.time() - t0)
         logger.info("Received response from LLM (client.chat.completions)")
         return resp.choices[0].message.content
 
 
-__all__ = ["llm_complete"]
+# === Async client ===
+
+# One AsyncOpenAI client per event loop: its connection pool belongs to the loop that opened it
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+# One background event loop for llm_gather across all threads, so its AsyncOpenAI client and
+# connections are shared instead of left behind by every session thread
+_GATHER_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_GATHER_LOOP_LOCK = threading.Lock()
+
+
+def _async_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    async_client = _ASYNC_CLIENTS.get(loop)
+    if async_client is None:
+        async_client = AsyncOpenAI(
+            api_key=_api_key,
+            base_url=OPENAI_BASE_URL,
+            timeout=_HTTP_TIMEOUT,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT, http2=_HTTP2, follow_redirects=True),
+        )
+        _ASYNC_CLIENTS[loop] = async_client
+    return async_client
+
+
+async def llm_stream_async(system_content: str, user_content: str) -> AsyncIterator[str]:
+    """
+    Async variant of llm_stream: async iterator over text deltas.
+    """
+    async with _inflight_slot_async():
+        async for delta in _stream_async(system_content, user_content):
+            yield delta
+
+
+async def _stream_async(
+    system_content: str,
+    user_content: str,
+    timeout: Any = _HTTP_TIMEOUT,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    logger.info("Sending streaming request to LLM (async)")
+    params = _site_params(site)
+    logger.debug({"model": params["model"], "site": site, "user": user_content})
+    t0 = time.time()
+    async_client = _async_client()
+    try:
+        stream = await async_client.responses.create(
+            **_responses_kwargs(params, text_format),
+            instructions=system_content,
+            input=user_content,
+            stream=True,
+            timeout=timeout,
+        )
+        async for event in stream:
+            if getattr(event, "type", "") == "response.output_text.delta":
+                yield event.delta
+            elif getattr(event, "type", "") == "response.completed":
+                get_ledger().record(site, params["model"], getattr(event.response, "usage", None), time.time() - t0)
+        logger.info("Finished streaming response from LLM (async client.responses)")
+    except AttributeError:
+        stream = await async_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content},
+            ],
+            **_chat_kwargs(params, text_format),
+            stream=True,
+            timeout=timeout,
+        )
+        usage = None
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+            usage = getattr(chunk, "usage", None) or usage
+        get_ledger().record(site, params["model"], usage, time.time() - t0)
+        logger.info("Finished streaming response from LLM (async client.chat.completions)")
+
+
+async def llm_complete_async(
+    system_content: str,
+    user_content: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    cache: bool = False,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Async variant of llm_complete (same inputs, output, caching, journaling and resilience policy).
+    The waiting holds only a coroutine, so independent calls can overlap (see llm_gather).
+    """
+    journal = current_journal()
+    if journal is None:
+        return await _llm_call_async(system_content, user_content, on_delta, cache, site, text_format)
+    if journal.replaying:
+        if journal.peek_kind() == "llm_error":
+            raise RuntimeError(journal.replay("llm_error"))
+        return journal.replay("llm")
+    # Reserve the journal entry now: overlapping calls finish in any order, but replay goes by call order
+    entry = journal.reserve()
+    try:
+        text = await _llm_call_async(system_content, user_content, on_delta, cache, site, text_format)
+    except BaseException as e:
+        entry[:] = ["llm_error", str(e)]
+        raise
+    entry[:] = ["llm", text]
+    return text
+
+
+async def _llm_call_async(
+    system_content: str,
+    user_content: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    cache: bool = False,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    llm_cache = get_cache() if cache else None
+    if llm_cache is None and not (cache and LLM_SINGLE_FLIGHT):
+        return await _llm_request_async(system_content, user_content, on_delta, site, text_format)
+    params = _site_params(site)
+    key = cache_key(params["model"], params["effort"], _format_key(system_content, text_format), user_content)
+    text = llm_cache.get(key) if llm_cache is not None else None
+    if text is not None:
+        logger.info("LLM response served from cache")
+        if on_delta is not None:
+            on_delta(text)
+        return text
+    if not LLM_SINGLE_FLIGHT:
+        text = await _llm_request_async(system_content, user_content, on_delta, site, text_format)
+        llm_cache.put(key, text)
+        return text
+    flight, leader = get_single_flight().join(key)
+    if not leader:
+        # An identical request is already upstream: share its result (one piece, like a cache hit)
+        # shield: a cancelled follower must not cancel the leader's Future
+        text = await asyncio.shield(asyncio.wrap_future(flight))
+        logger.info("LLM response shared with an identical in-flight request")
+        if on_delta is not None:
+            on_delta(text)
+        return text
+    try:
+        text = await _llm_request_async(system_content, user_content, on_delta, site, text_format)
+    except BaseException as e:
+        get_single_flight().finish(key, flight, error=e)
+        raise
+    if llm_cache is not None:
+        llm_cache.put(key, text)
+    get_single_flight().finish(key, flight, result=text)
+    return text
+
+
+async def _llm_request_async(
+    system_content: str,
+    user_content: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    if on_delta is not None:
+        async def stream_attempt(timeout: float) -> str:
+            parts = []
+            timeout = await _admit_async(site, system_content, user_content, timeout)
+            try:
+                async with _inflight_slot_async():
+                    async for delta in _stream_async(system_content, user_content, timeout, site, text_format):
+                        on_delta(delta)
+                        parts.append(delta)
+            except Exception as e:
+                note_provider_error(e)
+                if parts:
+                    raise StreamInterrupted(f"LLM stream broke after {len(parts)} deltas: {e}") from e
+                raise
+            return "".join(parts)
+
+        return await call_with_policy_async(site, stream_attempt, hedge=False)
+
+    async def attempt(timeout: float) -> str:
+        timeout = await _admit_async(site, system_content, user_content, timeout)
+        try:
+            async with _inflight_slot_async():
+                return await _complete_async(system_content, user_content, timeout, site, text_format)
+        except Exception as e:
+            note_provider_error(e)
+            raise
+
+    return await call_with_policy_async(site, attempt)
+
+
+async def _complete_async(
+    system_content: str,
+    user_content: str,
+    timeout: Any = _HTTP_TIMEOUT,
+    site: str = "default",
+    text_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    logger.info("Sending request to LLM (async)")
+    params = _site_params(site)
+    logger.debug({"model": params["model"], "site": site, "user": user_content})
+    t0 = time.time()
+    async_client = _async_client()
+    try:
+        resp = await async_client.responses.create(
+            **_responses_kwargs(params, text_format),
+            instructions=system_content,
+            input=user_content,
+            timeout=timeout,
+        )
+        get_ledger().record(site, params["model"], getattr(resp, "usage", None), time.time() - t0)
+        logger.info("Received response from LLM (async client.responses)")
+        return resp.output_text
+    except AttributeError:
+        resp = await async_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content},
+            ],
+            **_chat_kwargs(params, text_format),
+            timeout=timeout,
+        )
+        get_ledger().record(site, params["model"], getattr(resp, "usage", None), time.time() - t0)
+        logger.info("Received response from LLM (async client.chat.completions)")
+        return resp.choices[0].message.content
+
+
+def llm_gather(*aws: Awaitable[Any], return_exceptions: bool = False) -> List[Any]:
+    """
+    Run independent async LLM calls concurrently from synchronous code (e.g. a HandlerRL thread)
+    and return their results in argument order, like asyncio.gather. The calls run on one
+    background event loop shared by all threads, in the caller's context.
+    Inside a running event loop, use `await asyncio.gather(...)` instead.
+    """
+    loop = _gather_loop()
+    # Usage session, journal and priority are context variables of the calling thread
+    ctx = contextvars.copy_context()
+    result: "concurrent.futures.Future[List[Any]]" = concurrent.futures.Future()
+
+    async def _gather():
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    def _done(task: "asyncio.Task[List[Any]]") -> None:
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    def _start() -> None:
+        ctx.run(loop.create_task, _gather()).add_done_callback(_done)
+
+    loop.call_soon_threadsafe(_start)
+    return result.result()
+
+
+def _gather_loop() -> asyncio.AbstractEventLoop:
+    global _GATHER_LOOP
+    with _GATHER_LOOP_LOCK:
+        if _GATHER_LOOP is None:
+            _GATHER_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_GATHER_LOOP.run_forever, name="LLMGatherLoop", daemon=True).start()
+        return _GATHER_LOOP
+
+
+__all__ = [
+    "llm_complete",
+    "llm_stream",
+    "llm_complete_async",
+    "llm_stream_async",
+    "llm_gather",
+    "llm_stats",
+    "warm_up",
+    "start_connection_warmup",
+]
 
 
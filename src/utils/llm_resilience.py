@@ -0,0 +1,431 @@
+import asyncio
+import contextvars
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.utils.config_loader import (
+    LLM_BACKOFF_BASE_SEC,
+    LLM_BACKOFF_MAX_SEC,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET_SEC,
+    LLM_DEADLINES,
+    LLM_DEFAULT_DEADLINE_SEC,
+    LLM_HEDGE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_MIN_SEC,
+    LLM_HEDGE_QUANTILE,
+    LLM_RETRIES,
+)
+from src.utils.llm_scheduler import AdmissionTimeout, llm_priority
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("LLMResilience")
+
+# Latencies kept per call site for the hedge threshold
+_LATENCY_WINDOW = 200
+# HTTP statuses worth retrying: timeout, conflict, rate limit, upstream errors
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(RuntimeError):
+    """
+    The LLM is not answering within policy: the circuit breaker is open or the call site's
+    deadline ran out. A RuntimeError, so the existing `except Exception` fallbacks
+    (raw greeting, ("NA", 99) classification, fixed closing) take over.
+    """
+
+
+class StreamInterrupted(RuntimeError):
+    """
+    A streamed call failed after text was already forwarded to the user; not retried,
+    since a retry would repeat the text.
+    """
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Transient failures: timeouts, connection errors, 408/409/429/5xx. Client errors
+    (bad request, auth) fail at once.
+    """
+    if isinstance(exc, (StreamInterrupted, LLMUnavailable)):
+        return False
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in _RETRYABLE_STATUS
+    # openai.APITimeoutError / APIConnectionError carry no status code
+    return type(exc).__name__ in ("APITimeoutError", "APIConnectionError", "ConnectError", "ReadTimeout", "ConnectTimeout")
+
+
+def backoff_delay(retry: int) -> float:
+    """
+    Exponential backoff with full jitter: uniform in [0, min(max, base * 2**retry)].
+    Uses the module RNG, not the session RNG, so replays are unaffected.
+    """
+    return random.uniform(0, min(LLM_BACKOFF_MAX_SEC, LLM_BACKOFF_BASE_SEC * (2 ** retry)))
+
+
+def _quantile_ms(ordered: list, q: float) -> Optional[float]:
+    return round(1000 * ordered[max(0, math.ceil(q * len(ordered)) - 1)], 1) if ordered else None
+
+
+def deadline_for(site: str) -> float:
+    return float(LLM_DEADLINES.get(site, LLM_DEFAULT_DEADLINE_SEC))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker shared by all call sites (they hit the same upstream).
+    - closed: calls go through; failure_threshold transient failures in a row open it
+    - open: calls fail fast with LLMUnavailable for reset_sec
+    - half-open: one trial call goes through; success closes it, failure re-opens it
+    """
+
+    def __init__(self, failure_threshold: int, reset_sec: float):
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.opened_total = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.time() - self._opened_at >= self.reset_sec else "open"
+
+    def allow(self) -> bool:
+        return self.enter() is not None
+
+    def enter(self) -> Optional[bool]:
+        """
+        None when the call must fail fast; otherwise whether it is the half-open trial call.
+        A trial call that records neither success nor failure must be ended with leave(True).
+        """
+        if self.failure_threshold <= 0:
+            return False
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return None
+
+    def leave(self, trial: bool) -> None:
+        """End a call; a trial that ended without a verdict (rate limit, cancellation) frees the slot."""
+        if trial:
+            with self._lock:
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("LLM circuit breaker closed.")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    self.opened_total += 1
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} consecutive failures.")
+                self._opened_at = time.time()
+                self._trial_in_flight = False
+
+
+class _SiteStats:
+    """
+    Recent latencies and counters of one call site.
+    """
+
+    def __init__(self):
+        self.latencies = deque(maxlen=_LATENCY_WINDOW)
+        self.counters = {"calls": 0, "failures": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0}
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds after which a duplicate request is sent: the observed quantile latency
+        (nearest rank), never below hedge_min_sec; None until enough samples exist.
+        """
+        if len(self.latencies) < max(1, LLM_HEDGE_MIN_SAMPLES):
+            return None
+        ordered = sorted(self.latencies)
+        idx = max(0, math.ceil(LLM_HEDGE_QUANTILE * len(ordered)) - 1)
+        return max(LLM_HEDGE_MIN_SEC, ordered[idx])
+
+
+_BREAKER = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SEC)
+_SITES: Dict[str, _SiteStats] = {}
+_SITES_LOCK = threading.Lock()
+# Threads running hedged duplicates (speculative work, bounded)
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="LLMHedge")
+
+
+def _site(site: str) -> _SiteStats:
+    with _SITES_LOCK:
+        stats = _SITES.get(site)
+        if stats is None:
+            stats = _SITES[site] = _SiteStats()
+        return stats
+
+
+def _count(stats: _SiteStats, name: str) -> None:
+    with _SITES_LOCK:
+        stats.counters[name] += 1
+
+
+def call_with_policy(site: str, attempt: Callable[[float], str], hedge: bool = True) -> str:
+    """
+    Run attempt(timeout_sec) under the call site's policy (llm_resilience in config.yaml):
+    - deadline: the whole call, retries and backoff included, ends within deadline_for(site);
+      each attempt gets the remaining time as its request timeout
+    - hedging (if hedge): when an attempt runs past the site's observed p95, a duplicate is
+      sent and whichever returns first wins
+    - retries: transient failures are retried up to `retries` times with jittered backoff
+    - circuit breaker: fails fast with LLMUnavailable while the upstream keeps failing
+    """
+    stats = _site(site)
+    _count(stats, "calls")
+    trial = _BREAKER.enter()
+    if trial is None:
+        _count(stats, "failures")
+        raise LLMUnavailable(f"LLM circuit breaker is open (site {site})")
+    budget = deadline_for(site)
+    deadline = time.monotonic() + budget
+    retry = 0
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            t0 = time.monotonic()
+            try:
+                text = _hedged(stats, attempt, remaining) if hedge and LLM_HEDGE else attempt(remaining)
+            except Exception as e:
+                if isinstance(e, AdmissionTimeout):
+                    # Queued behind the rate limit for the whole deadline; the upstream is not at fault
+                    _count(stats, "failures")
+                    _count(stats, "deadline_exceeded")
+                    raise LLMUnavailable(f"LLM call for site {site} got no rate-limit budget within {budget:.0f}s") from e
+                if not is_retryable(e):
+                    # The request itself was refused; says nothing about the upstream's health
+                    _count(stats, "failures")
+                    raise
+                _BREAKER.record_failure()
+                delay = backoff_delay(retry)
+                if retry >= LLM_RETRIES or time.monotonic() + delay >= deadline:
+                    _count(stats, "failures")
+                    if time.monotonic() + delay >= deadline:
+                        _count(stats, "deadline_exceeded")
+                        raise LLMUnavailable(f"LLM call for site {site} did not finish within {budget:.0f}s: {e}") from e
+                    raise
+                retry_trial = _BREAKER.enter()
+                if retry_trial is None:
+                    _count(stats, "failures")
+                    raise
+                trial = trial or retry_trial
+                logger.warning(f"LLM call for site {site} failed ({e}); retry {retry + 1}/{LLM_RETRIES} in {delay:.2f}s")
+                _count(stats, "retries")
+                retry += 1
+                time.sleep(delay)
+                continue
+            _BREAKER.record_success()
+            with _SITES_LOCK:
+                stats.latencies.append(time.monotonic() - t0)
+            return text
+    finally:
+        _BREAKER.leave(trial)
+
+
+def _hedged(stats: _SiteStats, attempt: Callable[[float], str], timeout: float) -> str:
+    delay = stats.hedge_delay()
+    if delay is None or delay >= timeout:
+        return attempt(timeout)
+    t0 = time.monotonic()
+    # The first attempt gets its own thread, so it never queues behind other calls' hedges in
+    # _HEDGE_POOL; it keeps the caller's context (e.g. a background priority override)
+    first = _start_primary(attempt, timeout)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        return first.result()
+    _count(stats, "hedges")
+    logger.info(f"LLM call passed {delay:.2f}s; sending a hedged duplicate")
+    # The duplicate also runs in a copy of the caller's context (session usage, priority)
+    second = _HEDGE_POOL.submit(contextvars.copy_context().run, _speculative, attempt,
+                                max(0.1, timeout - (time.monotonic() - t0)))
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - t0)),
+                             return_when=FIRST_COMPLETED)
+        if not done:
+            raise TimeoutError(f"LLM call did not finish within {timeout:.1f}s")
+        for f in done:
+            if f.exception() is None:
+                if f is second:
+                    _count(stats, "hedge_wins")
+                return f.result()
+            error = error or f.exception()
+    raise error
+
+
+def _start_primary(attempt: Callable[[float], str], timeout: float) -> "Future[str]":
+    future: "Future[str]" = Future()
+    ctx = contextvars.copy_context()
+
+    def _run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(ctx.run(attempt, timeout))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=_run, name="LLMPrimary", daemon=True).start()
+    return future
+
+
+def _speculative(attempt: Callable[[float], str], timeout: float) -> str:
+    # A hedged duplicate is speculative work: it yields rate-limit budget to waiting user calls
+    with llm_priority("background"):
+        return attempt(timeout)
+
+
+async def _speculative_async(attempt: Callable[[float], Awaitable[str]], timeout: float) -> str:
+    with llm_priority("background"):
+        return await attempt(timeout)
+
+
+async def call_with_policy_async(site: str, attempt: Callable[[float], Awaitable[str]], hedge: bool = True) -> str:
+    """
+    Async counterpart of call_with_policy; the losing hedged attempt is cancelled.
+    """
+    stats = _site(site)
+    _count(stats, "calls")
+    trial = _BREAKER.enter()
+    if trial is None:
+        _count(stats, "failures")
+        raise LLMUnavailable(f"LLM circuit breaker is open (site {site})")
+    budget = deadline_for(site)
+    deadline = time.monotonic() + budget
+    retry = 0
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            t0 = time.monotonic()
+            try:
+                if hedge and LLM_HEDGE:
+                    text = await _hedged_async(stats, attempt, remaining)
+                else:
+                    text = await asyncio.wait_for(attempt(remaining), remaining)
+            except Exception as e:
+                if isinstance(e, AdmissionTimeout):
+                    # Queued behind the rate limit for the whole deadline; the upstream is not at fault
+                    _count(stats, "failures")
+                    _count(stats, "deadline_exceeded")
+                    raise LLMUnavailable(f"LLM call for site {site} got no rate-limit budget within {budget:.0f}s") from e
+                if not is_retryable(e):
+                    _count(stats, "failures")
+                    raise
+                _BREAKER.record_failure()
+                delay = backoff_delay(retry)
+                if retry >= LLM_RETRIES or time.monotonic() + delay >= deadline:
+                    _count(stats, "failures")
+                    if time.monotonic() + delay >= deadline:
+                        _count(stats, "deadline_exceeded")
+                        raise LLMUnavailable(f"LLM call for site {site} did not finish within {budget:.0f}s: {e}") from e
+                    raise
+                retry_trial = _BREAKER.enter()
+                if retry_trial is None:
+                    _count(stats, "failures")
+                    raise
+                trial = trial or retry_trial
+                logger.warning(f"LLM call for site {site} failed ({e}); retry {retry + 1}/{LLM_RETRIES} in {delay:.2f}s")
+                _count(stats, "retries")
+                retry += 1
+                await asyncio.sleep(delay)
+                continue
+            _BREAKER.record_success()
+            with _SITES_LOCK:
+                stats.latencies.append(time.monotonic() - t0)
+            return text
+    finally:
+        # Also on cancellation: a half-open trial that never got a verdict must not block the breaker
+        _BREAKER.leave(trial)
+
+
+async def _hedged_async(stats: _SiteStats, attempt: Callable[[float], Awaitable[str]], timeout: float) -> str:
+    delay = stats.hedge_delay()
+    first = asyncio.ensure_future(attempt(timeout))
+    if delay is None or delay >= timeout:
+        return await asyncio.wait_for(first, timeout)
+    t0 = time.monotonic()
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+    _count(stats, "hedges")
+    logger.info(f"LLM call passed {delay:.2f}s; sending a hedged duplicate")
+    second = asyncio.ensure_future(_speculative_async(attempt, max(0.1, timeout - (time.monotonic() - t0))))
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, timeout - (time.monotonic() - t0)),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError()
+            for f in done:
+                if f.exception() is None:
+                    if f is second:
+                        _count(stats, "hedge_wins")
+                    return f.result()
+                error = error or f.exception()
+        raise error
+    finally:
+        for f in (first, second):
+            if not f.done():
+                f.cancel()
+
+
+def resilience_stats() -> Dict[str, Any]:
+    """
+    Breaker state and per-site counters/latency quantiles for /metrics.
+    """
+    sites = {}
+    with _SITES_LOCK:
+        for name, stats in _SITES.items():
+            ordered = sorted(stats.latencies)
+            sites[name] = dict(
+                stats.counters,
+                p50_ms=_quantile_ms(ordered, 0.5),
+                p95_ms=_quantile_ms(ordered, 0.95),
+                deadline_sec=deadline_for(name),
+            )
+    return {"breaker": _BREAKER.state, "breaker_opened_total": _BREAKER.opened_total, "sites": sites}
+
+
+__all__ = [
+    "LLMUnavailable",
+    "StreamInterrupted",
+    "CircuitBreaker",
+    "call_with_policy",
+    "call_with_policy_async",
+    "resilience_stats",
+]
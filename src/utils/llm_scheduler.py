@@ -0,0 +1,264 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from src.utils.config_loader import (
+    LLM_SCHED_BURST_SEC,
+    LLM_SCHED_DEFAULT_PRIORITY,
+    LLM_SCHED_OUTPUT_TOKENS,
+    LLM_SCHED_PRIORITIES,
+    LLM_SCHED_RPM,
+    LLM_SCHED_TPM,
+)
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("LLMScheduler")
+
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "normal": 1, "background": 2}
+
+# Priority override for the current thread / task (batch scoring, hedged duplicates)
+_PRIORITY: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_priority", default=None)
+
+
+@contextmanager
+def llm_priority(name: str) -> Iterator[None]:
+    """
+    Run the enclosed LLM calls at the given priority ("interactive", "normal", "background"),
+    overriding the per-site priority from config.yaml.
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {name}")
+    token = _PRIORITY.set(name)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def priority_for(site: str) -> str:
+    return _PRIORITY.get() or LLM_SCHED_PRIORITIES.get(site, LLM_SCHED_DEFAULT_PRIORITY)
+
+
+def estimate_tokens(system_content: str, user_content: str, max_output_tokens: int = 0) -> int:
+    """
+    Rough token cost of one call: ~4 characters per prompt token plus the expected output
+    (the call site's output cap when it has one).
+    """
+    output = min(max_output_tokens, LLM_SCHED_OUTPUT_TOKENS) if max_output_tokens else LLM_SCHED_OUTPUT_TOKENS
+    return math.ceil((len(system_content) + len(user_content)) / 4) + output
+
+
+class AdmissionTimeout(TimeoutError):
+    """
+    A call did not get rate-limit budget within its deadline (local queueing, not an upstream failure).
+    """
+
+
+class LLMScheduler:
+    """
+    Requests-per-minute and tokens-per-minute token buckets shared by every session in the
+    process, with a priority queue in front of them.
+    - each bucket refills continuously at rpm/60 (tpm/60) per second and holds burst_sec
+      worth of budget, so throughput stays at a steady ceiling instead of bursting into
+      provider throttling
+    - waiting calls are admitted strictly by (priority, arrival): an interactive call never
+      waits behind background work that has not been admitted yet
+    - a provider 429 pauses admission for its Retry-After
+    rpm/tpm of 0 disable that bucket.
+    """
+
+    def __init__(self, rpm: float, tpm: float, burst_sec: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._req_capacity = max(1.0, rpm / 60.0 * burst_sec) if rpm > 0 else 0.0
+        self._tok_capacity = max(float(LLM_SCHED_OUTPUT_TOKENS), tpm / 60.0 * burst_sec) if tpm > 0 else 0.0
+        self._req = self._req_capacity
+        self._tok = self._tok_capacity
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._queue: list = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._stats: Dict[str, Dict[str, float]] = {
+            name: {"admitted": 0, "wait_total_sec": 0.0, "wait_max_sec": 0.0, "timeouts": 0} for name in PRIORITIES
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.rpm > 0:
+            self._req = min(self._req_capacity, self._req + elapsed * self.rpm / 60.0)
+        if self.tpm > 0:
+            self._tok = min(self._tok_capacity, self._tok + elapsed * self.tpm / 60.0)
+
+    def _delay_until_fits(self, cost: float) -> float:
+        """Seconds until the buckets hold one request and `cost` tokens (0 if they do now)."""
+        delay = max(0.0, self._paused_until - time.monotonic())
+        if self.rpm > 0 and self._req < 1:
+            delay = max(delay, (1 - self._req) * 60.0 / self.rpm)
+        if self.tpm > 0 and self._tok < cost:
+            delay = max(delay, (cost - self._tok) * 60.0 / self.tpm)
+        return delay
+
+    def _try_take(self, key: tuple, cost: float) -> float:
+        """
+        Admit the call if it heads the queue and the buckets cover it (returns 0), otherwise
+        return how long to wait before checking again. Caller holds the lock.
+        """
+        self._refill()
+        if self._queue[0] != key:
+            return 0.05
+        delay = self._delay_until_fits(cost)
+        if delay > 0:
+            return delay
+        heapq.heappop(self._queue)
+        if self.rpm > 0:
+            self._req -= 1
+        if self.tpm > 0:
+            self._tok -= cost
+        self._cond.notify_all()
+        return 0.0
+
+    def _enqueue(self, priority: str, cost: float) -> tuple:
+        key = (PRIORITIES[priority], next(self._seq))
+        heapq.heappush(self._queue, key)
+        # Never ask for more than a full bucket, or the call could never be admitted
+        return key, min(cost, self._tok_capacity) if self.tpm > 0 else cost
+
+    def _dequeue(self, key: tuple, priority: str) -> None:
+        self._queue.remove(key)
+        heapq.heapify(self._queue)
+        self._stats[priority]["timeouts"] += 1
+        self._cond.notify_all()
+
+    def _admitted(self, priority: str, waited: float) -> None:
+        stats = self._stats[priority]
+        stats["admitted"] += 1
+        stats["wait_total_sec"] += waited
+        stats["wait_max_sec"] = max(stats["wait_max_sec"], waited)
+        if waited > 1.0:
+            logger.info(f"LLM call ({priority}) waited {waited:.2f}s for rate-limit budget")
+
+    def acquire(self, cost: float, priority: str, timeout: float) -> float:
+        """
+        Block until the call is admitted; returns the seconds waited.
+        Raises AdmissionTimeout if it is not admitted within timeout.
+        """
+        if not self.enabled:
+            return 0.0
+        t0 = time.monotonic()
+        with self._cond:
+            key, cost = self._enqueue(priority, cost)
+            while True:
+                delay = self._try_take(key, cost)
+                if delay == 0.0:
+                    waited = time.monotonic() - t0
+                    self._admitted(priority, waited)
+                    return waited
+                remaining = timeout - (time.monotonic() - t0)
+                if remaining <= 0:
+                    self._dequeue(key, priority)
+                    raise AdmissionTimeout(f"LLM rate limit: not admitted within {timeout:.1f}s ({priority})")
+                self._cond.wait(min(delay, remaining))
+
+    async def acquire_async(self, cost: float, priority: str, timeout: float) -> float:
+        """
+        Async counterpart of acquire; polls without blocking the event loop.
+        """
+        if not self.enabled:
+            return 0.0
+        t0 = time.monotonic()
+        with self._cond:
+            key, cost = self._enqueue(priority, cost)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_take(key, cost)
+                    if delay == 0.0:
+                        waited = time.monotonic() - t0
+                        self._admitted(priority, waited)
+                        return waited
+                    remaining = timeout - (time.monotonic() - t0)
+                    if remaining <= 0:
+                        self._dequeue(key, priority)
+                        raise AdmissionTimeout(f"LLM rate limit: not admitted within {timeout:.1f}s ({priority})")
+                await asyncio.sleep(min(delay, remaining, 0.05))
+        except asyncio.CancelledError:
+            with self._cond:
+                if key in self._queue:
+                    self._dequeue(key, priority)
+            raise
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop admitting calls for `seconds` (the provider answered 429 with this Retry-After).
+        """
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            logger.warning(f"LLM provider throttled us; pausing admission for {seconds:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill()
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "queued": len(self._queue),
+                "request_budget": round(self._req, 2) if self.rpm > 0 else None,
+                "token_budget": round(self._tok) if self.tpm > 0 else None,
+                "by_priority": {
+                    name: {
+                        "admitted": int(s["admitted"]),
+                        "timeouts": int(s["timeouts"]),
+                        "wait_avg_ms": round(1000 * s["wait_total_sec"] / s["admitted"], 1) if s["admitted"] else 0.0,
+                        "wait_max_ms": round(1000 * s["wait_max_sec"], 1),
+                    }
+                    for name, s in self._stats.items()
+                },
+            }
+
+
+def note_provider_error(exc: BaseException) -> None:
+    """
+    Pause admission when the provider answered 429, for its Retry-After (default 1s).
+    """
+    if getattr(exc, "status_code", None) != 429:
+        return
+    retry_after = 1.0
+    try:
+        retry_after = float(exc.response.headers.get("retry-after", retry_after))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    _SCHEDULER.pause(retry_after)
+
+
+_SCHEDULER = LLMScheduler(LLM_SCHED_RPM, LLM_SCHED_TPM, LLM_SCHED_BURST_SEC)
+
+
+def get_scheduler() -> LLMScheduler:
+    return _SCHEDULER
+
+
+__all__ = [
+    "AdmissionTimeout",
+    "LLMScheduler",
+    "PRIORITIES",
+    "estimate_tokens",
+    "get_scheduler",
+    "llm_priority",
+    "note_provider_error",
+    "priority_for",
+]
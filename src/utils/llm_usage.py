@@ -0,0 +1,191 @@
+import contextvars
+import csv
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from src.utils.config_loader import LLM_PRICES
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("LLMUsage")
+
+# Counters kept per call site (process-wide and per session)
+_FIELDS = ("calls", "input_tokens", "cached_tokens", "output_tokens", "reasoning_tokens", "wall_sec", "cost_usd")
+
+# Session (subject_ID) the current thread / task is making LLM calls for
+_SESSION: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_usage_session", default=None)
+
+
+def bind_usage_session(subject_id: Optional[str]) -> None:
+    """
+    Tag the LLM calls of the current thread with this session (HandlerRL.setup).
+    """
+    _SESSION.set(str(subject_id) if subject_id is not None else None)
+
+
+@contextmanager
+def usage_session(subject_id: str) -> Iterator[None]:
+    """
+    Tag the enclosed LLM calls with this session (e.g. one batch transcript).
+    """
+    token = _SESSION.set(str(subject_id))
+    try:
+        yield
+    finally:
+        _SESSION.reset(token)
+
+
+def _get(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+
+def parse_usage(usage: Any) -> Dict[str, int]:
+    """
+    Token counts from a Responses API usage object (input/output tokens) or a chat
+    completions one (prompt/completion tokens); missing fields count as 0.
+    """
+    input_tokens = _get(usage, "input_tokens")
+    if input_tokens is None:
+        input_tokens = _get(usage, "prompt_tokens")
+    output_tokens = _get(usage, "output_tokens")
+    if output_tokens is None:
+        output_tokens = _get(usage, "completion_tokens")
+    input_details = _get(usage, "input_tokens_details") or _get(usage, "prompt_tokens_details")
+    output_details = _get(usage, "output_tokens_details") or _get(usage, "completion_tokens_details")
+    return {
+        "input_tokens": int(input_tokens or 0),
+        "cached_tokens": int(_get(input_details, "cached_tokens") or 0),
+        "output_tokens": int(output_tokens or 0),
+        "reasoning_tokens": int(_get(output_details, "reasoning_tokens") or 0),
+    }
+
+
+def estimate_cost(model: str, tokens: Dict[str, int]) -> float:
+    """
+    USD cost from llm_usage.prices (per 1M tokens); 0 for models without a price.
+    Cached input tokens are billed at the cached rate, reasoning tokens as output.
+    """
+    price = LLM_PRICES.get(model)
+    if not price:
+        return 0.0
+    cached = tokens["cached_tokens"]
+    uncached = max(0, tokens["input_tokens"] - cached)
+    return (
+        uncached * float(price.get("input", 0))
+        + cached * float(price.get("cached_input", price.get("input", 0)))
+        + tokens["output_tokens"] * float(price.get("output", 0))
+    ) / 1_000_000
+
+
+class UsageLedger:
+    """
+    Token counts, wall time and estimated cost of LLM calls, by call site:
+    - process totals, for /metrics
+    - per session (subject_ID), written to Usage_{subject_id}.csv when the session ends
+    Session totals live in memory until then; a suspended session parks them in a file
+    (write_session) and restore_session reads them back when it resumes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._sessions: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    @staticmethod
+    def _add(table: Dict[str, Dict[str, float]], site: str, row: Dict[str, float]) -> None:
+        entry = table.setdefault(site, dict.fromkeys(_FIELDS, 0))
+        for field in _FIELDS:
+            entry[field] += row.get(field, 0)
+
+    def record(self, site: str, model: str, usage: Any, wall_sec: float) -> None:
+        tokens = parse_usage(usage)
+        row = dict(tokens, calls=1, wall_sec=wall_sec, cost_usd=estimate_cost(model, tokens))
+        session = _SESSION.get()
+        with self._lock:
+            self._add(self._totals, site, row)
+            if session is not None:
+                self._add(self._sessions.setdefault(session, {}), site, row)
+        logger.debug(f"LLM usage [{site}/{model}] session={session} {tokens} {wall_sec:.2f}s")
+
+    def session_usage(self, subject_id: str) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {site: dict(row) for site, row in self._sessions.get(str(subject_id), {}).items()}
+
+    def write_session(self, subject_id: str, usage_file: str) -> Optional[str]:
+        """
+        Write the session's per-site usage (plus a TOTAL row) to usage_file and forget it.
+        Returns the path, or None if the session made no LLM calls.
+        """
+        with self._lock:
+            sites = self._sessions.pop(str(subject_id), None)
+        if not sites:
+            return None
+        total = dict.fromkeys(_FIELDS, 0)
+        for row in sites.values():
+            for field in _FIELDS:
+                total[field] += row[field]
+        os.makedirs(os.path.dirname(usage_file) or ".", exist_ok=True)
+        tmp = usage_file + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["Site", *(_FIELDS)])
+            for site, row in sorted(sites.items(), key=lambda kv: -kv[1]["input_tokens"]):
+                w.writerow([site, *(_fmt(field, row[field]) for field in _FIELDS)])
+            w.writerow(["TOTAL", *(_fmt(field, total[field]) for field in _FIELDS)])
+        os.replace(tmp, usage_file)
+        return usage_file
+
+    def restore_session(self, subject_id: str, usage_file: str) -> bool:
+        """
+        Add the per-site rows of a usage file written by write_session back to the session's
+        totals and delete the file (a suspended session resuming). False if there was none.
+        """
+        try:
+            with open(usage_file, "r", newline="", encoding="utf-8") as f:
+                rows = {
+                    r["Site"]: {field: float(r.get(field) or 0) for field in _FIELDS}
+                    for r in csv.DictReader(f) if r.get("Site") not in (None, "TOTAL")
+                }
+            os.remove(usage_file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, csv.Error) as e:
+            logger.warning(f"Failed to restore LLM usage for subject {subject_id} from {usage_file}: {e}")
+            return False
+        with self._lock:
+            table = self._sessions.setdefault(str(subject_id), {})
+            for site, row in rows.items():
+                self._add(table, site, row)
+        return True
+
+    def discard_session(self, subject_id: str) -> bool:
+        """Forget the session's totals without writing them; True if there were any."""
+        with self._lock:
+            return self._sessions.pop(str(subject_id), None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sites = {site: {f: _fmt(f, row[f]) for f in _FIELDS} for site, row in self._totals.items()}
+            return {"open_sessions": len(self._sessions), "sites": sites}
+
+
+def _fmt(field: str, value: float):
+    if field == "cost_usd":
+        return round(value, 6)
+    if field == "wall_sec":
+        return round(value, 3)
+    return int(value)
+
+
+_LEDGER = UsageLedger()
+
+
+def get_ledger() -> UsageLedger:
+    return _LEDGER
+
+
+__all__ = ["UsageLedger", "bind_usage_session", "get_ledger", "parse_usage", "usage_session"]
@@ -1,6 +1,18 @@
 import re
 import json
-from src.response_analyzer import classify_dimension_and_score
+from src.response_analyzer import classify_dimension_and_score, classify_segments_batch, repair_classification
+from src.utils.answer_rules import match_answer
+from src.utils.classifier_schema import (
+    canonical_label,
+    classification_format,
+    library_labels,
+    record,
+    record_repair_call,
+    validate,
+    validate_batch,
+)
+from src.utils.config_loader import CLASSIFIER_SCHEMA_ENABLED, CLASSIFIER_SCHEMA_REPAIR_ATTEMPTS, OPENAI_BATCH_SEGMENTS
+from src.utils.dla_classifier import classify_local
 from src.utils.log_util import get_logger
 logger = get_logger("ResponseBridge")
 
@@ -26,13 +38,6 @@ def _normalize_dim_score(dim: str, score: int):
     logger.debug(f"Dimension and score normalized: ({dim}, {score})")
     return dim, score
 
-    # Ensure score is an integer between 0 and 2 (inclusive)
-    if not isinstance(score, int) or score < 0 or score > 2:
-        logger.warning(f"Score {score} is invalid, must be int in 0-2")
-        return None
-
-    logger.debug(f"Dimension and score normalized: ({dim}, {score})")
-    return dim, score
 
 def _parse_dim_score_from_text(text: str):
     """
@@ -107,44 +112,200 @@ def _parse_from_json_like(raw: str):
     logger.debug("Could not parse dimension-score from JSON-like content.")
     return None
 
-def get_openai_resp(user_input, original_question, dimension_label: str):
+def get_openai_resp(user_input, original_question, dimension_label: str, polarity=None):
     """
     Main entry point to process model response or user input and extract a unified tuple.
     For general Yes/No/Stop/Maybe/Question answers, returns (dimension_label, Keyword).
     Otherwise, attempts to return (dimension, score:int) parsed from model output.
     Fallbacks to ('NA', 99) on parse failure.
+    polarity ("positive"/"negative", see answer_rules.question_polarity) lets answers such as
+    "I'm fine" resolve to the question's healthy keyword.
+    """
+    # Detect general answers up front with the phrase rules (data/rules/answer_phrases.json)
+    keyword = match_answer(user_input, polarity)
+    if keyword is not None:
+        logger.debug(f"Answer rule '{keyword}' matched; binding to dimension '{dimension_label}'")
+        return dimension_label, keyword
+
+    return get_dimension_score(user_input, original_question, dimension_label)
+
+def get_dimension_score(user_input, original_question, dimension_label: str = "NA"):
+    """
+    LLM classification of user_input without the quick keyword shortcuts of get_openai_resp
+    (used directly for free text such as diaries, where no yes/no question was asked).
+    Returns (dimension, score:int), (dimension_label, Keyword) for general answers, or ('NA', 99).
+    Confident predictions of the local classifier are returned without an LLM call.
     """
-    # Preprocess: get first 10 lowercased tokens after removing some punctuation for basic pattern catches
-    lower = [t.lower() for t in user_input.replace(".", " ").replace(",", " ").replace("?", " ").split()[:10]]
-
-    # Detect easy and common cases up front, for quick handling:
-    if "stop" in lower:
-        logger.debug(f"Quick token 'Stop' detected; binding to dimension '{dimension_label}'")
-        return dimension_label, "Stop"
-    if "yes" in lower:
-        logger.debug(f"Quick token 'Yes' detected; binding to dimension '{dimension_label}'")
-        return dimension_label, "Yes"
-    if "no" in lower:
-        logger.debug(f"Quick token 'No' detected; binding to dimension '{dimension_label}'")
-        return dimension_label, "No"
-    if "maybe" in lower:
-        logger.debug(f"Quick token 'Maybe' detected; binding to dimension '{dimension_label}'")
-        return dimension_label, "Maybe"
-    if "question" in lower:
-        logger.debug(f"Quick token 'Question' detected; binding to dimension '{dimension_label}'")
-        return dimension_label, "Question"
+    got = classify_local(user_input, dimension_label)
+    if got is not None:
+        logger.debug(f"Local classifier result: {got}")
+        return got
+    return _classify_llm(user_input, original_question, dimension_label)
 
+def _structured_labels():
+    """Label set for structured classification, or None to use the free-text classifier."""
+    if not CLASSIFIER_SCHEMA_ENABLED:
+        return None
+    return library_labels() or None
+
+def _classify_llm(user_input, original_question, dimension_label: str = "NA"):
+    if _structured_labels():
+        return classify_structured(user_input, original_question, dimension_label)
+    return classify_free_text(user_input, original_question, dimension_label)
+
+def classify_free_text(user_input, original_question, dimension_label: str = "NA"):
+    """
+    The LLM classifier with free-text output ('weight, 2'), parsed by _parse_classifier_output.
+    """
     try:
         # Use the response analyzer to try to classify the input
         raw = classify_dimension_and_score(user_input, original_question)
-        # Take just the first line (in case of multi-line output)
-        first = str(raw).strip().splitlines()[0].strip()
-        logger.debug(f"OpenAI raw: {raw}")
-        logger.debug(f"First line parsed: {first}")
     except Exception as e:
         # Log failure for diagnostics, fallback code
         logger.debug(f"classify_dimension_and_score exception: {e}")
         return "NA", 99
+    got = _parse_classifier_output(raw, dimension_label)
+    _record_free_text(raw, got)
+    return got
+
+def classify_structured(user_input, original_question, dimension_label: str = "NA"):
+    """
+    The LLM classifier with JSON-schema output restricted to the question library's labels
+    (classifier_schema in config.yaml). A reply failing validation is repaired without a user turn:
+    first by the free-text parsers with label canonicalization, then by asking the model again
+    (classifier_schema.repair_attempts), before falling back to ('NA', 99).
+    """
+    labels = library_labels()
+    text_format = classification_format(labels)
+    try:
+        raw = classify_dimension_and_score(user_input, original_question, text_format=text_format)
+    except Exception as e:
+        logger.debug(f"classify_dimension_and_score exception: {e}")
+        return "NA", 99
+    for attempt in range(CLASSIFIER_SCHEMA_REPAIR_ATTEMPTS + 1):
+        got, error = validate(raw, labels, dimension_label)
+        if got is not None:
+            _record_structured(got, "ok" if attempt == 0 else "repaired_llm")
+            return got
+        logger.debug(f"Structured classifier reply rejected ({error}): {raw}")
+        got = _repair_locally(raw, labels, dimension_label)
+        if got is not None:
+            _record_structured(got, "repaired_local")
+            return got
+        if attempt == CLASSIFIER_SCHEMA_REPAIR_ATTEMPTS:
+            break
+        record_repair_call("structured")
+        try:
+            raw = repair_classification(user_input, original_question, raw, error, text_format)
+        except Exception as e:
+            logger.warning(f"Classifier repair call failed: {e}")
+            break
+    record("structured", "unparsed")
+    return "NA", 99
+
+def _is_other(raw) -> bool:
+    lines = str(raw).strip().splitlines()
+    return bool(lines) and re.match(r"^\s*Other\s*,\s*\d+\s*$", lines[0], flags=re.IGNORECASE) is not None
+
+def _repair_locally(raw, labels, dimension_label: str):
+    """
+    A structured reply that failed validation, read by the free-text parsers with its dimension
+    mapped onto the label set ('Sleep' -> 'sleep', 'work_motivation' -> 'motivation'), or None.
+    """
+    got = _parse_classifier_output(raw, dimension_label)
+    if got == ("NA", 99) and _is_other(raw):
+        return got
+    if got != ("NA", 99):
+        if isinstance(got[1], str):
+            return got
+        label = canonical_label(got[0], labels)
+        if label:
+            return label, got[1]
+    # Prose such as 'The answer is about sleep, so I would rate it 2.': one library label, one score
+    found = {l for l in labels if re.search(rf"\b{re.escape(l)}\b", str(raw), flags=re.IGNORECASE)}
+    scores = set(re.findall(r"\b[0-2]\b", str(raw)))
+    if len(found) == 1 and len(scores) == 1:
+        return found.pop(), int(scores.pop())
+    return None
+
+def _record_structured(got, outcome: str) -> None:
+    record("structured", "other" if got == ("NA", 99) else outcome)
+
+def _record_free_text(raw, got) -> None:
+    labels = library_labels()
+    if got == ("NA", 99) or str(got[0]).lower() == "other":
+        # 'Other, 0' parses as dimension 'Other' before the Other check; both end as a retry turn
+        record("free_text", "other" if _is_other(raw) else "unparsed")
+    elif isinstance(got[1], int) and labels and str(got[0]).lower() not in {l.lower() for l in labels}:
+        record("free_text", "off_label")
+    else:
+        record("free_text", "ok")
+
+def get_openai_resps(segments, original_question, dimension_label: str, polarity=None):
+    """
+    get_openai_resp for every segment of one answer, in order, with a single LLM call for all
+    segments that neither the answer rules nor the local classifier resolve (openai.batch_segments).
+    Segments missing from the batched output are classified on their own.
+    """
+    results = [None] * len(segments)
+    pending = []
+    for i, seg in enumerate(segments):
+        keyword = match_answer(seg, polarity)
+        if keyword is not None:
+            logger.debug(f"Answer rule '{keyword}' matched; binding to dimension '{dimension_label}'")
+            results[i] = (dimension_label, keyword)
+            continue
+        got = classify_local(seg, dimension_label)
+        if got is not None:
+            logger.debug(f"Local classifier result: {got}")
+            results[i] = got
+            continue
+        pending.append(i)
+    if len(pending) > 1 and OPENAI_BATCH_SEGMENTS:
+        labels = _structured_labels()
+        try:
+            batch = [segments[i] for i in pending]
+            if labels:
+                raw = classify_segments_batch(batch, original_question, classification_format(labels, batch=True))
+                logger.debug(f"OpenAI batch raw: {raw}")
+                for n, got in validate_batch(raw, labels, dimension_label, len(pending)).items():
+                    _record_structured(got, "ok")
+                    results[pending[n - 1]] = got
+            else:
+                raw = classify_segments_batch(batch, original_question)
+                logger.debug(f"OpenAI batch raw: {raw}")
+                for n, text in _parse_numbered_lines(raw).items():
+                    if 1 <= n <= len(pending):
+                        results[pending[n - 1]] = _parse_classifier_output(text, dimension_label)
+                        _record_free_text(text, results[pending[n - 1]])
+        except Exception as e:
+            logger.warning(f"Batched classification failed, classifying segments one by one: {e}")
+    for i in pending:
+        if results[i] is None:
+            results[i] = _classify_llm(segments[i], original_question, dimension_label)
+    return results
+
+def _parse_numbered_lines(raw) -> dict:
+    """
+    {n: text} from lines like '1. weight, 2', '2) Yes, 0' or '[3] Other, 0'.
+    """
+    out = {}
+    for line in str(raw).strip().splitlines():
+        m = re.match(r"^\s*\[?(\d+)\s*[\]\.\):]\s*(.+?)\s*$", line)
+        if m and int(m.group(1)) not in out:
+            out[int(m.group(1))] = m.group(2)
+    return out
+
+def _parse_classifier_output(raw, dimension_label: str = "NA"):
+    """
+    Parse the LLM classifier's answer for one segment.
+    Returns (dimension, score:int), (dimension_label, Keyword) for general answers, or ('NA', 99).
+    """
+    # Take just the first line (in case of multi-line output)
+    lines = str(raw).strip().splitlines()
+    first = lines[0].strip() if lines else ""
+    logger.debug(f"OpenAI raw: {raw}")
+    logger.debug(f"First line parsed: {first}")
 
     # Try to match general words like Yes/No/Stop/Question/Maybe, possibly with a number after a comma
     m = re.match(r"^\s*(Yes|No|Stop|Question|Maybe)\s*,?\s*(\d+)?\s*$", first, flags=re.IGNORECASE)
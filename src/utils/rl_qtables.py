@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 from src.utils.config_loader import ITEM_IMPORTANCE, EPSILON
+from src.utils.session_journal import session_rng
 
 # Set up logger for this module
 from src.utils.log_util import get_logger
@@ -54,17 +55,18 @@ def choose_action(
         q_table[str(i)] = q_table[str(i)].apply(lambda x: x * mask[i])
     logger.debug("Q-table after masking (row {}): [{}]".format(state, ','.join(str(v) for v in q_table.iloc[state, :].values)))
     # Exploration: with probability 1-EPSILON or if all Q-values are zero, pick randomly
-    if (np.random.uniform() > EPSILON):
+    rng = session_rng()
+    if (rng.uniform() > EPSILON):
         # Exploration branch: choose at random among available (not masked out) actions
         available_actions = [actions[i] for i in range(1, number_states) if mask[i] == 1]
         logger.info(f"Exploring: choosing randomly among available actions {available_actions}")
-        action = np.random.choice(available_actions)
+        action = rng.choice(available_actions)
     else:
         # Exploitation branch: choose the action(s) with the highest Q-value
         max_value = np.max(state_action)
         best_actions = state_action[state_action == max_value].index
         logger.info(f"Exploiting: choosing among best actions {list(best_actions)} with Q-value {max_value}")
-        action = np.random.choice(best_actions)
+        action = rng.choice(best_actions)
     # Log action with human-readable label if provided
     if action_labels is not None:
         label = action_labels.get(str(action), str(action))
@@ -0,0 +1,180 @@
+import contextvars
+import gzip
+import json
+import random
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+
+from src.utils.state_store import get_store
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("SessionJournal")
+
+# Bump when the checkpoint layout changes; older checkpoints are then ignored
+CHECKPOINT_VERSION = 1
+
+
+class SessionSuspended(BaseException):
+    """
+    Raised inside a session thread when the user stayed idle past server.idle_suspend_sec.
+    Derives from BaseException so the generic `except Exception` fallbacks along the
+    question/CBT flow do not swallow it; the session runner catches it and checkpoints.
+    """
+
+
+class SessionJournal:
+    """
+    Everything needed to rebuild a HandlerRL session at its current turn:
+    - seed: seed of the session's private RNG (question variants, synonym rewrites, exploration)
+    - q_table_csv: the item Q-table as loaded when the session started
+    - entries: ordered [kind, value] records of every nondeterministic input the session consumed:
+      "llm" (LLM output), "llm_error" (LLM call that raised), "question" (text handed to the
+      front-end) and "answer" (user answer)
+    - autosave: re-save the checkpoint every time a question is delivered, so a worker that dies
+      mid-session can be taken over by another one (store.checkpoint_every_turn)
+    Resuming re-runs HandlerRL against the journal: recorded entries are replayed instead of
+    calling the LLM or waiting for the user and nothing is re-sent, so S, item_mask, the
+    Q-tables, question_lib scores/notes, the pending prefix and the position inside
+    ask_question/evaluate_result/run_cbt come back exactly as they were.
+    """
+
+    def __init__(self, subject_id: str, seed: Optional[int] = None, q_table_csv: Optional[str] = None,
+                 entries: Optional[List[List[Any]]] = None, autosave: bool = False):
+        self.subject_id = str(subject_id)
+        self.autosave = autosave
+        self.seed = int(seed) if seed is not None else random.SystemRandom().randrange(2 ** 32)
+        self.q_table_csv = q_table_csv
+        self.entries: List[List[Any]] = entries or []
+        self.rng = np.random.RandomState(self.seed)
+        # Entries loaded from a checkpoint are replayed; entries recorded afterwards are not
+        self._cursor = 0
+        self._replay_end = len(self.entries)
+
+    @property
+    def replaying(self) -> bool:
+        """True while recorded entries remain to be replayed."""
+        return self._cursor < self._replay_end
+
+    def peek_kind(self) -> Optional[str]:
+        """Kind of the next entry to replay, or None when replay is complete."""
+        return self.entries[self._cursor][0] if self.replaying else None
+
+    def reserve(self) -> List[Any]:
+        """
+        Append a placeholder entry, filled in place by the caller once its value is known
+        (keeps call order for overlapping async LLM calls).
+        """
+        entry: List[Any] = ["pending", None]
+        self.entries.append(entry)
+        return entry
+
+    def record(self, kind: str, value: Any) -> None:
+        self.entries.append([kind, value])
+        if self.autosave and kind == "question":
+            try:
+                self.save()
+            except Exception as e:
+                logger.warning(f"Autosave of checkpoint for subject {self.subject_id} failed: {e}")
+
+    def replay(self, kind: str) -> Any:
+        """
+        Return the next recorded value, which must be of the given kind.
+        """
+        recorded_kind, value = self.entries[self._cursor]
+        if recorded_kind != kind:
+            raise RuntimeError(
+                f"Journal mismatch for subject {self.subject_id} at entry {self._cursor}: "
+                f"expected {kind}, found {recorded_kind}"
+            )
+        self._cursor += 1
+        if not self.replaying:
+            logger.info(f"Replay complete for subject {self.subject_id} ({len(self.entries)} entries); session is live.")
+        return value
+
+    def save(self) -> None:
+        """
+        Write the journal as a gzip-compressed JSON checkpoint to the state store.
+        """
+        get_store().put_checkpoint(self.subject_id, self.to_bytes())
+        logger.info(f"Saved checkpoint for subject {self.subject_id} ({len(self.entries)} entries).")
+
+    def to_bytes(self) -> bytes:
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "subject_id": self.subject_id,
+            "saved_at": time.time(),
+            "seed": self.seed,
+            "q_table_csv": self.q_table_csv,
+            "entries": self.entries,
+        }
+        return gzip.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "SessionJournal":
+        data = json.loads(gzip.decompress(raw).decode("utf-8"))
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {data.get('version')}")
+        return cls(data["subject_id"], data["seed"], data.get("q_table_csv"), data["entries"])
+
+
+def has_checkpoint(subject_id: str) -> bool:
+    return get_store().has_checkpoint(subject_id)
+
+
+def load_checkpoint(subject_id: str) -> Optional[SessionJournal]:
+    """
+    Load the subject's checkpoint, or None if there is none or it cannot be read.
+    """
+    try:
+        raw = get_store().get_checkpoint(subject_id)
+        return SessionJournal.from_bytes(raw) if raw is not None else None
+    except Exception as e:
+        logger.warning(f"Failed to load checkpoint for subject {subject_id}: {e}")
+        return None
+
+
+def delete_checkpoint(subject_id: str) -> None:
+    get_store().delete_checkpoint(subject_id)
+
+
+# Journal of the session running in the current context (None outside registry sessions).
+# A context variable, so the async calls llm_gather runs on its shared loop see it too.
+_JOURNAL: contextvars.ContextVar[Optional[SessionJournal]] = contextvars.ContextVar("session_journal", default=None)
+
+
+def bind_journal(journal: Optional[SessionJournal]) -> None:
+    _JOURNAL.set(journal)
+
+
+def current_journal() -> Optional[SessionJournal]:
+    return _JOURNAL.get()
+
+
+def is_replaying() -> bool:
+    journal = current_journal()
+    return journal is not None and journal.replaying
+
+
+def session_rng():
+    """
+    Random source for the current session: its private seeded RNG when a journal is bound
+    (so a resumed session makes the same draws), otherwise numpy's global RNG.
+    """
+    journal = current_journal()
+    return journal.rng if journal is not None else np.random
+
+
+__all__ = [
+    "SessionSuspended",
+    "SessionJournal",
+    "has_checkpoint",
+    "load_checkpoint",
+    "delete_checkpoint",
+    "bind_journal",
+    "current_journal",
+    "is_replaying",
+    "session_rng",
+]
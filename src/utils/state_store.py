@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from src.utils.config_loader import (
+    CHECKPOINT_DIR,
+    STORE_BACKEND,
+    STORE_SQLITE_PATH,
+    subject_paths,
+)
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("StateStore")
+
+
+class StateStore:
+    """
+    Durable per-subject session state, shared by every process serving that subject:
+    - the item Q-table (CSV text)
+    - the latest question library (JSON text)
+    - the session checkpoint (gzip JSON bytes, see session_journal)
+    """
+
+    def get_q_table(self, subject_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def put_q_table(self, subject_id: str, csv_text: str) -> None:
+        raise NotImplementedError
+
+    def put_question_lib(self, subject_id: str, lib_json: str) -> None:
+        raise NotImplementedError
+
+    def get_question_lib(self, subject_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def get_checkpoint(self, subject_id: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def put_checkpoint(self, subject_id: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def delete_checkpoint(self, subject_id: str) -> None:
+        raise NotImplementedError
+
+    def has_checkpoint(self, subject_id: str) -> bool:
+        return self.get_checkpoint(subject_id) is not None
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class FileStateStore(StateStore):
+    """
+    Files under data/ (default): q_tables/item_qtable_{subject_id}.csv and
+    checkpoints/session_{subject_id}.json.gz. The latest question library is the newest
+    timestamped snapshot HandlerRL already writes, so it is not stored separately.
+    """
+
+    def _checkpoint_path(self, subject_id: str) -> str:
+        return os.path.join(CHECKPOINT_DIR, f"session_{subject_id}.json.gz")
+
+    def get_q_table(self, subject_id: str) -> Optional[str]:
+        path = subject_paths(subject_id)["q_table_file"]
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def put_q_table(self, subject_id: str, csv_text: str) -> None:
+        _write_atomic(subject_paths(subject_id)["q_table_file"], csv_text.encode("utf-8"))
+
+    def put_question_lib(self, subject_id: str, lib_json: str) -> None:
+        pass  # covered by the timestamped snapshot files
+
+    def get_question_lib(self, subject_id: str) -> Optional[str]:
+        return None
+
+    def get_checkpoint(self, subject_id: str) -> Optional[bytes]:
+        path = self._checkpoint_path(subject_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def put_checkpoint(self, subject_id: str, data: bytes) -> None:
+        _write_atomic(self._checkpoint_path(subject_id), data)
+
+    def delete_checkpoint(self, subject_id: str) -> None:
+        path = self._checkpoint_path(subject_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def has_checkpoint(self, subject_id: str) -> bool:
+        return os.path.exists(self._checkpoint_path(subject_id))
+
+
+class SqliteStateStore(StateStore):
+    """
+    One SQLite database (WAL mode) shared by all worker processes on the box, so any worker
+    can take over a subject. Each thread uses its own connection.
+    """
+
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS q_tables (subject_id TEXT PRIMARY KEY, csv TEXT NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS question_libs (subject_id TEXT PRIMARY KEY, lib_json TEXT NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS checkpoints (subject_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)",
+    )
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        for stmt in self._SCHEMA:
+            conn.execute(stmt)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, table: str, column: str, subject_id: str):
+        row = self._conn().execute(
+            f"SELECT {column} FROM {table} WHERE subject_id = ?", (str(subject_id),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _put(self, table: str, column: str, subject_id: str, value) -> None:
+        conn = self._conn()
+        conn.execute(
+            f"INSERT INTO {table} (subject_id, {column}, updated_at) VALUES (?, ?, ?) "
+            f"ON CONFLICT(subject_id) DO UPDATE SET {column} = excluded.{column}, updated_at = excluded.updated_at",
+            (str(subject_id), value, time.time()),
+        )
+        conn.commit()
+
+    def get_q_table(self, subject_id: str) -> Optional[str]:
+        return self._get("q_tables", "csv", subject_id)
+
+    def put_q_table(self, subject_id: str, csv_text: str) -> None:
+        self._put("q_tables", "csv", subject_id, csv_text)
+
+    def put_question_lib(self, subject_id: str, lib_json: str) -> None:
+        self._put("question_libs", "lib_json", subject_id, lib_json)
+
+    def get_question_lib(self, subject_id: str) -> Optional[str]:
+        return self._get("question_libs", "lib_json", subject_id)
+
+    def get_checkpoint(self, subject_id: str) -> Optional[bytes]:
+        return self._get("checkpoints", "data", subject_id)
+
+    def put_checkpoint(self, subject_id: str, data: bytes) -> None:
+        self._put("checkpoints", "data", subject_id, sqlite3.Binary(data))
+
+    def delete_checkpoint(self, subject_id: str) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM checkpoints WHERE subject_id = ?", (str(subject_id),))
+        conn.commit()
+
+
+_STORE: Optional[StateStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> StateStore:
+    """
+    Process-wide state store selected by store.backend in config.yaml ("file" or "sqlite").
+    """
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            if STORE_BACKEND == "sqlite":
+                _STORE = SqliteStateStore(STORE_SQLITE_PATH)
+                logger.info(f"Using SQLite state store at {STORE_SQLITE_PATH}")
+            elif STORE_BACKEND == "file":
+                _STORE = FileStateStore()
+            else:
+                raise ValueError(f"Unknown store backend: {STORE_BACKEND}")
+        return _STORE
+
+
+__all__ = ["StateStore", "FileStateStore", "SqliteStateStore", "get_store"]
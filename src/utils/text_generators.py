@@ -1,9 +1,11 @@
 # src/text_generators.py
-from src.utils.llm_client import llm_complete
+from src.utils.llm_client import llm_complete, llm_complete_async
 
 from src.utils.log_util import get_logger
 logger = get_logger("TextGenerators")
 
+_SYNONYM_SYSTEM_PROMPT = "You generate synonymous sentences for a given text. Return only the rewritten sentence, without any prefixes."
+
 # The following functions generate prompts and call OpenAI's API to generate various types of text transformations.
 # Each function is commented to explain its purpose and logic.
 
@@ -25,16 +27,40 @@ def generate_prompt_synonymous_sentences(user_input):
         user_input.capitalize()
     )
 
-def generate_synonymous_sentences(question_text):
+def generate_synonymous_sentences(question_text, on_delta=None, cache=False):
     """
     Use OpenAI API to generate a synonymous sentence for the given question_text.
+    on_delta, if given, receives the raw text while it streams.
+    cache=True reuses an earlier rewrite of the same text (for fixed sentences).
     """
     user_input = question_text
     
     raw = llm_complete(
-        "You generate synonymous sentences for a given text. Return only the rewritten sentence, without any prefixes.",
-        generate_prompt_synonymous_sentences(user_input)
+        _SYNONYM_SYSTEM_PROMPT,
+        generate_prompt_synonymous_sentences(user_input),
+        on_delta=on_delta,
+        cache=cache,
+        site="synonym",
+    )
+    return _parse_synonymous_sentence(raw)
+
+async def generate_synonymous_sentences_async(question_text, on_delta=None, cache=False):
+    """
+    Async variant of generate_synonymous_sentences.
+    """
+    raw = await llm_complete_async(
+        _SYNONYM_SYSTEM_PROMPT,
+        generate_prompt_synonymous_sentences(question_text),
+        on_delta=on_delta,
+        cache=cache,
+        site="synonym",
     )
+    return _parse_synonymous_sentence(raw)
+
+def _parse_synonymous_sentence(raw):
+    """
+    Strip echoed "User:"/"Answer:" prefixes from a synonym rewrite.
+    """
     results = raw.strip()
     lower = results.lower()
     if "answer:" in lower:
@@ -73,7 +99,8 @@ def generate_therapist_chat(user_input):
     """
     result = llm_complete(
         "Chat with people as a virtual AI therapist.",
-        generate_prompt_therapist(user_input)
+        generate_prompt_therapist(user_input),
+        site="therapist_chat",
     )
     logger.info(f"generate_therapist_chat: {result}")
     return result
@@ -102,7 +129,8 @@ def generate_change(user_input):
     """
     resp = llm_complete(
         "Convert first-person to second-person statements.",
-        generate_prompt_change(user_input)
+        generate_prompt_change(user_input),
+        site="change",
     )
     logger.debug(resp)
     return resp
@@ -125,13 +153,29 @@ def generate_prompt_change_positive(user_input):
         user_input.capitalize()
     )
 
-def generate_change_positive(user_input):
+def generate_change_positive(user_input, cache=False):
     """
     Use OpenAI API to convert a question to a positive declarative sentence.
+    cache=True reuses an earlier conversion of the same question.
     """
     resp = llm_complete(
         "Turn a question into a positive declarative sentence.",
-        generate_prompt_change_positive(user_input)
+        generate_prompt_change_positive(user_input),
+        cache=cache,
+        site="change",
+    )
+    logger.debug(resp)
+    return resp
+
+async def generate_change_positive_async(user_input, cache=False):
+    """
+    Async variant of generate_change_positive.
+    """
+    resp = await llm_complete_async(
+        "Turn a question into a positive declarative sentence.",
+        generate_prompt_change_positive(user_input),
+        cache=cache,
+        site="change",
     )
     logger.debug(resp)
     return resp
@@ -154,13 +198,29 @@ def generate_prompt_change_negative(user_input):
         user_input.capitalize()
     )
 
-def generate_change_negative(user_input):
+def generate_change_negative(user_input, cache=False):
     """
     Use OpenAI API to convert a question to a negative declarative sentence.
+    cache=True reuses an earlier conversion of the same question.
     """
     resp = llm_complete(
         "Turn a question into a negative declarative sentence.",
-        generate_prompt_change_negative(user_input)
+        generate_prompt_change_negative(user_input),
+        cache=cache,
+        site="change",
+    )
+    logger.debug(resp)
+    return resp
+
+async def generate_change_negative_async(user_input, cache=False):
+    """
+    Async variant of generate_change_negative.
+    """
+    resp = await llm_complete_async(
+        "Turn a question into a negative declarative sentence.",
+        generate_prompt_change_negative(user_input),
+        cache=cache,
+        site="change",
     )
     logger.debug(resp)
     return resp
\ No newline at end of file
@@ -0,0 +1,647 @@
+import asyncio
+import json
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a process-local lock
+    fcntl = None
+
+from src.utils.config_loader import (
+    RECORD_CSV,
+    TRANSPORT_KIND,
+    TRANSPORT_SOCKET_PATH,
+    TRANSPORT_SLOT_PATH,
+    TRANSPORT_SLOT_CAPACITY,
+    TRANSPORT_SLOT_POLL_INTERVAL,
+    TRANSPORT_CSV_WATCH,
+)
+from src.utils.file_watch import FileWatcher
+
+# Set up logger for this module
+from src.utils.log_util import get_logger
+logger = get_logger("TurnChannel")
+
+# The columns used in the record CSV file for question/response exchange
+HEADER = ["Question", "Question_Lock", "Resp", "Resp_Lock"]
+
+
+class TurnChannel:
+    """
+    Transport between HandlerRL (backend) and a front-end (console, HTTP server, device bridge).
+    The backend puts questions and takes answers; the front-end takes questions and puts answers.
+    take_* methods block until a message arrives, or return None once timeout (seconds) elapses.
+    """
+
+    def put_question(self, text: str) -> None:
+        raise NotImplementedError
+
+    def take_question(self, timeout: Optional[float] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    def put_answer(self, text: str) -> None:
+        raise NotImplementedError
+
+    def take_answer(self, timeout: Optional[float] = None) -> Optional[str]:
+        raise NotImplementedError
+
+    def put_partial(self, text: str) -> None:
+        """
+        Forward a fragment of user-facing text while it is still being generated.
+        Transports without streaming support drop it; the full text still arrives as a question.
+        """
+        return None
+
+    def reset(self) -> None:
+        """Drop any pending question/answer so a new session starts from a clean state."""
+        raise NotImplementedError
+
+
+class MemoryTurnChannel(TurnChannel):
+    """
+    In-process channel built on a condition variable.
+    Questions and answers are kept in FIFO queues, so producers never block and
+    waiting consumers are woken the moment a message is put, without polling or disk I/O.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._questions = deque()
+        self._answers = deque()
+        # Callbacks run as callback(kind, text) on every put ("question", "answer" or "partial"),
+        # e.g. to wake an asyncio waiter (see take_question_async) or feed a streaming response
+        self._listeners = []
+
+    def add_listener(self, callback: Callable[[str, str], None]) -> None:
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, str], None]) -> None:
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, kind: str, text: str) -> None:
+        with self._cond:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback(kind, text)
+
+    def _put(self, queue: deque, text: str, kind: str) -> None:
+        with self._cond:
+            queue.append(str(text))
+            self._cond.notify_all()
+        self._notify(kind, str(text))
+
+    def _take(self, queue: deque, timeout: Optional[float]) -> Optional[str]:
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(queue) > 0, timeout=timeout):
+                return None
+            return queue.popleft()
+
+    def put_question(self, text: str) -> None:
+        self._put(self._questions, text, "question")
+
+    def take_question(self, timeout: Optional[float] = None) -> Optional[str]:
+        return self._take(self._questions, timeout)
+
+    def put_answer(self, text: str) -> None:
+        self._put(self._answers, text, "answer")
+
+    def take_answer(self, timeout: Optional[float] = None) -> Optional[str]:
+        return self._take(self._answers, timeout)
+
+    def put_partial(self, text: str) -> None:
+        self._notify("partial", str(text))
+
+    def reset(self) -> None:
+        with self._cond:
+            self._questions.clear()
+            self._answers.clear()
+            self._cond.notify_all()
+
+
+class CsvTurnChannel(TurnChannel):
+    """
+    Legacy single-row record.csv handshake, kept for front-ends running in another process.
+    Question_Lock == 1 means a question is waiting for the front-end;
+    Resp_Lock == 0 means an answer is waiting for the backend.
+    Waiters block on inotify events for the file (see FileWatcher) and only re-read it
+    when it changed; without inotify they poll every POLL_INTERVAL seconds.
+    """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, path: str = RECORD_CSV, watch: bool = TRANSPORT_CSV_WATCH):
+        self.path = path
+        self.watch = watch
+
+    def _read(self):
+        last_exc = None
+        for _ in range(5):
+            try:
+                # Writers replace the file atomically, so it can be read right away
+                return pd.read_csv(self.path, dtype={"Question": str, "Question_Lock": "int64", "Resp": str, "Resp_Lock": "int64"})
+            except (EmptyDataError, FileNotFoundError, OSError) as e:
+                last_exc = e
+                time.sleep(0.05)
+        raise last_exc
+
+    def _write(self, df):
+        # Atomic replace: readers see the old or the new row, and waiters are woken by the watcher
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        df.to_csv(tmp_path, columns=HEADER, index=False)
+        os.replace(tmp_path, self.path)
+
+    def _wait(self, column: str, value: int, timeout: Optional[float]):
+        """Wait until data.loc[0, column] == value; return the DataFrame or None on timeout."""
+        # Start watching before the first read so no change in between is missed. Each wait has
+        # its own watcher (waiters never consume each other's events), closed when it returns
+        watcher = FileWatcher(self.path, poll_interval=self.POLL_INTERVAL, use_inotify=self.watch)
+        t0 = time.time()
+        try:
+            while True:
+                try:
+                    data = self._read()
+                except (EmptyDataError, FileNotFoundError, OSError):
+                    # Wait for the other side to initialize the record file
+                    data = None
+                if data is not None and int(data.loc[0, column]) == value:
+                    return data
+                remaining = None
+                if timeout is not None:
+                    remaining = timeout - (time.time() - t0)
+                    if remaining <= 0:
+                        return None
+                watcher.wait(remaining)
+        finally:
+            watcher.close()
+
+    def put_question(self, text: str) -> None:
+        data = self._wait("Question_Lock", 0, None)
+        data.loc[0, "Question"] = text
+        data.loc[0, "Question_Lock"] = 1
+        self._write(data)
+
+    def take_question(self, timeout: Optional[float] = None) -> Optional[str]:
+        data = self._wait("Question_Lock", 1, timeout)
+        if data is None:
+            return None
+        question = str(data.loc[0, "Question"])
+        data.loc[0, "Question_Lock"] = 0
+        self._write(data)
+        return question
+
+    def put_answer(self, text: str) -> None:
+        data = self._read()
+        data.loc[0, "Resp"] = text
+        data.loc[0, "Resp_Lock"] = 0
+        self._write(data)
+
+    def take_answer(self, timeout: Optional[float] = None) -> Optional[str]:
+        data = self._wait("Resp_Lock", 0, timeout)
+        if data is None:
+            return None
+        answer = data.loc[0, "Resp"]
+        data.loc[0, "Resp_Lock"] = 1
+        self._write(data)
+        return str(answer)
+
+    def reset(self) -> None:
+        try:
+            data = self._read()
+        except FileNotFoundError:
+            data = pd.DataFrame([["", 0, "", 1]], columns=HEADER)
+            self._write(data)
+        data.loc[0, "Question_Lock"] = 0
+        data.loc[0, "Resp_Lock"] = 1
+        self._write(data)
+
+
+class MmapTurnChannel(TurnChannel):
+    """
+    File-based handshake on a memory-mapped, fixed-layout binary slot.
+    Same single-slot semantics as record.csv (Question_Lock/Resp_Lock), without any text parsing:
+
+        magic(4s) version(B) question_lock(B) resp_lock(B) pad(x) seq(Q) q_len(I) r_len(I) capacity(I)
+        question bytes[capacity] | response bytes[capacity]
+
+    Every mutation happens under an exclusive flock and bumps `seq`; waiters only re-read the
+    8-byte sequence counter until it changes, and inspect the slot after that. Both sides must
+    use the same capacity: attaching to a slot created with another one raises ValueError.
+    """
+
+    MAGIC = b"CTRS"
+    VERSION = 2
+    _HEADER = struct.Struct("<4sBBBxQIII")
+    _SEQ_OFFSET = 8
+
+    def __init__(
+        self,
+        path: str = TRANSPORT_SLOT_PATH,
+        capacity: int = TRANSPORT_SLOT_CAPACITY,
+        poll_interval: float = TRANSPORT_SLOT_POLL_INTERVAL,
+    ):
+        self.path = path
+        self.capacity = int(capacity)
+        self.poll_interval = float(poll_interval)
+        self._local_lock = threading.Lock()
+        size = self._HEADER.size + 2 * self.capacity
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        with self._locked_file():
+            # Only a new (or headerless) file is laid out here; an existing slot belongs to its creator
+            if os.fstat(self._fd).st_size < self._HEADER.size:
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, self._HEADER.pack(self.MAGIC, self.VERSION, 0, 1, 0, 0, 0, self.capacity), 0)
+            magic, version, _, _, _, _, _, slot_capacity = self._HEADER.unpack(os.pread(self._fd, self._HEADER.size, 0))
+            file_size = os.fstat(self._fd).st_size
+        if magic != self.MAGIC or version != self.VERSION:
+            os.close(self._fd)
+            raise ValueError(f"{path} is not a version {self.VERSION} record slot")
+        if slot_capacity != self.capacity:
+            os.close(self._fd)
+            raise ValueError(
+                f"{path} was created with slot capacity {slot_capacity}, not {self.capacity}; "
+                f"use the same transport.slot_capacity on both sides"
+            )
+        if file_size < size:
+            os.close(self._fd)
+            raise ValueError(f"{path} is truncated ({file_size} of {size} bytes)")
+        self._mm = mmap.mmap(self._fd, size)
+
+    # --- slot access ---
+
+    @contextmanager
+    def _locked_file(self):
+        """Exclusive access across threads (local lock) and processes (flock)."""
+        with self._local_lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _seq(self) -> int:
+        return struct.unpack_from("<Q", self._mm, self._SEQ_OFFSET)[0]
+
+    def _header(self):
+        _, _, q_lock, r_lock, seq, q_len, r_len, _ = self._HEADER.unpack_from(self._mm, 0)
+        return q_lock, r_lock, seq, q_len, r_len
+
+    def _store(self, q_lock, r_lock, q_len, r_len, seq) -> None:
+        self._HEADER.pack_into(self._mm, 0, self.MAGIC, self.VERSION, q_lock, r_lock, seq + 1, q_len, r_len, self.capacity)
+
+    def _encode(self, text: str) -> bytes:
+        data = str(text).encode("utf-8")
+        if len(data) > self.capacity:
+            logger.warning(f"Message of {len(data)} bytes truncated to slot capacity {self.capacity}.")
+            data = data[:self.capacity].decode("utf-8", errors="ignore").encode("utf-8")
+        return data
+
+    def _text(self, offset: int, length: int) -> str:
+        return bytes(self._mm[offset:offset + length]).decode("utf-8")
+
+    def _wait(self, ready, act, timeout: Optional[float]):
+        """
+        Block until ready(header) holds, then run act(header) under the file lock.
+        Between checks only the sequence counter is read.
+        """
+        t0 = time.time()
+        seen = None
+        while True:
+            seq = self._seq()
+            if seq != seen:
+                with self._locked_file():
+                    header = self._header()
+                    if ready(header):
+                        return act(header)
+                seen = header[2]
+            if timeout is not None and time.time() - t0 > timeout:
+                return None
+            time.sleep(self.poll_interval)
+
+    # --- TurnChannel API ---
+
+    def put_question(self, text: str) -> None:
+        data = self._encode(text)
+        q_off = self._HEADER.size
+
+        def _act(h):
+            _, r_lock, seq, _, r_len = h
+            self._mm[q_off:q_off + len(data)] = data
+            self._store(1, r_lock, len(data), r_len, seq)
+
+        self._wait(lambda h: h[0] == 0, _act, None)
+
+    def take_question(self, timeout: Optional[float] = None) -> Optional[str]:
+        def _act(h):
+            _, r_lock, seq, q_len, r_len = h
+            question = self._text(self._HEADER.size, q_len)
+            self._store(0, r_lock, q_len, r_len, seq)
+            return question
+
+        return self._wait(lambda h: h[0] == 1, _act, timeout)
+
+    def put_answer(self, text: str) -> None:
+        data = self._encode(text)
+        r_off = self._HEADER.size + self.capacity
+        with self._locked_file():
+            q_lock, _, seq, q_len, _ = self._header()
+            self._mm[r_off:r_off + len(data)] = data
+            self._store(q_lock, 0, q_len, len(data), seq)
+
+    def take_answer(self, timeout: Optional[float] = None) -> Optional[str]:
+        def _act(h):
+            q_lock, _, seq, q_len, r_len = h
+            answer = self._text(self._HEADER.size + self.capacity, r_len)
+            self._store(q_lock, 1, q_len, r_len, seq)
+            return answer
+
+        return self._wait(lambda h: h[1] == 0, _act, timeout)
+
+    def reset(self) -> None:
+        with self._locked_file():
+            _, _, seq, q_len, r_len = self._header()
+            self._store(0, 1, q_len, r_len, seq)
+
+
+class SocketTurnChannel(TurnChannel):
+    """
+    Unix-domain-socket channel for a front-end running in another process.
+    The backend (HandlerRL) side listens on `path`; the front-end side connects to it.
+    Messages are length-prefixed frames (4-byte big-endian length + UTF-8 JSON body).
+    A reader thread blocks on the socket and feeds a local MemoryTurnChannel, so a
+    waiting take_* call wakes the moment a frame arrives.
+    Frames put while no peer is connected are kept and flushed once one connects.
+    """
+
+    MAX_FRAME_BYTES = 16 * 1024 * 1024
+    RECONNECT_INTERVAL = 0.2
+
+    def __init__(self, path: str = TRANSPORT_SOCKET_PATH, role: str = "backend"):
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("Unix domain sockets are not available on this platform")
+        if role not in ("backend", "frontend"):
+            raise ValueError(f"Unknown socket role '{role}', expected 'backend' or 'frontend'")
+        self.path = path
+        self.role = role
+        self._inbox = MemoryTurnChannel()
+        self._send_lock = threading.Lock()
+        self._conn = None
+        self._pending = deque()
+        target = self._serve_loop if role == "backend" else self._connect_loop
+        self._thread = threading.Thread(target=target, name=f"TurnChannel-{role}", daemon=True)
+        self._thread.start()
+
+    # --- framing ---
+
+    @staticmethod
+    def _encode(kind: str, text: str = "") -> bytes:
+        body = json.dumps({"type": kind, "text": text}).encode("utf-8")
+        return struct.pack(">I", len(body)) + body
+
+    @staticmethod
+    def _recv_exact(conn, n: int) -> Optional[bytes]:
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = conn.recv(n - len(buf))
+            if not chunk:
+                return None
+            buf.extend(chunk)
+        return bytes(buf)
+
+    def _read_frames(self, conn) -> None:
+        """Block on the connection and dispatch frames until the peer goes away."""
+        while True:
+            head = self._recv_exact(conn, 4)
+            if head is None:
+                return
+            (length,) = struct.unpack(">I", head)
+            if length > self.MAX_FRAME_BYTES:
+                logger.warning(f"Dropping connection: frame of {length} bytes exceeds limit.")
+                return
+            body = self._recv_exact(conn, length)
+            if body is None:
+                return
+            try:
+                msg = json.loads(body.decode("utf-8"))
+                kind, text = msg.get("type"), str(msg.get("text", ""))
+            except (ValueError, UnicodeDecodeError, AttributeError) as e:
+                # The length prefix keeps the stream in sync, so only this frame is lost
+                logger.warning(f"Dropping malformed turn channel frame ({length} bytes): {e}")
+                continue
+            if kind == "question":
+                self._inbox.put_question(text)
+            elif kind == "answer":
+                self._inbox.put_answer(text)
+            elif kind == "reset":
+                self._inbox.reset()
+            else:
+                logger.warning(f"Ignoring unknown frame type: {kind}")
+
+    def _send(self, frame: bytes) -> None:
+        with self._send_lock:
+            if self._conn is not None:
+                try:
+                    self._conn.sendall(frame)
+                    return
+                except OSError as e:
+                    logger.warning(f"Socket send failed, keeping frame until peer reconnects: {e}")
+                    self._conn = None
+            self._pending.append(frame)
+
+    def _attach(self, conn) -> None:
+        with self._send_lock:
+            self._conn = conn
+            while self._pending:
+                conn.sendall(self._pending[0])
+                self._pending.popleft()
+
+    def _detach(self, conn) -> None:
+        with self._send_lock:
+            if self._conn is conn:
+                self._conn = None
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _serve_loop(self) -> None:
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(1)
+        logger.info(f"Turn channel listening on {self.path}")
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError as e:
+                logger.warning(f"Turn channel accept failed: {e}")
+                time.sleep(self.RECONNECT_INTERVAL)
+                continue
+            logger.info("Front-end connected to turn channel.")
+            try:
+                self._attach(conn)
+                self._read_frames(conn)
+            except Exception as e:
+                # Whatever a peer sends, the listener must keep accepting the next connection
+                logger.warning(f"Turn channel connection error: {e}")
+            finally:
+                self._detach(conn)
+                logger.info("Front-end disconnected from turn channel.")
+
+    def _connect_loop(self) -> None:
+        while True:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.path)
+            except OSError:
+                conn.close()
+                # Backend not up yet; retry the connection (not a data poll)
+                time.sleep(self.RECONNECT_INTERVAL)
+                continue
+            logger.info(f"Connected to turn channel at {self.path}")
+            try:
+                self._attach(conn)
+                self._read_frames(conn)
+            except Exception as e:
+                logger.warning(f"Turn channel connection error: {e}")
+            finally:
+                self._detach(conn)
+
+    # --- TurnChannel API ---
+
+    def put_question(self, text: str) -> None:
+        self._send(self._encode("question", str(text)))
+
+    def take_question(self, timeout: Optional[float] = None) -> Optional[str]:
+        return self._inbox.take_question(timeout)
+
+    def put_answer(self, text: str) -> None:
+        self._send(self._encode("answer", str(text)))
+
+    def take_answer(self, timeout: Optional[float] = None) -> Optional[str]:
+        return self._inbox.take_answer(timeout)
+
+    def reset(self) -> None:
+        with self._send_lock:
+            self._pending.clear()
+        self._inbox.reset()
+        # Let the peer drop anything it still holds from a previous session
+        self._send(self._encode("reset"))
+
+
+async def take_question_async(channel: MemoryTurnChannel, timeout: Optional[float] = None) -> Optional[str]:
+    """
+    Await the next question on an in-process channel without holding an OS thread.
+    The waiter is woken through the channel's listener hook when HandlerRL puts a question.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    woken = asyncio.Event()
+
+    def _wake(kind: str, text: str):
+        try:
+            loop.call_soon_threadsafe(woken.set)
+        except RuntimeError:
+            # Event loop already closed; nothing left to wake
+            pass
+
+    channel.add_listener(_wake)
+    try:
+        while True:
+            question = channel.take_question(timeout=0)
+            if question is not None:
+                return question
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(woken.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            woken.clear()
+    finally:
+        channel.remove_listener(_wake)
+
+
+_CHANNEL_TYPES = {
+    "memory": MemoryTurnChannel,
+    "csv": CsvTurnChannel,
+    "socket": SocketTurnChannel,
+    "mmap": MmapTurnChannel,
+}
+
+_channel = None
+_channel_lock = threading.Lock()
+
+
+def create_channel(kind: str = TRANSPORT_KIND, role: str = "backend") -> TurnChannel:
+    """
+    Build a new channel of the given transport kind (see `transport.kind` in config.yaml).
+    role is "backend" for the process running HandlerRL and "frontend" for a separate
+    front-end process; only the socket transport distinguishes the two.
+    """
+    if kind not in _CHANNEL_TYPES:
+        raise ValueError(f"Unknown transport kind '{kind}', expected one of {sorted(_CHANNEL_TYPES)}")
+    if kind == "socket":
+        return SocketTurnChannel(role=role)
+    return _CHANNEL_TYPES[kind]()
+
+
+def get_channel() -> TurnChannel:
+    """
+    Return the process-wide channel shared by HandlerRL and the front-end, creating it on first use.
+    """
+    global _channel
+    with _channel_lock:
+        if _channel is None:
+            _channel = create_channel()
+            logger.info(f"Using '{TRANSPORT_KIND}' turn channel for question/answer exchange.")
+        return _channel
+
+
+def set_channel(channel: TurnChannel) -> None:
+    """
+    Replace the process-wide channel, e.g. with a front-end side socket channel.
+    """
+    global _channel
+    with _channel_lock:
+        _channel = channel
+
+
+__all__ = [
+    "TurnChannel",
+    "MemoryTurnChannel",
+    "CsvTurnChannel",
+    "SocketTurnChannel",
+    "MmapTurnChannel",
+    "take_question_async",
+    "create_channel",
+    "get_channel",
+    "set_channel",
+    "HEADER",
+]
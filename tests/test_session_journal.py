@@ -0,0 +1,33 @@
+from src.utils import llm_client
+from src.utils.session_journal import SessionJournal, bind_journal
+
+
+def _gather_two():
+    return llm_client.llm_gather(
+        llm_client.llm_complete_async("system", "first", site="change"),
+        llm_client.llm_complete_async("system", "second", site="synonym"),
+    )
+
+
+def test_resume_replays_gathered_calls(monkeypatch):
+    async def live(system_content, user_content, *args):
+        return f"live {user_content}"
+
+    monkeypatch.setattr(llm_client, "_llm_call_async", live)
+    journal = SessionJournal("journal-test")
+    bind_journal(journal)
+    try:
+        assert _gather_two() == ["live first", "live second"]
+        assert journal.entries == [["llm", "live first"], ["llm", "live second"]]
+
+        # A resumed session gets the recorded replies back without calling the model
+        async def unexpected(*args):
+            raise AssertionError("replayed LLM call reached the model")
+
+        monkeypatch.setattr(llm_client, "_llm_call_async", unexpected)
+        resumed = SessionJournal.from_bytes(journal.to_bytes())
+        bind_journal(resumed)
+        assert _gather_two() == ["live first", "live second"]
+        assert not resumed.replaying
+    finally:
+        bind_journal(None)